@@ -5,6 +5,7 @@ Provides REST API for web applications to access warehouse data.
 
 import sys
 import os
+import functools
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from fastapi import FastAPI, HTTPException, Query
@@ -12,6 +13,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, List
 from pydantic import BaseModel
 from database import database as db
+from database import utils
+from database.file_cleanup import get_reaper, close_reaper
+from database.backup import get_backup_health
+from database import instrument
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -29,6 +34,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def startup():
+    """Time database calls if DB_INSTRUMENT=1, create or upgrade the database schema (skipped
+    when it is current) and start the file reaper."""
+    instrument.enable_from_env()
+    db.init_database()
+    get_reaper().start()
+
+@app.on_event("shutdown")
+def shutdown():
+    """Stop the file reaper and close pooled database connections."""
+    close_reaper()
+    db.close_pool()
+
+def read_only(endpoint):
+    """Serve an endpoint from a read-only connection and one snapshot (see db.reading()).
+
+    FastAPI runs plain ``def`` endpoints in its threadpool, so these reads use
+    up to DB_READER_POOL_SIZE connections in parallel while the bot writes.
+    """
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        with db.reading():
+            return endpoint(*args, **kwargs)
+    return wrapper
+
 # ============================================================================
 # Pydantic Models (Request/Response schemas)
 # ============================================================================
@@ -36,6 +67,11 @@ app.add_middleware(
 class ItemUpdate(BaseModel):
     available_count: float
 
+class StockAdjustment(BaseModel):
+    delta: float
+    reason: str = "adjust"
+    actor: Optional[str] = None
+
 class StatsResponse(BaseModel):
     total_items: int
     total_categories: int
@@ -58,39 +94,43 @@ def read_root():
             "categories": "/categories",
             "brands": "/brands",
             "low_stock": "/low-stock",
-            "stats": "/stats"
+            "stats": "/stats",
+            "metrics": "/metrics"
         }
     }
 
 @app.get("/health")
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint, with the state of the database backups."""
     try:
         # Test database connection
-        db.get_connection().close()
-        return {"status": "healthy", "database": "connected"}
+        with db.connection() as conn:
+            conn.execute('SELECT 1')
+        return {"status": "healthy", "database": "connected", "backup": get_backup_health()}
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
 
+@app.get("/metrics")
+def get_metrics():
+    """Usage and latency of every pooled database connection, the reference-table cache, the file
+    reaper and, with DB_INSTRUMENT=1, each database function and the slow-query log."""
+    return {
+        "queries": instrument.get_stats(),
+        "connections": db.get_connection_stats(),
+        "cache": db.get_cache_stats(),
+        "file_deletions": {**get_reaper().stats(), "pending": db.get_pending_file_deletion_count()},
+    }
+
 # ============================================================================
 # Statistics
 # ============================================================================
 
 @app.get("/stats", response_model=StatsResponse)
+@read_only
 def get_stats():
     """Get warehouse statistics."""
     try:
-        items = db.get_all_items()
-        categories = db.get_all_categories()
-        brands = db.get_all_brands()
-        low_stock = db.get_low_stock_items()
-        
-        return {
-            "total_items": len(items),
-            "total_categories": len(categories),
-            "total_brands": len(brands),
-            "low_stock_items": len(low_stock)
-        }
+        return db.get_stats()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -99,74 +139,71 @@ def get_stats():
 # ============================================================================
 
 @app.get("/items")
+@read_only
 def get_items(
     limit: Optional[int] = Query(100, ge=1, le=1000),
-    offset: Optional[int] = Query(0, ge=0)
+    offset: Optional[int] = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    sort: str = Query("newest", pattern="^(newest|oldest|name|updated)$"),
+    category_id: Optional[int] = None,
+    subcategory_id: Optional[int] = None,
+    brand_id: Optional[int] = None,
+    measure_type_id: Optional[int] = None,
+    updated_since: Optional[int] = Query(None, ge=0, description="Only items changed at or after this Unix time")
 ):
-    """Get all items with pagination."""
+    """Get items page by page.
+
+    Follow ``next_cursor`` for fast keyset paging; ``offset`` is still supported
+    for older clients but gets slower the deeper the page. ``updated_since``
+    with ``sort=updated`` lists recent changes oldest first, for syncing.
+    """
+    filters = {
+        "category_id": category_id,
+        "subcategory_id": subcategory_id,
+        "brand_id": brand_id,
+        "measure_type_id": measure_type_id,
+        "updated_since": updated_since
+    }
     try:
-        all_items = db.get_all_items()
-        total = len(all_items)
-        items = all_items[offset:offset+limit]
+        items, next_cursor = db.get_items_page(
+            cursor=cursor, limit=limit, filters=filters, sort=sort, offset=offset
+        )
         
         return {
-            "total": total,
+            "total": db.count_items(filters),
             "limit": limit,
-            "offset": offset,
-            "items": [
-                {
-                    "id": item[0],
-                    "code": item[1],
-                    "custom_code": item[2],
-                    "name": item[3],
-                    "description": item[4],
-                    "category": item[5],
-                    "subcategory": item[6],
-                    "brand": item[7],
-                    "measure_type": item[8],
-                    "available_count": item[9],
-                    "video_url": item[10],
-                    "created_at": item[11],
-                    "updated_at": item[12]
-                }
-                for item in items
-            ]
+            "offset": 0 if cursor else offset,
+            "next_cursor": next_cursor,
+            "items": [item.to_dict() for item in items]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/items/search")
-def search_items(q: str = Query(..., min_length=1)):
-    """Search items by name, custom_code, or description."""
+@read_only
+def search_items(
+    q: str = Query(..., min_length=1),
+    limit: Optional[int] = Query(50, ge=1, le=1000),
+    offset: Optional[int] = Query(0, ge=0)
+):
+    """Search items by name, custom_code, or description (best matches first)."""
     try:
-        items = db.search_items(q)
+        items = db.search_items(q, limit=limit, offset=offset)
         
         return {
             "query": q,
-            "total": len(items),
-            "items": [
-                {
-                    "id": item[0],
-                    "code": item[1],
-                    "custom_code": item[2],
-                    "name": item[3],
-                    "description": item[4],
-                    "category": item[5],
-                    "subcategory": item[6],
-                    "brand": item[7],
-                    "measure_type": item[8],
-                    "available_count": item[9],
-                    "video_url": item[10],
-                    "created_at": item[11],
-                    "updated_at": item[12]
-                }
-                for item in items
-            ]
+            "total": db.count_search_items(q),
+            "limit": limit,
+            "offset": offset,
+            "items": [item.to_dict() for item in items]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/items/{item_id}")
+@read_only
 def get_item(item_id: int):
     """Get item by ID with full details."""
     try:
@@ -178,28 +215,12 @@ def get_item(item_id: int):
         images = db.get_item_images(item_id)
         
         return {
-            "id": item[0],
-            "code": item[1],
-            "custom_code": item[2],
-            "name": item[3],
-            "description": item[4],
-            "category_id": item[5],
-            "category": item[6],
-            "subcategory_id": item[7],
-            "subcategory": item[8],
-            "brand_id": item[9],
-            "brand": item[10],
-            "measure_type_id": item[11],
-            "measure_type": item[12],
-            "available_count": item[13],
-            "video_url": item[14],
-            "created_at": item[15],
-            "updated_at": item[16],
+            **item.to_dict(),
             "images": [
                 {
-                    "id": img[0],
-                    "path": img[1],
-                    "created_at": img[2]
+                    "id": img.id,
+                    "path": img.image_path,
+                    "created_at": img.created_at
                 }
                 for img in images
             ]
@@ -211,41 +232,103 @@ def get_item(item_id: int):
 
 @app.patch("/items/{item_id}/stock")
 def update_item_stock(item_id: int, update: ItemUpdate):
-    """Update item stock/available count."""
+    """Set item stock/available count to an absolute value."""
+    try:
+        available_count = db.set_stock(item_id, update.available_count, actor="api")
+
+        if available_count is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+
+        return {"message": "Stock updated successfully", "available_count": available_count}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/items/{item_id}/stock/adjust")
+def adjust_item_stock(item_id: int, adjustment: StockAdjustment):
+    """Add to (positive delta) or remove from (negative delta) item stock atomically."""
+    try:
+        available_count = db.adjust_stock(item_id, adjustment.delta, adjustment.reason, adjustment.actor)
+
+        if available_count is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+
+        return {"message": "Stock adjusted successfully", "available_count": available_count}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/items/{item_id}/stock/history")
+@read_only
+def get_item_stock_history(
+    item_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = Query(None, description="Movement id from the previous page")
+):
+    """Get the stock movements of one item, newest first."""
     try:
         item = db.get_item_by_id(item_id)
-        
+
         if not item:
             raise HTTPException(status_code=404, detail="Item not found")
-        
-        # Update only the available_count
-        success = db.update_item(
-            item_id=item_id,
-            name=item[3],
-            custom_code=item[2],
-            category_id=item[5],
-            subcategory_id=item[7],
-            brand_id=item[9],
-            measure_type_id=item[11],
-            description=item[4],
-            available_count=update.available_count,
-            video_url=item[14]
-        )
-        
-        if success:
-            return {"message": "Stock updated successfully", "available_count": update.available_count}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to update stock")
+
+        movements = db.get_stock_history(item_id, limit, before)
+        return {
+            "item_id": item_id,
+            "available_count": item.available_count,
+            "next_before": movements[-1].id if len(movements) == limit else None,
+            "movements": [
+                {
+                    "id": m.id,
+                    "delta": m.delta,
+                    "reason": m.reason,
+                    "actor": m.actor,
+                    "timestamp": m.created_ts,
+                    "date": utils.timestamp_to_shamsi(m.created_ts)
+                }
+                for m in movements
+            ]
+        }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/stock/as-of")
+@read_only
+def get_stock_as_of(
+    date: str = Query(..., description="Shamsi date (1403/05/01) or date and time (1403/05/01 14:30:00)"),
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: int = Query(0, ge=0, description="Last item id from the previous page")
+):
+    """Get the stock balance of every item at a point in time."""
+    try:
+        timestamp = utils.shamsi_to_timestamp(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY/MM/DD or YYYY/MM/DD HH:MM:SS")
+    try:
+        items = db.get_stock_as_of(timestamp, limit, after_id)
+        return {
+            "date": date,
+            "timestamp": timestamp,
+            "next_after_id": items[-1].id if len(items) == limit else None,
+            "items": [item.to_dict() for item in items]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ============================================================================
 # Low Stock Items
 # ============================================================================
 
 @app.get("/low-stock")
+@read_only
 def get_low_stock_items():
     """Get items below low stock threshold."""
     try:
@@ -253,24 +336,7 @@ def get_low_stock_items():
         
         return {
             "total": len(items),
-            "items": [
-                {
-                    "id": item[0],
-                    "code": item[1],
-                    "custom_code": item[2],
-                    "name": item[3],
-                    "description": item[4],
-                    "category": item[5],
-                    "subcategory": item[6],
-                    "brand": item[7],
-                    "measure_type": item[8],
-                    "available_count": item[9],
-                    "low_stock_threshold": item[10],
-                    "created_at": item[11],
-                    "updated_at": item[12]
-                }
-                for item in items
-            ]
+            "items": [item.to_dict() for item in items]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -280,6 +346,7 @@ def get_low_stock_items():
 # ============================================================================
 
 @app.get("/categories")
+@read_only
 def get_categories():
     """Get all categories."""
     try:
@@ -287,20 +354,13 @@ def get_categories():
         
         return {
             "total": len(categories),
-            "categories": [
-                {
-                    "id": cat[0],
-                    "code": cat[1],
-                    "name": cat[2],
-                    "created_at": cat[3]
-                }
-                for cat in categories
-            ]
+            "categories": [cat.to_dict() for cat in categories]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/categories/{category_id}/subcategories")
+@read_only
 def get_subcategories(category_id: int):
     """Get subcategories for a specific category."""
     try:
@@ -309,15 +369,7 @@ def get_subcategories(category_id: int):
         return {
             "category_id": category_id,
             "total": len(subcategories),
-            "subcategories": [
-                {
-                    "id": sub[0],
-                    "code": sub[1],
-                    "name": sub[2],
-                    "created_at": sub[3]
-                }
-                for sub in subcategories
-            ]
+            "subcategories": [sub.to_dict() for sub in subcategories]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -327,6 +379,7 @@ def get_subcategories(category_id: int):
 # ============================================================================
 
 @app.get("/brands")
+@read_only
 def get_brands():
     """Get all brands."""
     try:
@@ -334,20 +387,13 @@ def get_brands():
         
         return {
             "total": len(brands),
-            "brands": [
-                {
-                    "id": brand[0],
-                    "code": brand[1],
-                    "name": brand[2],
-                    "created_at": brand[3]
-                }
-                for brand in brands
-            ]
+            "brands": [brand.to_dict() for brand in brands]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/brands/{brand_id}/items")
+@read_only
 def get_brand_items(brand_id: int):
     """Get all items for a specific brand."""
     try:
@@ -358,12 +404,12 @@ def get_brand_items(brand_id: int):
             "total": len(items),
             "items": [
                 {
-                    "id": item[0],
-                    "code": item[1],
-                    "custom_code": item[2],
-                    "name": item[3],
-                    "available_count": item[9],
-                    "measure_type": item[8]
+                    "id": item.id,
+                    "code": item.code,
+                    "custom_code": item.custom_code,
+                    "name": item.name,
+                    "available_count": item.available_count,
+                    "measure_type": item.measure_type
                 }
                 for item in items
             ]
@@ -376,6 +422,7 @@ def get_brand_items(brand_id: int):
 # ============================================================================
 
 @app.get("/measure-types")
+@read_only
 def get_measure_types():
     """Get all measure types."""
     try:
@@ -383,16 +430,7 @@ def get_measure_types():
         
         return {
             "total": len(measure_types),
-            "measure_types": [
-                {
-                    "id": mt[0],
-                    "code": mt[1],
-                    "name": mt[2],
-                    "low_stock_threshold": mt[3],
-                    "created_at": mt[4]
-                }
-                for mt in measure_types
-            ]
+            "measure_types": [mt.to_dict() for mt in measure_types]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
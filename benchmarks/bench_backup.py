@@ -0,0 +1,72 @@
+"""Online backup: how long it takes and how much it stalls a concurrent writer.
+
+Seeds a catalog, starts a thread that adjusts stock in a loop and backs the
+database up while it runs: once with the whole copy in a single backup step
+(``--pages -1``), once in steps of ``--pages`` pages with ``--sleep-ms``
+between them (the default of ``database/backup.py``). Reports the backup
+duration, steps, restarts and the writer's latency before each backup,
+while its pages are copied and while the copy is verified and compressed. Every copy is integrity-checked and compressed as in production.
+
+Usage:
+    python benchmarks/bench_backup.py [--items 200000] [--pages 256] [--sleep-ms 10]
+"""
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+import shutil
+
+from common import db, temp_database, seed_catalog, summarize
+from database import backup
+
+def writer(stop, latencies, n_items):
+    """Adjust stock until ``stop`` is set."""
+    rnd = random.Random(7)
+    while not stop.is_set():
+        start = time.perf_counter()
+        db.adjust_stock(rnd.randint(1, n_items), 1, actor='bench')
+        latencies.append((start, (time.perf_counter() - start) * 1000))
+
+def window(latencies, start, end):
+    return summarize([ms for ts, ms in latencies if start <= ts < end])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--pages', type=int, default=backup.DEFAULT_PAGES)
+    parser.add_argument('--sleep-ms', type=float, default=backup.DEFAULT_SLEEP_MS)
+    args = parser.parse_args()
+
+    backup_dir = tempfile.mkdtemp(prefix='warehouse_backups_')
+    try:
+        with temp_database():
+            print(f"Seeding {args.items} items...")
+            seed_catalog(args.items)
+            for name, pages, sleep_ms in [('single step', -1, 0),
+                                          (f'{args.pages} pages/step', args.pages, args.sleep_ms)]:
+                latencies = []
+                stop = threading.Event()
+                thread = threading.Thread(target=writer, args=(stop, latencies, args.items))
+                thread.start()
+                time.sleep(1.0)
+                started = time.perf_counter()
+                status = backup.backup_database(backup_dir, pages=pages, sleep_ms=sleep_ms, keep=1)
+                finished = time.perf_counter()
+                stop.set()
+                thread.join()
+
+                print(f"\n{name}: {status['size_bytes'] / 1024 / 1024:.1f} MB copied in {status['copy_seconds']:.2f}s "
+                      f"({status['steps']} steps, {status['restarts']} restarts); "
+                      f"verify + compress to {status['stored_bytes'] / 1024 / 1024:.1f} MB, "
+                      f"{status['duration_seconds']:.2f}s total")
+                copied = started + status['copy_seconds']
+                print(f"  writer before backup:     {window(latencies, 0, started)}")
+                print(f"  writer during copy:       {window(latencies, started, copied)}")
+                print(f"  writer verify + compress: {window(latencies, copied, finished)}")
+    finally:
+        shutil.rmtree(backup_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
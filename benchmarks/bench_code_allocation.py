@@ -0,0 +1,81 @@
+"""Code allocation: uniqueness under concurrency and cost per code.
+
+Allocates ``--codes`` ITM codes from ``--threads`` threads at once, each
+mixing single allocations with blocks of up to ``--max-block`` codes the way
+``bulk_import`` does, and checks that no code was handed out twice (exits 1
+if one was). Also times a single ``allocate_codes()`` call and
+``create_category()`` with an allocated code, and counts how many of
+``--random-items`` codes drawn the old way (random 6 digits) would have
+collided.
+
+Usage:
+    python benchmarks/bench_code_allocation.py [--codes 1000000] [--threads 8] [--max-block 500]
+"""
+
+import sys
+import argparse
+import random
+import string
+import threading
+import time
+
+from common import db, temp_database, summarize
+
+def allocate(n_codes, seed, max_block, out):
+    """Allocate ``n_codes`` codes in random-sized blocks into ``out``."""
+    rnd = random.Random(seed)
+    remaining = n_codes
+    while remaining:
+        count = min(remaining, 1 if rnd.random() < 0.5 else rnd.randint(2, max_block))
+        out.extend(db.allocate_codes('ITM', count))
+        remaining -= count
+
+def timed(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--codes', type=int, default=1000000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--max-block', type=int, default=500)
+    parser.add_argument('--random-items', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    with temp_database():
+        results = [[] for _ in range(args.threads)]
+        per_thread = args.codes // args.threads
+        threads = [threading.Thread(target=allocate, args=(per_thread, i, args.max_block, results[i]))
+                   for i in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        codes = [code for result in results for code in result]
+        duplicates = len(codes) - len(set(codes))
+        print(f"{len(codes)} codes from {args.threads} threads in {elapsed:.1f}s "
+              f"({len(codes) / elapsed:,.0f} codes/s), {duplicates} duplicates")
+
+        stats = timed(lambda: db.allocate_codes('ITM'), args.repeat)
+        print(f"  {'allocate_codes':>15}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+        counter = iter(range(args.repeat))
+        stats = timed(lambda: db.create_category(f"دسته {next(counter)}"), args.repeat)
+        print(f"  {'create_category':>15}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+    rnd = random.Random(1)
+    drawn = [''.join(rnd.choices(string.digits, k=6)) for _ in range(args.random_items)]
+    print(f"Random 6-digit codes: {len(drawn) - len(set(drawn))} collisions in {args.random_items} draws")
+
+    if duplicates:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
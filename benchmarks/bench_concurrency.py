@@ -0,0 +1,93 @@
+"""Concurrency benchmark: do readers block on a busy writer?
+
+Runs the same workload twice - once with the old rollback journal and once
+with the default WAL profile - and reports reader latency, lock errors and
+writer throughput for each.
+
+Usage:
+    python benchmarks/bench_concurrency.py [--items 20000] [--readers 4] [--seconds 5]
+"""
+
+import argparse
+import random
+import sqlite3
+import threading
+import time
+
+from common import db, temp_database, seed_catalog, summarize
+
+PROFILES = {
+    'rollback': {
+        'DB_JOURNAL_MODE': 'DELETE',
+        'DB_SYNCHRONOUS': 'FULL',
+    },
+    'wal': {
+        'DB_JOURNAL_MODE': 'WAL',
+        'DB_SYNCHRONOUS': 'NORMAL',
+    },
+}
+
+def run_profile(name, env, n_items, n_readers, seconds):
+    """Run one writer and ``n_readers`` readers against a fresh database."""
+    with temp_database(env):
+        seed_catalog(n_items)
+        stop = threading.Event()
+        reader_latencies = []
+        reader_errors = [0]
+        writer_commits = [0]
+        lock = threading.Lock()
+        
+        def writer():
+            rnd = random.Random(1)
+            while not stop.is_set():
+                ids = [(rnd.randint(0, 100), rnd.randint(1, n_items)) for _ in range(500)]
+                try:
+                    with db.transaction() as conn:
+                        conn.executemany('UPDATE items SET available_count = ? WHERE id = ?', ids)
+                    writer_commits[0] += 1
+                except sqlite3.OperationalError:
+                    pass
+        
+        def reader(seed):
+            rnd = random.Random(seed)
+            latencies = []
+            errors = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    db.get_item_by_id(rnd.randint(1, n_items))
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except sqlite3.OperationalError:
+                    errors += 1
+            with lock:
+                reader_latencies.extend(latencies)
+                reader_errors[0] += errors
+        
+        threads = [threading.Thread(target=writer)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(n_readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        
+        stats = summarize(reader_latencies)
+        stats['reads_per_s'] = round(len(reader_latencies) / seconds)
+        stats['reader_lock_errors'] = reader_errors[0]
+        stats['writer_commits_per_s'] = round(writer_commits[0] / seconds, 1)
+        return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+    
+    for name, env in PROFILES.items():
+        stats = run_profile(name, env, args.items, args.readers, args.seconds)
+        print(f"{name:>9}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Group commit vs one commit per call for small, frequent writes.
+
+Simulates a busy receiving shift: ``--users`` threads each loop over a
+wizard step (``set_user_state``) and a stock change (``adjust_stock``).
+Each write is made three ways:
+
+- direct:        call the database function, one transaction per call
+- group commit:   ``writer.submit(...).result()``, waiting like a handler does
+- pipelined:     submit everything and wait for the futures at the end
+
+The run is repeated with ``synchronous=NORMAL`` (the default profile) and
+``synchronous=FULL`` (an fsync on every commit). Reports writes per second.
+
+Usage:
+    python benchmarks/bench_group_commit.py [--users 16] [--writes 500]
+"""
+
+import argparse
+import threading
+import time
+
+from common import db, temp_database, seed_catalog
+from database.writer import GroupCommitWriter
+
+# The user-state store would keep the state changes in memory; turn it off
+# so every set_user_state() is a database write
+PROFILES = {
+    'NORMAL': {'DB_SYNCHRONOUS': 'NORMAL', 'DB_STATE_CACHE_SIZE': '0'},
+    'FULL': {'DB_SYNCHRONOUS': 'FULL', 'DB_STATE_CACHE_SIZE': '0'},
+}
+
+def user_writes(user_id, n_writes, n_items):
+    """The writes one user makes: alternating state changes and stock adjustments."""
+    for n in range(n_writes):
+        if n % 2 == 0:
+            yield db.set_user_state, (user_id, 'item_receive', {'step': n})
+        else:
+            yield db.adjust_stock, (1 + (user_id * 7919 + n) % n_items, 1, 'receive', user_id)
+
+def run(mode, n_users, n_writes, n_items):
+    """Run every user's writes on its own thread; return (writes/s, writer stats)."""
+    writer = GroupCommitWriter() if mode != 'direct' else None
+
+    def user(user_id):
+        pending = []
+        for func, args in user_writes(user_id, n_writes, n_items):
+            if mode == 'direct':
+                func(*args)
+            elif mode == 'group commit':
+                writer.submit(func, *args).result()
+            else:
+                pending.append(writer.submit(func, *args))
+        for future in pending:
+            future.result()
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(n_users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stats = None
+    if writer is not None:
+        writer.close()
+        stats = writer.stats()
+    return n_users * n_writes / elapsed, stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--writes', type=int, default=500, help="Writes per user")
+    parser.add_argument('--items', type=int, default=10000)
+    args = parser.parse_args()
+
+    for profile, env in PROFILES.items():
+        with temp_database(env):
+            seed_catalog(args.items)
+            print(f"synchronous={profile}, {args.users} users x {args.writes} writes")
+            baseline = None
+            for mode in ('direct', 'group commit', 'pipelined'):
+                rate, stats = run(mode, args.users, args.writes, args.items)
+                baseline = baseline or rate
+                extra = f", avg batch {stats['avg_batch']}" if stats else ''
+                print(f"  {mode:>12}: {rate:8.0f} writes/s ({rate / baseline:.1f}x){extra}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Cold-start import time of the API and the bot.
+
+Each module is imported in a fresh interpreter with ``python -X importtime``,
+several times, and the median total is reported together with the slowest
+imports of one run. The script also fails if importing opened a database
+connection, so schema work cannot creep back into import time.
+
+Usage (from the project root):
+    python benchmarks/bench_importtime.py
+    python benchmarks/bench_importtime.py --runs 10 --max-ms 1500
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODULES = ['api.main', 'bot.bot']
+
+# Exit code of the child interpreter when the import created the connection pool
+POOL_CREATED = 3
+
+CHILD_CODE = (
+    "import sys, {module}\n"
+    "from database import database as db\n"
+    "sys.exit({pool_created} if db._pool is not None else 0)\n"
+)
+
+def import_time(module):
+    """Import ``module`` in a new interpreter.
+
+    Returns (total ms, [(cumulative ms, module name, nesting depth)], pool created).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         CHILD_CODE.format(module=module, pool_created=POOL_CREATED)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode not in (0, POOL_CREATED):
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((int(cumulative) / 1000, name.strip(), depth))
+    total = sum(ms for ms, name, depth in imports if depth == 0)
+    return total, imports, result.returncode == POOL_CREATED
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="Slowest imports to list")
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help="Fail if a module's median import time exceeds this")
+    args = parser.parse_args()
+
+    failures = 0
+    for module in MODULES:
+        totals = []
+        for _ in range(args.runs):
+            total, imports, pool_created = import_time(module)
+            totals.append(total)
+        median = statistics.median(totals)
+
+        print(f"\n{module}: median {median:.0f} ms over {args.runs} runs "
+              f"(min {min(totals):.0f}, max {max(totals):.0f})")
+        for ms, name, _ in sorted(imports, reverse=True)[:args.top]:
+            print(f"    {ms:8.1f} ms  {name}")
+
+        if pool_created:
+            print(f"❌ importing {module} opened a database connection")
+            failures += 1
+        if args.max_ms is not None and median > args.max_ms:
+            print(f"❌ {module} imports in {median:.0f} ms, over the {args.max_ms:.0f} ms budget")
+            failures += 1
+
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Event-loop lag of the bot: synchronous database calls vs database.aio.
+
+Simulates bot traffic on one asyncio loop: a few "heavy" users browse items
+by brand and search, while many "light" users only look up their state (as
+every text message does). Runs once calling the database functions
+directly from the coroutines, as the handlers used to, and once through
+``database.aio``. Reports the loop lag measured by ``LoopLagMonitor`` and
+how long the light users waited for their lookups.
+
+Usage:
+    python benchmarks/bench_loop_lag.py [--items 50000] [--heavy 4] [--light 20] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from common import db, temp_database, seed_catalog, summarize
+from database import aio
+
+class SyncFacade:
+    """Calls the database functions directly on the event loop thread."""
+
+    def __getattr__(self, name):
+        func = getattr(db, name)
+        async def call(*args, **kwargs):
+            return func(*args, **kwargs)
+        return call
+
+MODES = {
+    'direct': SyncFacade(),
+    'database.aio': aio,
+}
+
+async def heavy_user(facade, seed, stop):
+    rnd = random.Random(seed)
+    while not stop.is_set():
+        await facade.get_items_by_brand(rnd.randint(1, 50))
+        await facade.search_items(rnd.choice(['پیچ', 'لوله', 'کابل']), limit=20)
+        await asyncio.sleep(0)
+
+async def light_user(facade, user_id, stop, latencies):
+    # Latency counts from when the lookup was due, so time spent waiting for
+    # a blocked loop is included
+    due = time.perf_counter()
+    while not stop.is_set():
+        await facade.get_user_state(user_id)
+        latencies.append((time.perf_counter() - due) * 1000)
+        due = time.perf_counter() + 0.05
+        await asyncio.sleep(0.05)
+
+async def run(mode, n_heavy, n_light, seconds):
+    facade = MODES[mode]
+    monitor = aio.LoopLagMonitor(interval=0.01, window=100000, warn_ms=float('inf'), report_every=0)
+    monitor.start()
+    stop = asyncio.Event()
+    latencies = []
+    tasks = [asyncio.create_task(heavy_user(facade, i, stop)) for i in range(n_heavy)]
+    tasks += [asyncio.create_task(light_user(facade, 1000 + i, stop, latencies)) for i in range(n_light)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    monitor.stop()
+    return monitor.stats(), summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--heavy', type=int, default=4)
+    parser.add_argument('--light', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    with temp_database():
+        seed_catalog(args.items)
+        for mode in MODES:
+            lag, light = asyncio.run(run(mode, args.heavy, args.light, args.seconds))
+            print(f"{mode:>12}: loop lag " + ", ".join(f"{k}={v}" for k, v in lag.items()))
+            print(f"{'':>12}  light users: " + ", ".join(f"{k}={v}" for k, v in light.items()))
+        aio.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Low-stock reads: the trigger-maintained low_stock table vs the old join scan.
+
+Seeds a catalog where ``--low-percent`` of the items are at or below their
+threshold, then times ``get_low_stock_items()``/``get_low_stock_count()``
+against the join over the whole catalog they used to run. Also times
+``set_stock()`` and a threshold change, which now keep low_stock current.
+
+Usage:
+    python benchmarks/bench_low_stock.py [--items 100000] [--low-percent 2] [--repeat 50]
+"""
+
+import argparse
+import random
+import time
+
+from common import db, temp_database, seed_catalog, summarize
+
+OLD_ITEMS_SQL = '''
+    SELECT i.id, i.code, i.custom_code, i.name, i.available_count,
+           c.name, s.name, b.name, m.name, m.low_stock_threshold
+    FROM items i
+    JOIN categories c ON i.category_id = c.id
+    JOIN subcategories s ON i.subcategory_id = s.id
+    JOIN brands b ON i.brand_id = b.id
+    JOIN measure_types m ON i.measure_type_id = m.id
+    WHERE i.available_count <= m.low_stock_threshold
+    ORDER BY i.available_count ASC
+'''
+
+OLD_COUNT_SQL = '''
+    SELECT COUNT(*)
+    FROM items i
+    JOIN measure_types m ON i.measure_type_id = m.id
+    WHERE i.available_count <= m.low_stock_threshold
+'''
+
+def old_low_stock_items():
+    with db.connection() as conn:
+        return conn.execute(OLD_ITEMS_SQL).fetchall()
+
+def old_low_stock_count():
+    with db.connection() as conn:
+        return conn.execute(OLD_COUNT_SQL).fetchone()[0]
+
+def timed(func, repeat, *args):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--low-percent', type=float, default=2)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with temp_database():
+        seed_catalog(args.items)
+        # Seeded stock is above the threshold of 5; put a share of items below it
+        rnd = random.Random(7)
+        low = rnd.sample(range(1, args.items + 1), int(args.items * args.low_percent / 100))
+        with db.transaction() as conn:
+            conn.execute('UPDATE items SET available_count = available_count + 10')
+            conn.executemany('UPDATE items SET available_count = ? WHERE id = ?',
+                             [(rnd.randint(0, 5), item_id) for item_id in low])
+        assert len(db.get_low_stock_items()) == len(old_low_stock_items())
+        print(f"{args.items} items, {db.get_low_stock_count()} low on stock")
+
+        for name, func in [('old join, items', old_low_stock_items),
+                           ('low_stock, items', db.get_low_stock_items),
+                           ('old join, count', old_low_stock_count),
+                           ('low_stock, count', db.get_low_stock_count)]:
+            stats = timed(func, args.repeat)
+            print(f"  {name:>17}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+        stats = timed(lambda: db.set_stock(rnd.randint(1, args.items), rnd.randint(0, 20)), args.repeat * 20)
+        print(f"  {'set_stock':>17}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+        stats = timed(lambda: db.update_measure_type(1, 'واحد 1', rnd.randint(3, 8)), 10)
+        print(f"  {'threshold change':>17}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+if __name__ == '__main__':
+    main()
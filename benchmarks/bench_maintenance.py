@@ -0,0 +1,72 @@
+"""Database maintenance: space reclaimed, plan changes and impact on a writer.
+
+Seeds a catalog, deletes ``--delete`` of its items (the oldest ones, as a
+cleanup would) and runs ``maintenance.run_maintenance(force=True)`` while a
+thread keeps adjusting stock. Reports the file size, WAL size and free
+pages before and after, the duration of each task, the query plans that
+changed after ANALYZE, and the writer's latency before and during the run.
+
+Usage:
+    python benchmarks/bench_maintenance.py [--items 200000] [--delete 0.5]
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from common import db, temp_database, seed_catalog, summarize
+from database import maintenance
+
+def writer(stop, latencies, first_id, last_id):
+    """Adjust stock until ``stop`` is set."""
+    rnd = random.Random(7)
+    while not stop.is_set():
+        start = time.perf_counter()
+        db.adjust_stock(rnd.randint(first_id, last_id), 1, actor='bench')
+        latencies.append((start, (time.perf_counter() - start) * 1000))
+
+def window(latencies, start, end):
+    return summarize([ms for ts, ms in latencies if start <= ts < end])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--delete', type=float, default=0.5, help="Fraction of the items to delete")
+    args = parser.parse_args()
+
+    with temp_database():
+        print(f"Seeding {args.items} items...")
+        seed_catalog(args.items)
+        cut = int(args.items * args.delete)
+        start = time.perf_counter()
+        with db.transaction() as conn:
+            conn.execute('DELETE FROM items WHERE id <= ?', (cut,))
+        print(f"Deleted {cut} items in {time.perf_counter() - start:.1f}s")
+
+        latencies = []
+        stop = threading.Event()
+        thread = threading.Thread(target=writer, args=(stop, latencies, cut + 1, args.items))
+        thread.start()
+        time.sleep(1.0)
+        started = time.perf_counter()
+        report = maintenance.run_maintenance(force=True)
+        finished = time.perf_counter()
+        stop.set()
+        thread.join()
+
+        before, after = report['before'], report['after']
+        print(f"\nfile:       {before['file_bytes'] / 1048576:.1f} -> {after['file_bytes'] / 1048576:.1f} MB")
+        print(f"WAL:        {before['wal_bytes'] / 1048576:.1f} -> {after['wal_bytes'] / 1048576:.1f} MB")
+        print(f"free pages: {before['freelist_pages']} -> {after['freelist_pages']}")
+        for task, result in report['tasks'].items():
+            print(f"  {task:>10}: {result['ms']} ms " + ', '.join(
+                f"{key}={value if key != 'tables' else len(value)}" for key, value in result.items() if key != 'ms'))
+        print(f"{len(report['plan_changes'])} query plan(s) changed after ANALYZE")
+        for change in report['plan_changes']:
+            print(f"  {change['function']}: {' | '.join(change['after'])}")
+        print(f"\nwriter before maintenance: {window(latencies, 0, started)}")
+        print(f"writer during maintenance: {window(latencies, started, finished)}")
+
+if __name__ == '__main__':
+    main()
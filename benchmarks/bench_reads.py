@@ -0,0 +1,81 @@
+"""Read scaling: API-style listing reads on 1..N threads while a writer runs.
+
+Each reader repeatedly fetches a page of items plus its total count, the
+way GET /items does, either through the shared write pool or inside
+``db.reading()`` (the read-only pool the API uses). A writer thread keeps
+committing stock adjustments the whole time. Reports reads per second and
+latency for every thread count.
+
+Usage:
+    python benchmarks/bench_reads.py [--items 50000] [--threads 1,2,4] [--seconds 5]
+"""
+
+import argparse
+import contextlib
+import random
+import threading
+import time
+
+from common import db, temp_database, seed_catalog, summarize
+
+MODES = {
+    'write pool': contextlib.nullcontext,
+    'read-only': db.reading,
+}
+
+def run(mode, n_threads, n_items, seconds):
+    """Run ``n_threads`` readers and one writer; return reader stats."""
+    stop = threading.Event()
+    latencies = []
+    lock = threading.Lock()
+
+    def writer():
+        rnd = random.Random(1)
+        while not stop.is_set():
+            db.adjust_stock(rnd.randint(1, n_items), 1, actor='bench')
+
+    def reader(seed):
+        rnd = random.Random(seed)
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            with MODES[mode]():
+                db.get_items_page(limit=50, filters={'brand_id': rnd.randint(1, 50)})
+                db.count_items({'brand_id': rnd.randint(1, 50)})
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=writer)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    stats = summarize(latencies)
+    stats['reads_per_s'] = round(len(latencies) / seconds)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--threads', default='1,2,4')
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+    thread_counts = [int(n) for n in args.threads.split(',')]
+
+    with temp_database():
+        seed_catalog(args.items)
+        for mode in MODES:
+            for n_threads in thread_counts:
+                stats = run(mode, n_threads, args.items, args.seconds)
+                print(f"{mode:>10}, {n_threads} thread(s): " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+        print("\nRead-only connections:")
+        for row in db.get_connection_stats()['readers']:
+            print(f"  #{row['connection']}: {row['borrows']} reads, avg {row['avg_ms']} ms, max {row['max_ms']} ms")
+
+if __name__ == '__main__':
+    main()
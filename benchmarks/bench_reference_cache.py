@@ -0,0 +1,59 @@
+"""Reference-table lookups of the item wizard, with and without the cache.
+
+Each simulated wizard step saves the user's state and then lists what the
+next keyboard needs (categories, the chosen category's subcategories,
+brands, measure types), the way ``handlers_item.item_create_*`` does. The
+run is repeated with the cache disabled (``DB_REF_CACHE_SIZE=0``) and enabled.
+Every ``--edit-every`` steps a brand is renamed, so the enabled run also
+pays for invalidation. Reports lookup latency and the cache hit rate.
+
+Usage:
+    python benchmarks/bench_reference_cache.py [--steps 20000] [--categories 30] [--edit-every 500]
+"""
+
+import argparse
+import random
+import time
+
+from common import db, temp_database, seed_catalog, summarize
+
+MODES = {
+    'no cache': {'DB_REF_CACHE_SIZE': '0'},
+    'cache': {},
+}
+
+def run(n_steps, n_categories, n_brands, edit_every):
+    """Run the wizard steps; return lookup latency stats."""
+    rnd = random.Random(1)
+    latencies = []
+    for step in range(n_steps):
+        db.set_user_state(step % 50, 'item_create_category', {'step': step})
+        start = time.perf_counter()
+        db.get_all_categories()
+        db.get_subcategories_by_category(rnd.randint(1, n_categories))
+        db.get_all_brands()
+        db.get_all_measure_types()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if edit_every and step % edit_every == 0:
+            db.update_brand(rnd.randint(1, n_brands), f"برند {step}")
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--steps', type=int, default=20000)
+    parser.add_argument('--categories', type=int, default=30)
+    parser.add_argument('--brands', type=int, default=200)
+    parser.add_argument('--edit-every', type=int, default=500)
+    args = parser.parse_args()
+
+    for mode, env in MODES.items():
+        with temp_database(env):
+            seed_catalog(1000, n_categories=args.categories, n_subcategories=args.categories * 8,
+                         n_brands=args.brands)
+            stats = run(args.steps, args.categories, args.brands, args.edit_every)
+            print(f"{mode:>8}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+            if mode == 'cache':
+                print(f"{'':>8}  {db.get_cache_stats()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Search benchmark: FTS5 search_items() vs the old LIKE '%q%' scan.
+
+Usage:
+    python benchmarks/bench_search.py [--items 500000] [--repeat 20]
+"""
+
+import argparse
+import time
+
+from common import db, temp_database, seed_catalog, summarize
+
+QUERIES = ['پیچ', 'لوله مسی', 'C-4242', 'بلبرینگ صنعتی کوچک', 'فیل']
+
+LIKE_SQL = '''
+    SELECT i.id, i.code, i.custom_code, i.name, i.description,
+           c.name, s.name, b.name, m.name, i.available_count, i.video_url,
+           i.created_at, i.updated_at
+    FROM items i
+    JOIN categories c ON i.category_id = c.id
+    JOIN subcategories s ON i.subcategory_id = s.id
+    JOIN brands b ON i.brand_id = b.id
+    JOIN measure_types m ON i.measure_type_id = m.id
+    WHERE i.name LIKE ? OR i.custom_code LIKE ? OR i.description LIKE ?
+    ORDER BY i.created_at DESC
+    LIMIT ?
+'''
+
+def time_call(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    
+    with temp_database():
+        print(f"Seeding {args.items} items...")
+        seed_catalog(args.items)
+        
+        for query in QUERIES:
+            pattern = f"%{query}%"
+            
+            def like():
+                with db.connection() as conn:
+                    conn.execute(LIKE_SQL, (pattern, pattern, pattern, args.limit)).fetchall()
+            
+            def fts():
+                db.search_items(query, limit=args.limit)
+            
+            like_stats = time_call(like, args.repeat)
+            fts_stats = time_call(fts, args.repeat)
+            print(f"{query!r:>24}  matches={db.count_search_items(query):>7}  "
+                  f"LIKE p50={like_stats['p50_ms']:.2f}ms p95={like_stats['p95_ms']:.2f}ms  "
+                  f"FTS p50={fts_stats['p50_ms']:.2f}ms p95={fts_stats['p95_ms']:.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Stats benchmark: get_stats() vs materializing every list and calling len().
+
+Usage:
+    python benchmarks/bench_stats.py [--items 100000] [--repeat 20]
+"""
+
+import argparse
+import time
+
+from common import db, temp_database, seed_catalog, summarize
+
+def stats_from_lists():
+    """What GET /stats used to do."""
+    return {
+        'total_items': len(db.get_all_items()),
+        'total_categories': len(db.get_all_categories()),
+        'total_brands': len(db.get_all_brands()),
+        'low_stock_items': len(db.get_low_stock_items())
+    }
+
+def time_call(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return result, summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    with temp_database():
+        print(f"Seeding {args.items} items...")
+        seed_catalog(args.items)
+        
+        old_result, old_stats = time_call(stats_from_lists, args.repeat)
+        new_result, new_stats = time_call(db.get_stats, args.repeat)
+        assert old_result == new_result, (old_result, new_result)
+        
+        print(f"   lists + len(): p50={old_stats['p50_ms']:.2f}ms p95={old_stats['p95_ms']:.2f}ms")
+        print(f"     get_stats(): p50={new_stats['p50_ms']:.2f}ms p95={new_stats['p95_ms']:.2f}ms")
+        print(f"          result: {new_result}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""Database benchmark suite: every public function of ``database.database``
+at several catalog sizes, with the results saved as JSON.
+
+For each ``--sizes`` value a temporary database is filled by
+``generator.generate()`` (same seed, so runs are comparable) and every
+function in ``CASES`` is called up to ``--repeat`` times or for
+``--budget`` seconds, whichever comes first, after one untimed warm-up call.
+Periodic jobs that visit the whole catalog (``kind='job'``) run once.
+Write cases use their own rows: deletes remove categories, items and images
+created for them beforehand, so every size measures the same work.
+
+Results go to ``benchmarks/results/suite_<time>.json`` (or ``--out``) with
+the generator counts, database size and a latency summary per case.
+``--compare`` prints the p50 change of every case against an earlier file
+and exits with status 1 if any case slowed down by more than
+``--threshold`` (default 25%) and by at least ``--min-ms`` (default
+0.05 ms, below which the difference is timer and scheduler noise).
+
+Usage:
+    python benchmarks/bench_suite.py                         # 1k, 100k and 1M items
+    python benchmarks/bench_suite.py --sizes 1000 100000 --repeat 50
+    python benchmarks/bench_suite.py --sizes 100000 --only search_items get_items_page
+    python benchmarks/bench_suite.py --compare benchmarks/results/suite_20260101_120000.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+from common import db, temp_database, summarize
+from generator import generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# Public functions that are not benchmarked, and why
+SKIPPED = {
+    'get_pool': 'pool accessor', 'get_reader_pool': 'pool accessor', 'get_reference_cache': 'cache accessor',
+    'close_pool': 'shutdown', 'connection': 'context manager', 'reading': 'context manager',
+    'transaction': 'context manager', 'get_connection': 'standalone connection',
+    'get_connection_stats': 'pool statistics', 'get_cache_stats': 'cache statistics',
+    'init_database': 'schema setup', 'create_schema': 'schema setup', 'create_search_index': 'schema setup',
+    'create_row_counters': 'schema setup', 'create_stock_ledger': 'schema setup',
+    'create_low_stock': 'schema setup', 'create_file_deletions': 'schema setup',
+    'create_code_sequences': 'schema setup', 'create_table_versions': 'schema setup',
+    'encode_cursor': 'no database access', 'decode_cursor': 'no database access',
+    'set_trace_callback': 'tracing hook', 'get_trace_callback': 'tracing hook',
+    'get_state_store': 'store accessor', 'get_state_stats': 'store statistics',
+}
+
+# (label, kind, call). Labels are the function name, with the variant in
+# brackets when a function is timed more than once. ``call(c, i)`` makes
+# the i-th call with the ids in the context dict ``c`` (see prepare()).
+CASES = [
+    ('get_all_categories', 'read', lambda c, i: db.get_all_categories()),
+    ('get_category_by_id', 'read', lambda c, i: db.get_category_by_id(c['category_id'])),
+    ('get_all_subcategories', 'read', lambda c, i: db.get_all_subcategories()),
+    ('get_subcategories_by_category', 'read', lambda c, i: db.get_subcategories_by_category(c['category_id'])),
+    ('get_subcategory_by_id', 'read', lambda c, i: db.get_subcategory_by_id(c['subcategory_id'])),
+    ('get_all_brands', 'read', lambda c, i: db.get_all_brands()),
+    ('get_brand_by_id', 'read', lambda c, i: db.get_brand_by_id(c['brand_id'])),
+    ('get_all_measure_types', 'read', lambda c, i: db.get_all_measure_types()),
+    ('get_measure_type_by_id', 'read', lambda c, i: db.get_measure_type_by_id(c['measure_type_id'])),
+    ('get_all_items', 'read', lambda c, i: db.get_all_items()),
+    ('search_items[common]', 'read', lambda c, i: db.search_items(c['common_word'], limit=20)),
+    ('search_items[rare]', 'read', lambda c, i: db.search_items(c['rare_name'], limit=20)),
+    ('count_search_items', 'read', lambda c, i: db.count_search_items(c['common_word'])),
+    ('get_items_by_brand', 'read', lambda c, i: db.get_items_by_brand(c['brand_id'])),
+    ('get_items_by_subcategory', 'read', lambda c, i: db.get_items_by_subcategory(c['subcategory_id'])),
+    ('get_items_page[newest]', 'read', lambda c, i: db.get_items_page(limit=50)),
+    ('get_items_page[next page]', 'read', lambda c, i: db.get_items_page(c['cursor'], limit=50)),
+    ('get_items_page[name]', 'read', lambda c, i: db.get_items_page(limit=50, sort='name')),
+    ('get_items_page[brand]', 'read', lambda c, i: db.get_items_page(limit=50, filters={'brand_id': c['brand_id']})),
+    ('get_items_page[updated since]', 'read',
+     lambda c, i: db.get_items_page(limit=50, filters={'updated_since': c['week_ago']}, sort='updated')),
+    ('count_items', 'read', lambda c, i: db.count_items()),
+    ('count_items[brand]', 'read', lambda c, i: db.count_items({'brand_id': c['brand_id']})),
+    ('get_item_by_id', 'read', lambda c, i: db.get_item_by_id(c['items'][i])),
+    ('get_low_stock_items', 'read', lambda c, i: db.get_low_stock_items()),
+    ('get_low_stock_count', 'read', lambda c, i: db.get_low_stock_count()),
+    ('get_item_images', 'read', lambda c, i: db.get_item_images(c['items'][i])),
+    ('get_user_state', 'read', lambda c, i: db.get_user_state(c['users'][i])),
+    ('is_user_authenticated', 'read', lambda c, i: db.is_user_authenticated(c['users'][i])),
+    ('get_authenticated_users_count', 'read', lambda c, i: db.get_authenticated_users_count()),
+    ('get_row_count', 'read', lambda c, i: db.get_row_count('items')),
+    ('get_stats', 'read', lambda c, i: db.get_stats()),
+    ('get_stock_balance', 'read', lambda c, i: db.get_stock_balance(c['items'][i])),
+    ('get_stock_history', 'read', lambda c, i: db.get_stock_history(c['items'][i])),
+    ('get_stock_as_of', 'read', lambda c, i: db.get_stock_as_of(c['week_ago'])),
+    ('get_referenced_image_paths', 'read', lambda c, i: db.get_referenced_image_paths(c['image_paths'])),
+    ('get_pending_file_deletions', 'read', lambda c, i: db.get_pending_file_deletions()),
+    ('get_pending_file_deletion_count', 'read', lambda c, i: db.get_pending_file_deletion_count()),
+    ('get_image_file_names', 'read', lambda c, i: db.get_image_file_names(db.IMAGES_DIR)),
+
+    ('allocate_codes', 'write', lambda c, i: db.allocate_codes('ITM')),
+    ('create_category', 'write', lambda c, i: db.create_category(f'دسته محک {i}')),
+    ('update_category', 'write', lambda c, i: db.update_category(c['spare_categories'][i], f'دسته ویرایش {i}')),
+    ('create_subcategory', 'write',
+     lambda c, i: db.create_subcategory(f'زیردسته محک {i}', None, c['category_id'])),
+    ('update_subcategory', 'write',
+     lambda c, i: db.update_subcategory(c['spare_subcategories'][i], f'زیردسته ویرایش {i}')),
+    ('create_brand', 'write', lambda c, i: db.create_brand(f'برند محک {i}')),
+    ('update_brand', 'write', lambda c, i: db.update_brand(c['spare_brands'][i], f'برند ویرایش {i}')),
+    ('create_measure_type', 'write', lambda c, i: db.create_measure_type(f'واحد محک {i}', None, 5)),
+    ('update_measure_type', 'write',
+     lambda c, i: db.update_measure_type(c['spare_measure_types'][i], f'واحد ویرایش {i}', 3)),
+    ('create_item', 'write',
+     lambda c, i: db.create_item(f'کالای محک {i}', None, f'BENCH-{i}', c['category_id'], c['subcategory_id'],
+                                 c['brand_id'], c['measure_type_id'], 'توضیحات', 10)),
+    ('update_item', 'write',
+     lambda c, i: db.update_item(c['items'][i], f'کالای ویرایش {i}', f'EDIT-{i}', c['category_id'],
+                                 c['subcategory_id'], c['brand_id'], c['measure_type_id'], 'توضیحات', 20)),
+    ('update_item_fields', 'write',
+     lambda c, i: db.update_item_fields(c['items'][i], actor='bench', description=f'توضیحات {i}')),
+    ('adjust_stock', 'write', lambda c, i: db.adjust_stock(c['items'][i], 1, actor='bench')),
+    ('set_stock', 'write', lambda c, i: db.set_stock(c['items'][i], 42, actor='bench')),
+    ('add_item_image', 'write',
+     lambda c, i: db.add_item_image(c['items'][i], os.path.join(db.IMAGES_DIR, f'bench_{i}.jpg'))),
+    ('set_user_state', 'write',
+     lambda c, i: db.set_user_state(c['users'][i], 'item_create_name', {'category_id': c['category_id']})),
+    ('clear_user_state', 'write', lambda c, i: db.clear_user_state(c['users'][i])),
+    ('authenticate_user', 'write', lambda c, i: db.authenticate_user(c['new_users'][i], 'bench', 'کاربر')),
+    ('queue_file_deletions', 'write',
+     lambda c, i: db.queue_file_deletions([os.path.join(db.IMAGES_DIR, f'stray_{i}.jpg')])),
+    ('finish_file_deletions', 'write', lambda c, i: db.finish_file_deletions([c['pending'][i]])),
+    ('delete_item_image', 'write', lambda c, i: db.delete_item_image(c['spare_images'][i])),
+    ('delete_item', 'write', lambda c, i: db.delete_item(c['spare_items'][i])),
+    ('delete_subcategory', 'write', lambda c, i: db.delete_subcategory(c['spare_subcategories'][i])),
+    ('delete_category', 'write', lambda c, i: db.delete_category(c['spare_categories'][i])),
+    ('delete_brand', 'write', lambda c, i: db.delete_brand(c['spare_brands'][i])),
+    ('delete_measure_type', 'write', lambda c, i: db.delete_measure_type(c['spare_measure_types'][i])),
+
+    ('take_stock_snapshots', 'job', lambda c, i: db.take_stock_snapshots()),
+    ('reconcile_stock', 'job', lambda c, i: db.reconcile_stock()),
+    ('compact_stock_movements', 'job', lambda c, i: db.compact_stock_movements(c['week_ago'])),
+]
+
+def check_coverage():
+    """Public database functions that are neither in CASES nor in SKIPPED."""
+    public = {name for name, value in vars(db).items()
+              if callable(value) and not name.startswith('_') and getattr(value, '__module__', None) == db.__name__}
+    covered = {label.split('[')[0] for label, _, _ in CASES}
+    return sorted(public - covered - set(SKIPPED))
+
+def prepare(n_calls, seed=7):
+    """Build the ids the cases use, and the rows the update and delete cases consume."""
+    rnd = random.Random(seed)
+    with db.connection() as conn:
+        n_items = conn.execute('SELECT MAX(id) FROM items').fetchone()[0]
+        rare_name = conn.execute('SELECT name FROM items WHERE id = ?', (n_items // 2,)).fetchone()[0]
+        brand_id = conn.execute('SELECT brand_id FROM items WHERE id = ?', (n_items // 3,)).fetchone()[0]
+        item = conn.execute('SELECT category_id, subcategory_id, measure_type_id FROM items WHERE id = 1').fetchone()
+        users = [row[0] for row in conn.execute('SELECT user_id FROM user_states ORDER BY user_id')]
+        image_paths = [row[0] for row in conn.execute('SELECT image_path FROM item_images LIMIT 50')]
+    c = {
+        'category_id': item[0], 'subcategory_id': item[1], 'brand_id': brand_id, 'measure_type_id': item[2],
+        'items': [rnd.randint(1, n_items) for _ in range(n_calls)],
+        'users': [users[n % len(users)] for n in range(n_calls)],
+        'new_users': [900000000 + n for n in range(n_calls)],
+        'common_word': 'پیچ',
+        'rare_name': rare_name,
+        'week_ago': int(time.time()) - 7 * 86400,
+        'image_paths': image_paths + [os.path.join(db.IMAGES_DIR, 'missing.jpg')],
+    }
+    c['cursor'] = db.get_items_page(limit=50)[1]
+
+    spare_category = db.create_category('دسته یدکی محک')
+    c['spare_categories'] = [db.create_category(f'دسته یدکی {n}') for n in range(n_calls)]
+    c['spare_subcategories'] = [db.create_subcategory(f'زیردسته یدکی {n}', None, spare_category)
+                                for n in range(n_calls)]
+    c['spare_brands'] = [db.create_brand(f'برند یدکی {n}') for n in range(n_calls)]
+    c['spare_measure_types'] = [db.create_measure_type(f'واحد یدکی {n}', None, 1) for n in range(n_calls)]
+    c['spare_items'] = [
+        db.create_item(f'کالای یدکی {n}', None, f'SPARE-{n}', c['category_id'], c['subcategory_id'],
+                       c['brand_id'], c['measure_type_id'], None, 1)
+        for n in range(n_calls)
+    ]
+    for n in range(n_calls):
+        db.add_item_image(c['spare_items'][0], os.path.join(db.IMAGES_DIR, f'spare_{n}.jpg'))
+    c['spare_images'] = [image.id for image in db.get_item_images(c['spare_items'][0])]
+    c['spare_items'] = c['spare_items'][1:] + [c['spare_items'][0]]
+    db.queue_file_deletions([os.path.join(db.IMAGES_DIR, f'pending_{n}.jpg') for n in range(n_calls)])
+    c['pending'] = [row.id for row in db.get_pending_file_deletions(limit=n_calls, max_attempts=100)]
+    return c
+
+def run_case(call, kind, c, repeat, budget):
+    """Time one case. The warm-up call uses index 0, timed calls 1..repeat."""
+    rows = call(c, 0)
+    latencies = []
+    calls = 1 if kind == 'job' else repeat
+    deadline = time.perf_counter() + budget
+    for i in range(1, calls + 1):
+        start = time.perf_counter()
+        call(c, i)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() > deadline:
+            break
+    result = summarize(latencies)
+    # get_items_page() returns (items, next cursor)
+    if isinstance(rows, tuple) and rows and isinstance(rows[0], list):
+        rows = rows[0]
+    if isinstance(rows, (list, set)):
+        result['rows'] = len(rows)
+    return result
+
+def run_size(n_items, args):
+    """Generate a catalog of ``n_items`` and time every case on it."""
+    with temp_database() as path:
+        start = time.perf_counter()
+        counts = generate(n_items, seed=args.seed)
+        generate_seconds = time.perf_counter() - start
+        c = prepare(args.repeat + 1)
+        print(f"\n{n_items} items: generated in {generate_seconds:.1f}s, "
+              f"{os.path.getsize(path) / 1048576:.1f} MB")
+        results = {}
+        for label, kind, call in CASES:
+            if args.only and label.split('[')[0] not in args.only:
+                continue
+            try:
+                results[label] = run_case(call, kind, c, args.repeat, args.budget)
+            except Exception as e:
+                results[label] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"  {label:>34}: ❌ {results[label]['error']}")
+                continue
+            stats = results[label]
+            print(f"  {label:>34}: p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  "
+                  f"({stats['count']} calls{', %d rows' % stats['rows'] if 'rows' in stats else ''})")
+        return {
+            'counts': counts,
+            'generate_seconds': round(generate_seconds, 1),
+            'database_bytes': os.path.getsize(path),
+            'results': results,
+        }
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(previous, current, threshold, min_ms):
+    """Print the p50 change of every case present in both runs. Returns the number of regressions."""
+    regressions = 0
+    print(f"\nCompared with {previous.get('started')} ({previous.get('commit')}):")
+    for size, run in current['sizes'].items():
+        old_run = previous.get('sizes', {}).get(size)
+        if not old_run:
+            continue
+        print(f"  {size} items")
+        for label, stats in run['results'].items():
+            old = old_run['results'].get(label)
+            if not old or 'p50_ms' not in old or 'p50_ms' not in stats:
+                continue
+            change = (stats['p50_ms'] - old['p50_ms']) / old['p50_ms'] if old['p50_ms'] else 0.0
+            slower = change > threshold and stats['p50_ms'] - old['p50_ms'] >= min_ms
+            regressions += slower
+            print(f"    {'❌' if slower else '  '} {label:>34}: {old['p50_ms']:>9.3f} -> {stats['p50_ms']:>9.3f} ms "
+                  f"({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=30, help="Timed calls per case")
+    parser.add_argument('--budget', type=float, default=2.0, help="Seconds per case before stopping early")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='+', help="Only these functions")
+    parser.add_argument('--out', help="JSON file to write (default benchmarks/results/suite_<time>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare with")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Slowdown counted as a regression")
+    parser.add_argument('--min-ms', type=float, default=0.05, help="Smallest p50 increase counted as a regression")
+    args = parser.parse_args()
+
+    missing = check_coverage()
+    if missing:
+        print(f"⚠️ Not benchmarked: {', '.join(missing)}")
+
+    report = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'args': {'repeat': args.repeat, 'budget': args.budget, 'seed': args.seed},
+        'sizes': {},
+    }
+    for n_items in args.sizes:
+        report['sizes'][str(n_items)] = run_size(n_items, args)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"suite_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Results written to {out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        if compare(previous, report, args.threshold, args.min_ms):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Epoch timestamps: "changed since" range queries and Shamsi formatting cost.
+
+Times listing the items changed in the last ``--window`` seconds through
+``get_items_page(filters={'updated_since': ...}, sort='updated')`` (an
+index range scan on updated_ts) against the same filter on the Shamsi
+``updated_at`` text, which has no index and has to scan every item. Also
+times formatting the current time for a write with jdatetime directly vs
+the cached ``utils.timestamp_to_shamsi``.
+
+Usage:
+    python benchmarks/bench_timestamps.py [--items 200000] [--window 3600] [--repeat 20]
+"""
+
+import argparse
+import time
+
+import jdatetime
+
+from common import db, temp_database, seed_catalog, summarize
+from database import utils
+
+TEXT_SQL = '''
+    SELECT i.id, i.code, i.custom_code, i.name, i.description,
+           c.name, s.name, b.name, m.name, i.available_count, i.video_url,
+           i.created_at, i.updated_at
+    FROM items i
+    JOIN categories c ON i.category_id = c.id
+    JOIN subcategories s ON i.subcategory_id = s.id
+    JOIN brands b ON i.brand_id = b.id
+    JOIN measure_types m ON i.measure_type_id = m.id
+    WHERE i.updated_at >= ?
+    ORDER BY i.updated_at, i.id
+    LIMIT ?
+'''
+
+def timed(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--window', type=int, default=3600, help="Seconds back to list changes from")
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with temp_database():
+        seed_catalog(args.items)
+        since = int(time.time()) - args.window
+        since_text = utils.timestamp_to_shamsi(since)
+
+        def by_text():
+            with db.connection() as conn:
+                return conn.execute(TEXT_SQL, (since_text, args.limit)).fetchall()
+
+        def by_epoch():
+            return db.get_items_page(limit=args.limit, filters={'updated_since': since}, sort='updated')[0]
+
+        assert [row[0] for row in by_text()] == [item.id for item in by_epoch()]
+        print(f"{args.items} items, {db.count_items({'updated_since': since})} changed in the last {args.window}s")
+        for name, func in [('updated_at text', by_text), ('updated_ts index', by_epoch)]:
+            print(f"  {name:>17}: " + ", ".join(f"{k}={v}" for k, v in timed(func, args.repeat).items()))
+
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+    direct_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for _ in range(n):
+        utils.timestamp_to_shamsi(int(time.time()))
+    cached_us = (time.perf_counter() - start) / n * 1e6
+    print(f"Formatting the current time: jdatetime {direct_us:.1f} us, cached formatter {cached_us:.2f} us")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Conversation states: user_states round-trips vs the write-behind store.
+
+Simulates ``--users`` bot users on one asyncio loop, each sending
+``--messages`` messages. Every message reads the user's state and moves the
+wizard one step (``set_user_state``), like ``handle_text_message`` and the
+item wizard do, through ``database.aio``. Runs once with the store off
+(``DB_STATE_CACHE_SIZE=0``: a query per read and a group-committed write
+per step) and once with it on. Reports the latency of one message, the
+loop lag and the rows written to ``user_states``.
+
+Usage:
+    python benchmarks/bench_user_state.py [--users 50] [--messages 200]
+"""
+
+import argparse
+import asyncio
+import time
+
+from common import db, temp_database, summarize
+from database import aio
+
+MODES = {
+    'direct': {'DB_STATE_CACHE_SIZE': '0'},
+    'write-behind': {},
+}
+
+async def user(user_id, n_messages, latencies):
+    for n in range(n_messages):
+        start = time.perf_counter()
+        state, data = await aio.get_user_state(user_id)
+        step = data.get('step', 0) + 1
+        await aio.set_user_state(user_id, 'item_create_name', {'category_id': 3, 'brand_id': 7, 'step': step})
+        latencies.append((time.perf_counter() - start) * 1000)
+        # Users take a moment between messages
+        await asyncio.sleep(0.001)
+
+async def run(n_users, n_messages):
+    monitor = aio.LoopLagMonitor(interval=0.01, report_every=0)
+    monitor.start()
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(user(100000 + n, n_messages, latencies) for n in range(n_users)))
+    elapsed = time.perf_counter() - start
+    monitor.stop()
+    return latencies, elapsed, monitor.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=200)
+    args = parser.parse_args()
+
+    for mode, env in MODES.items():
+        with temp_database(env):
+            latencies, elapsed, lag = asyncio.run(run(args.users, args.messages))
+            aio.shutdown()
+            store = db.get_state_store()
+            # Write what is pending, then check every user's last step was kept
+            db.close_pool()
+            stats = store.stats() if store is not None else None
+            with db.connection() as conn:
+                steps = {row[0] for row in conn.execute("SELECT json_extract(data, '$.step') FROM user_states")}
+        messages = args.users * args.messages
+        written = (f"{stats['rows_written']} rows written in {stats['flushes']} flushes" if stats
+                   else f"{messages} rows written, one per step")
+        print(f"{mode:>12}: {messages / elapsed:8.0f} messages/s, per message {summarize(latencies)}")
+        print(f"{'':>12}  loop lag p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms; {written}; "
+              f"final steps {sorted(steps)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Shared helpers for the database benchmarks."""
+
+import os
+import sys
+import shutil
+import time
+import random
+import tempfile
+import contextlib
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import jdatetime
+from database import database as db
+
+# Words used to build varied item names and descriptions
+WORDS = [
+    'پیچ', 'مهره', 'واشر', 'لوله', 'شیر', 'کابل', 'سیم', 'کلید', 'پریز', 'لامپ',
+    'فیلتر', 'تسمه', 'بلبرینگ', 'چسب', 'رنگ', 'قفل', 'لولا', 'دستگیره', 'پمپ', 'موتور',
+    'فولادی', 'برنجی', 'پلاستیکی', 'مسی', 'استیل', 'گالوانیزه', 'صنعتی', 'خانگی', 'کوچک', 'بزرگ',
+]
+
+@contextlib.contextmanager
+def temp_database(env=None):
+    """Point the database module at a fresh, empty database in a temp directory.
+
+    ``env`` sets extra environment variables (e.g. the DB_* PRAGMA profile)
+    for the duration of the block; they are read when the pool is created.
+    """
+    env = env or {}
+    saved_env = {key: os.environ.get(key) for key in env}
+    saved_file = db.DATABASE_FILE
+    tmp_dir = tempfile.mkdtemp(prefix='warehouse_bench_')
+    
+    os.environ.update(env)
+    db.close_pool()
+    db.DATABASE_FILE = os.path.join(tmp_dir, 'warehouse.db')
+    try:
+        db.init_database()
+        yield db.DATABASE_FILE
+    finally:
+        db.close_pool()
+        db.DATABASE_FILE = saved_file
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def seed_catalog(n_items, n_categories=10, n_subcategories=50, n_brands=50, n_measure_types=5, seed=42):
+    """Insert a simple catalog of ``n_items`` items in one transaction."""
+    rnd = random.Random(seed)
+    base = jdatetime.datetime.now()
+    base_ts = int(time.time())
+    fmt = "%Y/%m/%d %H:%M:%S"
+    now = base.strftime(fmt)
+    
+    with db.transaction() as conn:
+        conn.executemany(
+            'INSERT INTO categories (code, name, created_at) VALUES (?, ?, ?)',
+            [(f"CAT{i:06d}", f"دسته {i}", now) for i in range(1, n_categories + 1)]
+        )
+        conn.executemany(
+            'INSERT INTO subcategories (code, name, category_id, created_at) VALUES (?, ?, ?, ?)',
+            [(f"SUB{i:06d}", f"زیردسته {i}", (i % n_categories) + 1, now)
+             for i in range(1, n_subcategories + 1)]
+        )
+        conn.executemany(
+            'INSERT INTO brands (code, name, created_at) VALUES (?, ?, ?)',
+            [(f"BRD{i:06d}", f"برند {i}", now) for i in range(1, n_brands + 1)]
+        )
+        conn.executemany(
+            'INSERT INTO measure_types (code, name, low_stock_threshold, created_at) VALUES (?, ?, ?, ?)',
+            [(f"MSR{i:06d}", f"واحد {i}", 5, now) for i in range(1, n_measure_types + 1)]
+        )
+        
+        def rows():
+            for i in range(1, n_items + 1):
+                subcategory_id = rnd.randint(1, n_subcategories)
+                created_at = (base - timedelta(seconds=n_items - i)).strftime(fmt)
+                name = f"{rnd.choice(WORDS)} {rnd.choice(WORDS)} {i}"
+                description = ' '.join(rnd.choice(WORDS) for _ in range(6))
+                yield (
+                    f"ITM{i:09d}", f"C-{i}", name, description,
+                    ((subcategory_id - 1) % n_categories) + 1, subcategory_id,
+                    rnd.randint(1, n_brands), rnd.randint(1, n_measure_types),
+                    rnd.randint(0, 100), None, created_at, created_at,
+                    base_ts - (n_items - i), base_ts - (n_items - i)
+                )
+        
+        conn.executemany(
+            '''INSERT INTO items (code, custom_code, name, description, category_id, subcategory_id,
+               brand_id, measure_type_id, available_count, video_url, created_at, updated_at,
+               created_ts, updated_ts)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            rows()
+        )
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(latencies_ms):
+    """Summarize a list of latencies in milliseconds."""
+    return {
+        'count': len(latencies_ms),
+        'p50_ms': round(percentile(latencies_ms, 50), 3),
+        'p95_ms': round(percentile(latencies_ms, 95), 3),
+        'p99_ms': round(percentile(latencies_ms, 99), 3),
+        'max_ms': round(max(latencies_ms), 3) if latencies_ms else 0.0,
+    }
@@ -0,0 +1,199 @@
+"""Seeded synthetic catalog for benchmarks and manual testing.
+
+``generate(n_items)`` fills the current database (``db.DATABASE_FILE``) with
+a catalog that looks like a real one: Persian category, subcategory, brand,
+measure type and item names, descriptions, stock levels with some items
+below their low-stock threshold, 0-3 images per item, bot users with
+conversation states, and creation/update times spread over the past year.
+Items go in through ``bulk_import_items()``, so codes, the stock ledger,
+the search index and the counters are filled the same way as in production.
+The same ``seed`` always produces the same database.
+
+The number of categories, subcategories and brands grows with the number of
+items (see ``default_counts()``).
+
+Usage (writes a new database file, e.g. to try the bot on a big catalog):
+    python benchmarks/generator.py --items 100000 --out /tmp/warehouse.db
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import database as db
+from database import utils
+from database.bulk_import import bulk_import_items
+
+CATEGORY_NAMES = [
+    'ابزار دستی', 'ابزار برقی', 'لوازم برقی', 'لوله و اتصالات', 'شیرآلات', 'رنگ و چسب',
+    'یراق‌آلات', 'ایمنی و حفاظت', 'روشنایی', 'پیچ و مهره', 'قطعات خودرو', 'باغبانی',
+    'بهداشتی', 'جوشکاری', 'ابزار اندازه‌گیری', 'کابل و سیم', 'تهویه', 'ابزار بادی',
+]
+
+BRAND_PREFIXES = ['پارس', 'ایران', 'آریا', 'البرز', 'کاوه', 'سپهر', 'نوین', 'پیشرو', 'توس', 'زاگرس',
+                  'دماوند', 'کیان', 'مهر', 'آسیا', 'سینا', 'رازی']
+BRAND_SUFFIXES = ['صنعت', 'تک', 'ابزار', 'الکتریک', 'پلاست', 'فلز', 'گستر', 'سازه']
+
+# (name, low stock threshold)
+MEASURE_TYPES = [('عدد', 10), ('کیلوگرم', 5), ('متر', 20), ('لیتر', 5), ('بسته', 3), ('جعبه', 2),
+                 ('رول', 2), ('دستگاه', 1)]
+
+NOUNS = ['پیچ', 'مهره', 'واشر', 'لوله', 'شیر', 'کابل', 'سیم', 'کلید', 'پریز', 'لامپ', 'فیلتر', 'تسمه',
+         'بلبرینگ', 'چسب', 'رنگ', 'قفل', 'لولا', 'دستگیره', 'پمپ', 'موتور', 'اره', 'چکش', 'آچار',
+         'انبر', 'دریل', 'سنباده', 'متر', 'تراز', 'بست', 'زانویی']
+ADJECTIVES = ['فولادی', 'برنجی', 'پلاستیکی', 'مسی', 'استیل', 'گالوانیزه', 'صنعتی', 'خانگی', 'کوچک',
+              'بزرگ', 'سنگین', 'سبک', 'ضدزنگ', 'حرفه‌ای', 'شش‌گوش', 'قابل تنظیم']
+DESCRIPTION_WORDS = NOUNS + ADJECTIVES + ['مناسب', 'برای', 'مصارف', 'کارگاهی', 'ساختمانی', 'با', 'کیفیت',
+                                          'بالا', 'دوام', 'زیاد', 'بسته‌بندی', 'اصلی', 'وارداتی', 'تولید', 'داخل']
+
+# Conversation states the bot stores, with the data it keeps for each
+USER_STATES = [
+    ('item_create_name', {'category_id': 1, 'subcategory_id': 1, 'brand_id': 1}),
+    ('item_create_images', {'item_id': 1, 'item_name': 'پیچ فولادی', 'image_count': 2}),
+    ('item_search', {}),
+    ('brand_create_name', {}),
+    ('item_adjust_stock', {'item_id': 1, 'page': 3}),
+]
+
+def default_counts(n_items):
+    """Reference-table sizes for a catalog of ``n_items`` items."""
+    categories = min(len(CATEGORY_NAMES) * 3, max(5, n_items // 20000))
+    return {
+        'categories': categories,
+        'subcategories': categories * min(20, max(4, n_items // (2000 * categories))),
+        'brands': min(2000, max(10, n_items // 500)),
+        'measure_types': len(MEASURE_TYPES),
+        'users': min(10000, max(20, n_items // 100)),
+    }
+
+def _category_names(count):
+    names = []
+    for i in range(count):
+        base = CATEGORY_NAMES[i % len(CATEGORY_NAMES)]
+        names.append(base if i < len(CATEGORY_NAMES) else f'{base} {i // len(CATEGORY_NAMES) + 1}')
+    return names
+
+def _brand_names(count):
+    combos = [f'{prefix} {suffix}' for suffix in BRAND_SUFFIXES for prefix in BRAND_PREFIXES]
+    return [combos[i % len(combos)] + ('' if i < len(combos) else f' {i // len(combos) + 1}')
+            for i in range(count)]
+
+def _subcategory_names(rnd, categories, per_category):
+    """``per_category`` distinct subcategory names for each category."""
+    combos = [f'{noun} {adjective}' for noun in NOUNS for adjective in ADJECTIVES]
+    return {category: rnd.sample(combos, per_category) for category in categories}
+
+def iter_items(n_items, counts, seed=42):
+    """Yield ``n_items`` item rows in the format bulk_import_items() takes."""
+    rnd = random.Random(seed)
+    categories = _category_names(counts['categories'])
+    subcategories = _subcategory_names(rnd, categories, counts['subcategories'] // counts['categories'])
+    brands = _brand_names(counts['brands'])
+    for i in range(1, n_items + 1):
+        category = rnd.choice(categories)
+        measure_type, threshold = rnd.choice(MEASURE_TYPES)
+        # About one item in ten is at or below its low-stock threshold
+        available = rnd.randint(0, threshold) if rnd.random() < 0.1 else rnd.randint(threshold + 1, 500)
+        yield {
+            'name': f'{rnd.choice(NOUNS)} {rnd.choice(ADJECTIVES)} مدل {rnd.randint(100, 999)}-{i}',
+            'custom_code': f'C-{i:07d}',
+            'category': category,
+            'subcategory': rnd.choice(subcategories[category]),
+            'brand': rnd.choice(brands),
+            'measure_type': measure_type,
+            'low_stock_threshold': threshold,
+            'description': ' '.join(rnd.choice(DESCRIPTION_WORDS) for _ in range(rnd.randint(4, 14))),
+            'available_count': available,
+        }
+
+def _shamsi(timestamp, dates):
+    """utils.timestamp_to_shamsi() with the date part looked up once per local day."""
+    local = time.localtime(timestamp)
+    key = (local.tm_year, local.tm_yday)
+    if key not in dates:
+        dates[key] = utils.timestamp_to_shamsi(timestamp)[:10]
+    return f'{dates[key]} {local.tm_hour:02d}:{local.tm_min:02d}:{local.tm_sec:02d}'
+
+def _spread_timestamps(conn, days, seed):
+    """Spread created_ts over the last ``days`` days in id order and move
+    updated_ts of about a third of the items to a later time."""
+    now = int(time.time())
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM items').fetchone()[0]
+    if not last_id:
+        return
+    step = days * 86400 / last_id
+    rnd = random.Random(seed)
+    dates = {}
+    rows = []
+    for item_id in range(1, last_id + 1):
+        created = now - int((last_id - item_id) * step)
+        updated = rnd.randint(created, now) if rnd.random() < 0.33 else created
+        rows.append((created, updated, _shamsi(created, dates), _shamsi(updated, dates), item_id))
+    conn.executemany('UPDATE items SET created_ts = ?, updated_ts = ?, created_at = ?, updated_at = ? WHERE id = ?',
+                     rows)
+
+def generate(n_items, seed=42, counts=None, max_images=3, days=365, batch_size=5000):
+    """Fill the current database with a synthetic catalog. Returns what was inserted, by table."""
+    counts = dict(default_counts(n_items), **(counts or {}))
+    rnd = random.Random(seed + 1)
+    report = bulk_import_items(iter_items(n_items, counts, seed), batch_size=batch_size)
+    if report.errors:
+        raise RuntimeError(f"Generated rows were rejected: {report.errors[:3]}")
+
+    now = utils.timestamp_to_shamsi(int(time.time()))
+    with db.transaction() as conn:
+        _spread_timestamps(conn, days, seed)
+        item_ids = [row[0] for row in conn.execute('SELECT id FROM items')]
+        images = [
+            (item_id, os.path.join(db.IMAGES_DIR, f'item_{item_id}_{n}.jpg'), now)
+            for item_id in item_ids
+            for n in range(rnd.randint(0, max_images))
+        ]
+        conn.executemany('INSERT INTO item_images (item_id, image_path, created_at) VALUES (?, ?, ?)', images)
+        users = [100000 + n for n in range(counts['users'])]
+        states = []
+        for user_id in users:
+            state, data = rnd.choice(USER_STATES)
+            states.append((user_id, state, json.dumps(data)))
+        conn.executemany('INSERT INTO user_states (user_id, state, data) VALUES (?, ?, ?)', states)
+        conn.executemany(
+            'INSERT INTO authenticated_users (user_id, username, first_name, last_name, authenticated_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(user_id, f'user{user_id}', 'کاربر', str(user_id), now) for user_id in users]
+        )
+    return {
+        'categories': report.created['categories'],
+        'subcategories': report.created['subcategories'],
+        'brands': report.created['brands'],
+        'measure_types': report.created['measure_types'],
+        'items': report.inserted,
+        'item_images': len(images),
+        'user_states': len(states),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-images', type=int, default=3, help="Images per item are 0..N")
+    parser.add_argument('--out', required=True, help="New database file to create")
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        print(f"❌ {args.out} already exists")
+        sys.exit(1)
+    db.DATABASE_FILE = os.path.abspath(args.out)
+    db.init_database()
+    start = time.perf_counter()
+    inserted = generate(args.items, args.seed, max_images=args.max_images)
+    db.close_pool()
+    print(f"✅ Generated {args.out} in {time.perf_counter() - start:.1f}s: "
+          + ', '.join(f"{count} {table}" for table, count in inserted.items()))
+
+if __name__ == '__main__':
+    main()
@@ -16,7 +16,10 @@ from telegram.ext import (
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from database import database as db
+from database import aio as db
+from database import close_pool
+from database import maintenance
+from database import instrument
 from bot import messages as msg
 from bot import handlers_category as cat_handlers
 from bot import handlers_subcategory as subcat_handlers
@@ -39,12 +42,15 @@ logger = logging.getLogger(__name__)
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 BOT_PASSWORD = os.getenv('BOT_PASSWORD', 'ciFarco@1213#3221')  # Default password
 
+# Logs when a handler blocks the event loop, plus a lag summary every 5 minutes
+loop_lag = db.LoopLagMonitor()
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command - check authentication or show main menu."""
     user_id = update.effective_user.id
     
     # Check if user is already authenticated
-    if db.is_user_authenticated(user_id):
+    if await db.is_user_authenticated(user_id):
         keyboard = [
             [InlineKeyboardButton(msg.BTN_ITEMS, callback_data='item_menu')],
             [InlineKeyboardButton(msg.BTN_LOW_STOCK, callback_data='low_stock_list')],
@@ -54,9 +60,45 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(msg.MAIN_MENU, reply_markup=reply_markup)
     else:
         # Ask for password
-        db.set_user_state(user_id, 'AWAITING_PASSWORD')
+        await db.set_user_state(user_id, 'AWAITING_PASSWORD')
         await update.message.reply_text(msg.AUTH_REQUEST)
 
+async def db_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /dbstats command - show the slowest database functions (needs DB_INSTRUMENT=1)."""
+    if not await db.is_user_authenticated(update.effective_user.id):
+        await update.message.reply_text(msg.AUTH_REQUIRED)
+        return
+
+    stats = instrument.get_stats(slow_limit=5)
+    if not stats['enabled']:
+        await update.message.reply_text(msg.DB_STATS_DISABLED)
+        return
+    if not stats['functions']:
+        await update.message.reply_text(msg.DB_STATS_EMPTY)
+        return
+
+    lines = [msg.DB_STATS_HEADER.format(f"{stats['slow_ms']:g}")]
+    for name, function in list(stats['functions'].items())[:10]:
+        lines.append(msg.DB_STATS_FUNCTION.format(
+            name,
+            function['calls'],
+            f"{function['total_ms']:.1f}",
+            function['p50_ms'],
+            function['p95_ms'],
+            function['p99_ms'],
+            function['rows_per_call'],
+            function['slow']
+        ))
+    if stats['slow_queries']:
+        lines.append("\n".join([msg.DB_STATS_SLOW] + [
+            msg.DB_STATS_SLOW_ITEM.format(entry['function'], f"{entry['ms']:.1f}") for entry in stats['slow_queries']
+        ]))
+
+    message_text = "\n\n".join(lines)
+    if len(message_text) > 4000:
+        message_text = message_text[:4000]
+    await update.message.reply_text(message_text)
+
 async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show main menu."""
     query = update.callback_query
@@ -90,7 +132,7 @@ async def initial_settings_menu(update: Update, context: ContextTypes.DEFAULT_TY
 async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text messages based on user state."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     # Check for authentication state first
     if state == 'AWAITING_PASSWORD':
@@ -98,13 +140,13 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         if password == BOT_PASSWORD:
             # Authenticate user
             user = update.effective_user
-            db.authenticate_user(
+            await db.authenticate_user(
                 user_id=user.id,
                 username=user.username,
                 first_name=user.first_name,
                 last_name=user.last_name
             )
-            db.clear_user_state(user_id)
+            await db.clear_user_state(user_id)
             
             # Show success message and main menu
             keyboard = [
@@ -122,7 +164,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     
     # Check if user is authenticated for all other operations
-    if not db.is_user_authenticated(user_id):
+    if not await db.is_user_authenticated(user_id):
         await update.message.reply_text(msg.AUTH_REQUIRED)
         return
     
@@ -182,11 +224,11 @@ async def handle_photo_message(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = update.effective_user.id
     
     # Check if user is authenticated
-    if not db.is_user_authenticated(user_id):
+    if not await db.is_user_authenticated(user_id):
         await update.message.reply_text(msg.AUTH_REQUIRED)
         return
     
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state == 'item_create_images':
         await item_handlers.item_create_handle_photo(update, context)
@@ -207,7 +249,7 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
     user_id = update.effective_user.id
     
     # Check if user is authenticated
-    if not db.is_user_authenticated(user_id):
+    if not await db.is_user_authenticated(user_id):
         await query.answer()
         await query.message.reply_text(msg.AUTH_REQUIRED)
         return
@@ -372,6 +414,41 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logger.error(f"Error in error handler: {e}")
 
+async def run_maintenance_job(context: ContextTypes.DEFAULT_TYPE):
+    """Run the periodic database maintenance (ANALYZE, incremental vacuum, WAL checkpoints)."""
+    report = await db.run(maintenance.run_maintenance)
+    logger.info(f"Database maintenance: {maintenance.format_report(report)}")
+
+async def post_init(application: Application):
+    """Prepare the database and start the loop lag monitor, file reaper and maintenance job before polling starts."""
+    # Time every database call for /dbstats when DB_INSTRUMENT=1
+    instrument.enable_from_env()
+    # Create or upgrade the database schema (skipped when it is current)
+    await db.init_database()
+    loop_lag.start()
+    # Deletes image files of deleted items in the background
+    db.get_reaper().start()
+    # The JobQueue needs the python-telegram-bot[job-queue] extra
+    if application.job_queue is None:
+        logger.warning("JobQueue not available, database maintenance is not scheduled")
+    else:
+        interval = float(os.getenv('DB_MAINTENANCE_INTERVAL', maintenance.DEFAULT_INTERVAL))
+        application.job_queue.run_repeating(run_maintenance_job, interval=interval, first=interval,
+                                            name='database-maintenance')
+
+async def post_shutdown(application: Application):
+    """Log the final loop lag and database call statistics and release database connections and threads."""
+    loop_lag.stop()
+    logger.info(f"Event loop lag: {loop_lag.stats()}")
+    if instrument.is_enabled():
+        top = list(instrument.get_stats()['functions'].items())[:5]
+        logger.info("Database calls: " + "; ".join(
+            f"{name} {stats['calls']}x p50 {stats['p50_ms']} ms p99 {stats['p99_ms']} ms" for name, stats in top))
+    # Commit the queued writes before closing the pool, which they would reopen;
+    # close it directly, since the thread pool is gone after shutdown()
+    db.shutdown()
+    close_pool()
+
 def main():
     """Start the bot."""
     if not BOT_TOKEN:
@@ -383,10 +460,17 @@ def main():
         return
     
     # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Add handlers
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("dbstats", db_stats))
     application.add_handler(CallbackQueryHandler(handle_callback_query))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
     application.add_handler(MessageHandler(filters.PHOTO, handle_photo_message))
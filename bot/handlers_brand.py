@@ -6,7 +6,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import database as db
+from database import aio as db
 from bot import messages as msg
 from database import utils
 
@@ -30,7 +30,7 @@ async def brand_create_start(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
     
     user_id = query.from_user.id
-    db.set_user_state(user_id, 'brand_create', {})
+    await db.set_user_state(user_id, 'brand_create', {})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data='brand_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -40,18 +40,18 @@ async def brand_create_start(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def brand_create_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle brand name input."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'brand_create':
         return
     
     name = update.message.text.strip()
-    code = utils.generate_brand_code()
     
-    brand_id = db.create_brand(name, code)
+    brand_id = await db.create_brand(name)
     
     if brand_id:
-        db.clear_user_state(user_id)
+        code = (await db.get_brand_by_id(brand_id)).code
+        await db.clear_user_state(user_id)
         keyboard = [
             [InlineKeyboardButton(msg.BTN_MAIN_MENU, callback_data='main_menu')],
             [InlineKeyboardButton(msg.BTN_BACK, callback_data='brand_menu')]
@@ -74,7 +74,7 @@ async def brand_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    brands = db.get_all_brands()
+    brands = await db.get_all_brands()
     
     if not brands:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='brand_menu')]]
@@ -85,14 +85,13 @@ async def brand_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Create keyboard with brand buttons
     keyboard = []
     for brand in brands:
-        brand_id, code, name, created_at = brand
-        keyboard.append([InlineKeyboardButton(f"{name} ({code})", callback_data=f'brand_view_{brand_id}')])
+        keyboard.append([InlineKeyboardButton(f"{brand.name} ({brand.code})", callback_data=f'brand_view_{brand.id}')])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='brand_menu')])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     # Format brand list
-    brand_list_text = "\n".join([f"🔹 {b[2]} ({b[1]})" for b in brands])
+    brand_list_text = "\n".join([f"🔹 {b.name} ({b.code})" for b in brands])
     
     await query.edit_message_text(
         msg.BRAND_LIST.format(brand_list_text),
@@ -105,23 +104,21 @@ async def brand_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     brand_id = int(query.data.split('_')[2])
-    brand = db.get_brand_by_id(brand_id)
+    brand = await db.get_brand_by_id(brand_id)
     
     if not brand:
         await query.edit_message_text(msg.ERROR_OCCURRED)
         return
     
-    b_id, code, name, created_at = brand
-    
     keyboard = [
-        [InlineKeyboardButton(msg.BTN_EDIT, callback_data=f'brand_edit_{b_id}')],
-        [InlineKeyboardButton(msg.BTN_DELETE, callback_data=f'brand_delete_confirm_{b_id}')],
+        [InlineKeyboardButton(msg.BTN_EDIT, callback_data=f'brand_edit_{brand.id}')],
+        [InlineKeyboardButton(msg.BTN_DELETE, callback_data=f'brand_delete_confirm_{brand.id}')],
         [InlineKeyboardButton(msg.BTN_BACK, callback_data='brand_list')]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        msg.BRAND_DETAILS.format(name, code, created_at),
+        msg.BRAND_DETAILS.format(brand.name, brand.code, brand.created_at),
         reply_markup=reply_markup
     )
 
@@ -133,7 +130,7 @@ async def brand_edit_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     brand_id = int(query.data.split('_')[2])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'brand_edit', {'brand_id': brand_id})
+    await db.set_user_state(user_id, 'brand_edit', {'brand_id': brand_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'brand_view_{brand_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -143,7 +140,7 @@ async def brand_edit_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def brand_edit_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle brand name update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'brand_edit':
         return
@@ -151,8 +148,8 @@ async def brand_edit_handle_name(update: Update, context: ContextTypes.DEFAULT_T
     name = update.message.text.strip()
     brand_id = data['brand_id']
     
-    db.update_brand(brand_id, name)
-    db.clear_user_state(user_id)
+    await db.update_brand(brand_id, name)
+    await db.clear_user_state(user_id)
     
     keyboard = [
         [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'brand_view_{brand_id}')],
@@ -168,7 +165,7 @@ async def brand_delete_confirm(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.answer()
     
     brand_id = int(query.data.split('_')[3])
-    brand = db.get_brand_by_id(brand_id)
+    brand = await db.get_brand_by_id(brand_id)
     
     if not brand:
         await query.edit_message_text(msg.ERROR_OCCURRED)
@@ -181,7 +178,7 @@ async def brand_delete_confirm(update: Update, context: ContextTypes.DEFAULT_TYP
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        f"⚠️ آیا از حذف برند '{brand[2]}' اطمینان دارید؟\n\n"
+        f"⚠️ آیا از حذف برند '{brand.name}' اطمینان دارید؟\n\n"
         "توجه: تمام کالاهای مرتبط نیز حذف خواهند شد.",
         reply_markup=reply_markup
     )
@@ -192,7 +189,7 @@ async def brand_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     brand_id = int(query.data.split('_')[2])
-    db.delete_brand(brand_id)
+    await db.delete_brand(brand_id)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='brand_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
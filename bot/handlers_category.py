@@ -6,7 +6,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from database import database as db
+from database import aio as db
 from bot import messages as msg
 from database import utils
 
@@ -33,7 +33,7 @@ async def category_create_start(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
     
     user_id = query.from_user.id
-    db.set_user_state(user_id, 'category_create', {})
+    await db.set_user_state(user_id, 'category_create', {})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data='category_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -43,18 +43,18 @@ async def category_create_start(update: Update, context: ContextTypes.DEFAULT_TY
 async def category_create_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle category name input."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'category_create':
         return
     
     name = update.message.text.strip()
-    code = utils.generate_category_code()
     
-    category_id = db.create_category(name, code)
+    category_id = await db.create_category(name)
     
     if category_id:
-        db.clear_user_state(user_id)
+        code = (await db.get_category_by_id(category_id)).code
+        await db.clear_user_state(user_id)
         keyboard = [
             [InlineKeyboardButton(msg.BTN_MAIN_MENU, callback_data='main_menu')],
             [InlineKeyboardButton(msg.BTN_BACK, callback_data='category_menu')]
@@ -77,7 +77,7 @@ async def category_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    categories = db.get_all_categories()
+    categories = await db.get_all_categories()
     
     if not categories:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='category_menu')]]
@@ -88,14 +88,13 @@ async def category_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Create keyboard with category buttons
     keyboard = []
     for cat in categories:
-        cat_id, code, name, created_at = cat
-        keyboard.append([InlineKeyboardButton(f"{name} ({code})", callback_data=f'category_view_{cat_id}')])
+        keyboard.append([InlineKeyboardButton(f"{cat.name} ({cat.code})", callback_data=f'category_view_{cat.id}')])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='category_menu')])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     # Format category list
-    cat_list = "\n".join([f"🔹 {cat[2]} ({cat[1]})" for cat in categories])
+    cat_list = "\n".join([f"🔹 {cat.name} ({cat.code})" for cat in categories])
     
     await query.edit_message_text(
         msg.CATEGORY_LIST.format(cat_list),
@@ -108,23 +107,21 @@ async def category_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     category_id = int(query.data.split('_')[2])
-    category = db.get_category_by_id(category_id)
+    category = await db.get_category_by_id(category_id)
     
     if not category:
         await query.edit_message_text(msg.ERROR_OCCURRED)
         return
     
-    cat_id, code, name, created_at = category
-    
     keyboard = [
-        [InlineKeyboardButton(msg.BTN_EDIT, callback_data=f'category_edit_{cat_id}')],
-        [InlineKeyboardButton(msg.BTN_DELETE, callback_data=f'category_delete_confirm_{cat_id}')],
+        [InlineKeyboardButton(msg.BTN_EDIT, callback_data=f'category_edit_{category.id}')],
+        [InlineKeyboardButton(msg.BTN_DELETE, callback_data=f'category_delete_confirm_{category.id}')],
         [InlineKeyboardButton(msg.BTN_BACK, callback_data='category_list')]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        msg.CATEGORY_DETAILS.format(name, code, created_at),
+        msg.CATEGORY_DETAILS.format(category.name, category.code, category.created_at),
         reply_markup=reply_markup
     )
 
@@ -136,7 +133,7 @@ async def category_edit_start(update: Update, context: ContextTypes.DEFAULT_TYPE
     category_id = int(query.data.split('_')[2])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'category_edit', {'category_id': category_id})
+    await db.set_user_state(user_id, 'category_edit', {'category_id': category_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'category_view_{category_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -146,7 +143,7 @@ async def category_edit_start(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def category_edit_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle category name update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'category_edit':
         return
@@ -154,8 +151,8 @@ async def category_edit_handle_name(update: Update, context: ContextTypes.DEFAUL
     name = update.message.text.strip()
     category_id = data['category_id']
     
-    db.update_category(category_id, name)
-    db.clear_user_state(user_id)
+    await db.update_category(category_id, name)
+    await db.clear_user_state(user_id)
     
     keyboard = [
         [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'category_view_{category_id}')],
@@ -171,7 +168,7 @@ async def category_delete_confirm(update: Update, context: ContextTypes.DEFAULT_
     await query.answer()
     
     category_id = int(query.data.split('_')[3])
-    category = db.get_category_by_id(category_id)
+    category = await db.get_category_by_id(category_id)
     
     if not category:
         await query.edit_message_text(msg.ERROR_OCCURRED)
@@ -184,7 +181,7 @@ async def category_delete_confirm(update: Update, context: ContextTypes.DEFAULT_
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        f"⚠️ آیا از حذف دسته‌بندی '{category[2]}' اطمینان دارید؟\n\n"
+        f"⚠️ آیا از حذف دسته‌بندی '{category.name}' اطمینان دارید؟\n\n"
         "توجه: تمام زیردسته‌ها و کالاهای مرتبط نیز حذف خواهند شد.",
         reply_markup=reply_markup
     )
@@ -195,7 +192,7 @@ async def category_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     category_id = int(query.data.split('_')[2])
-    db.delete_category(category_id)
+    await db.delete_category(category_id)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='category_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -6,7 +6,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import database as db
+from database import aio as db
 from bot import messages as msg
 from database import utils
 
@@ -33,7 +33,7 @@ async def item_create_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    categories = db.get_all_categories()
+    categories = await db.get_all_categories()
     
     if not categories:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_menu')]]
@@ -46,8 +46,7 @@ async def item_create_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     keyboard = []
     for cat in categories:
-        cat_id, code, name, created_at = cat
-        keyboard.append([InlineKeyboardButton(f"{name} ({code})", callback_data=f'item_create_cat_{cat_id}')])
+        keyboard.append([InlineKeyboardButton(f"{cat.name} ({cat.code})", callback_data=f'item_create_cat_{cat.id}')])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_CANCEL, callback_data='item_menu')])
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -60,7 +59,7 @@ async def item_create_category_selected(update: Update, context: ContextTypes.DE
     await query.answer()
     
     category_id = int(query.data.split('_')[3])
-    subcategories = db.get_subcategories_by_category(category_id)
+    subcategories = await db.get_subcategories_by_category(category_id)
     
     if not subcategories:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_menu')]]
@@ -73,10 +72,9 @@ async def item_create_category_selected(update: Update, context: ContextTypes.DE
     
     keyboard = []
     for subcat in subcategories:
-        subcat_id, code, name, created_at = subcat
         keyboard.append([InlineKeyboardButton(
-            f"{name} ({code})",
-            callback_data=f'item_create_subcat_{category_id}_{subcat_id}'
+            f"{subcat.name} ({subcat.code})",
+            callback_data=f'item_create_subcat_{category_id}_{subcat.id}'
         )])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_CANCEL, callback_data='item_menu')])
@@ -93,7 +91,7 @@ async def item_create_subcategory_selected(update: Update, context: ContextTypes
     category_id = int(parts[3])
     subcategory_id = int(parts[4])
     
-    brands = db.get_all_brands()
+    brands = await db.get_all_brands()
     
     if not brands:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_menu')]]
@@ -106,10 +104,9 @@ async def item_create_subcategory_selected(update: Update, context: ContextTypes
     
     keyboard = []
     for brand in brands:
-        brand_id, code, name, created_at = brand
         keyboard.append([InlineKeyboardButton(
-            f"{name} ({code})",
-            callback_data=f'item_create_brand_{category_id}_{subcategory_id}_{brand_id}'
+            f"{brand.name} ({brand.code})",
+            callback_data=f'item_create_brand_{category_id}_{subcategory_id}_{brand.id}'
         )])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_CANCEL, callback_data='item_menu')])
@@ -127,7 +124,7 @@ async def item_create_brand_selected(update: Update, context: ContextTypes.DEFAU
     subcategory_id = int(parts[4])
     brand_id = int(parts[5])
     
-    measure_types = db.get_all_measure_types()
+    measure_types = await db.get_all_measure_types()
     
     if not measure_types:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_menu')]]
@@ -140,10 +137,9 @@ async def item_create_brand_selected(update: Update, context: ContextTypes.DEFAU
     
     keyboard = []
     for mt in measure_types:
-        mt_id, code, name, threshold, created_at = mt
         keyboard.append([InlineKeyboardButton(
-            f"{name} ({code})",
-            callback_data=f'item_create_measure_type_{category_id}_{subcategory_id}_{brand_id}_{mt_id}'
+            f"{mt.name} ({mt.code})",
+            callback_data=f'item_create_measure_type_{category_id}_{subcategory_id}_{brand_id}_{mt.id}'
         )])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_CANCEL, callback_data='item_menu')])
@@ -163,7 +159,7 @@ async def item_create_measure_type_selected(update: Update, context: ContextType
     measure_type_id = int(parts[7])
     
     user_id = query.from_user.id
-    db.set_user_state(user_id, 'item_create_name', {
+    await db.set_user_state(user_id, 'item_create_name', {
         'category_id': category_id,
         'subcategory_id': subcategory_id,
         'brand_id': brand_id,
@@ -178,14 +174,14 @@ async def item_create_measure_type_selected(update: Update, context: ContextType
 async def item_create_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle item name input - ask for custom code (REQUIRED)."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_create_name':
         return
     
     name = update.message.text.strip()
     data['name'] = name
-    db.set_user_state(user_id, 'item_create_custom_code', data)
+    await db.set_user_state(user_id, 'item_create_custom_code', data)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data='item_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -198,14 +194,14 @@ async def item_create_handle_name(update: Update, context: ContextTypes.DEFAULT_
 async def item_create_handle_custom_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle custom code input - ask for description (OPTIONAL)."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_create_custom_code':
         return
     
     custom_code = update.message.text.strip()
     data['custom_code'] = custom_code
-    db.set_user_state(user_id, 'item_create_description', data)
+    await db.set_user_state(user_id, 'item_create_description', data)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_SKIP, callback_data='item_create_skip_description')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -218,14 +214,14 @@ async def item_create_handle_custom_code(update: Update, context: ContextTypes.D
 async def item_create_handle_description(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle description input - ask for available count (OPTIONAL)."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_create_description':
         return
     
     description = update.message.text.strip()
     data['description'] = description
-    db.set_user_state(user_id, 'item_create_available_count', data)
+    await db.set_user_state(user_id, 'item_create_available_count', data)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_SKIP, callback_data='item_create_skip_available_count')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -241,11 +237,11 @@ async def item_create_skip_description(update: Update, context: ContextTypes.DEF
     await query.answer()
     
     user_id = query.from_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state == 'item_create_description':
         data['description'] = None
-        db.set_user_state(user_id, 'item_create_available_count', data)
+        await db.set_user_state(user_id, 'item_create_available_count', data)
         
         keyboard = [[InlineKeyboardButton(msg.BTN_SKIP, callback_data='item_create_skip_available_count')]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -258,7 +254,7 @@ async def item_create_skip_description(update: Update, context: ContextTypes.DEF
 async def item_create_handle_available_count(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle available count input - ask for video URL (OPTIONAL)."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_create_available_count':
         return
@@ -277,7 +273,7 @@ async def item_create_handle_available_count(update: Update, context: ContextTyp
         return
     
     data['available_count'] = available_count
-    db.set_user_state(user_id, 'item_create_video_url', data)
+    await db.set_user_state(user_id, 'item_create_video_url', data)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_SKIP, callback_data='item_create_skip_video_url')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -293,11 +289,11 @@ async def item_create_skip_available_count(update: Update, context: ContextTypes
     await query.answer()
     
     user_id = query.from_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state == 'item_create_available_count':
         data['available_count'] = 0
-        db.set_user_state(user_id, 'item_create_video_url', data)
+        await db.set_user_state(user_id, 'item_create_video_url', data)
         
         keyboard = [[InlineKeyboardButton(msg.BTN_SKIP, callback_data='item_create_skip_video_url')]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -310,7 +306,7 @@ async def item_create_skip_available_count(update: Update, context: ContextTypes
 async def item_create_handle_video_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle video URL input - create item and ask for images (OPTIONAL)."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_create_video_url':
         return
@@ -326,7 +322,7 @@ async def item_create_skip_video_url(update: Update, context: ContextTypes.DEFAU
     await query.answer()
     
     user_id = query.from_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state == 'item_create_video_url':
         data['video_url'] = None
@@ -334,12 +330,10 @@ async def item_create_skip_video_url(update: Update, context: ContextTypes.DEFAU
 
 async def _create_item_and_request_images(update_or_query, context, user_id, data):
     """Helper to create item and request images."""
-    code = utils.generate_item_code()
-    
-    # Create item with all data
-    item_id = db.create_item(
+    # Create item with all data; its code is allocated in the same transaction
+    item_id = await db.create_item(
         name=data['name'],
-        code=code,
+        code=None,
         custom_code=data['custom_code'],
         category_id=data['category_id'],
         subcategory_id=data['subcategory_id'],
@@ -351,10 +345,11 @@ async def _create_item_and_request_images(update_or_query, context, user_id, dat
     )
     
     if item_id:
-        db.set_user_state(user_id, 'item_create_images', {
+        item = await db.get_item_by_id(item_id)
+        await db.set_user_state(user_id, 'item_create_images', {
             'item_id': item_id,
             'item_name': data['name'],
-            'item_code': code,
+            'item_code': item.code,
             'custom_code': data['custom_code'],
             'image_count': 0
         })
@@ -383,7 +378,7 @@ async def _create_item_and_request_images(update_or_query, context, user_id, dat
 async def item_create_handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle photo upload during creation."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_create_images':
         return
@@ -400,10 +395,10 @@ async def item_create_handle_photo(update: Update, context: ContextTypes.DEFAULT
     filepath = os.path.join(images_dir, filename)
     
     await file.download_to_drive(filepath)
-    db.add_item_image(item_id, filepath)
+    await db.add_item_image(item_id, filepath)
     
     data['image_count'] = image_count + 1
-    db.set_user_state(user_id, 'item_create_images', data)
+    await db.set_user_state(user_id, 'item_create_images', data)
     
     keyboard = [
         [InlineKeyboardButton(msg.BTN_DONE, callback_data=f'item_create_done_{item_id}')],
@@ -422,10 +417,10 @@ async def item_create_done(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     user_id = query.from_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state == 'item_create_images':
-        db.clear_user_state(user_id)
+        await db.clear_user_state(user_id)
         
         keyboard = [
             [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'item_view_{data["item_id"]}')],
@@ -466,7 +461,7 @@ async def item_list_search_start(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     await query.answer()
     
-    db.set_user_state(query.from_user.id, 'awaiting_item_search', {})
+    await db.set_user_state(query.from_user.id, 'awaiting_item_search', {})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data='item_list')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -478,9 +473,9 @@ async def item_search_handle_text(update: Update, context: ContextTypes.DEFAULT_
     search_text = update.message.text.strip()
     user_id = update.effective_user.id
     
-    items = db.search_items(search_text)
+    items = await db.search_items(search_text, limit=20)
     
-    db.clear_user_state(user_id)
+    await db.clear_user_state(user_id)
     
     if not items:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list')]]
@@ -489,14 +484,14 @@ async def item_search_handle_text(update: Update, context: ContextTypes.DEFAULT_
         return
     
     keyboard = []
-    for item in items[:20]:
-        item_id, code, custom_code, name, description, cat_name, subcat_name, brand_name, measure_type_name, available_count, video_url, created_at, updated_at = item
-        keyboard.append([InlineKeyboardButton(name, callback_data=f'item_view_{item_id}')])
+    for item in items:
+        keyboard.append([InlineKeyboardButton(item.name, callback_data=f'item_view_{item.id}')])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list')])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    result_text = f"🔍 یافت شد: {len(items)} کالا\n\nلطفا کالای مورد نظر را انتخاب کنید:"
+    total = len(items) if len(items) < 20 else await db.count_search_items(search_text)
+    result_text = f"🔍 یافت شد: {total} کالا\n\nلطفا کالای مورد نظر را انتخاب کنید:"
     
     await update.message.reply_text(result_text, reply_markup=reply_markup)
 
@@ -509,7 +504,7 @@ async def item_list_by_brand_start(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer()
     
-    brands = db.get_all_brands()
+    brands = await db.get_all_brands()
     
     if not brands:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list')]]
@@ -522,10 +517,9 @@ async def item_list_by_brand_start(update: Update, context: ContextTypes.DEFAULT
     
     keyboard = []
     for brand in brands:
-        brand_id, code, name, created_at = brand
         keyboard.append([InlineKeyboardButton(
-            f"{name} ({code})",
-            callback_data=f'item_list_brand_{brand_id}'
+            f"{brand.name} ({brand.code})",
+            callback_data=f'item_list_brand_{brand.id}'
         )])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list')])
@@ -539,7 +533,7 @@ async def item_list_by_brand_show(update: Update, context: ContextTypes.DEFAULT_
     await query.answer()
     
     brand_id = int(query.data.split('_')[3])
-    items = db.get_items_by_brand(brand_id)
+    items = await db.get_items_by_brand(brand_id)
     
     if not items:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list_by_brand')]]
@@ -549,13 +543,12 @@ async def item_list_by_brand_show(update: Update, context: ContextTypes.DEFAULT_
     
     keyboard = []
     for item in items[:20]:
-        item_id, code, custom_code, name, description, cat_name, subcat_name, brand_name, measure_type_name, available_count, video_url, created_at, updated_at = item
-        keyboard.append([InlineKeyboardButton(name, callback_data=f'item_view_{item_id}')])
+        keyboard.append([InlineKeyboardButton(item.name, callback_data=f'item_view_{item.id}')])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list_by_brand')])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    result_text = f"🏷️ {items[0][7]}\n\nتعداد کالاها: {len(items)}\n\nلطفا کالای مورد نظر را انتخاب کنید:"
+    result_text = f"🏷️ {items[0].brand}\n\nتعداد کالاها: {len(items)}\n\nلطفا کالای مورد نظر را انتخاب کنید:"
     
     await query.edit_message_text(result_text, reply_markup=reply_markup)
 
@@ -568,7 +561,7 @@ async def item_list_by_category_start(update: Update, context: ContextTypes.DEFA
     query = update.callback_query
     await query.answer()
     
-    categories = db.get_all_categories()
+    categories = await db.get_all_categories()
     
     if not categories:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list')]]
@@ -581,10 +574,9 @@ async def item_list_by_category_start(update: Update, context: ContextTypes.DEFA
     
     keyboard = []
     for cat in categories:
-        cat_id, code, name, created_at = cat
         keyboard.append([InlineKeyboardButton(
-            f"{name} ({code})",
-            callback_data=f'item_list_cat_{cat_id}'
+            f"{cat.name} ({cat.code})",
+            callback_data=f'item_list_cat_{cat.id}'
         )])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list')])
@@ -598,7 +590,7 @@ async def item_list_by_category_show_subcategories(update: Update, context: Cont
     await query.answer()
     
     category_id = int(query.data.split('_')[3])
-    subcategories = db.get_subcategories_by_category(category_id)
+    subcategories = await db.get_subcategories_by_category(category_id)
     
     if not subcategories:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list_by_category')]]
@@ -611,10 +603,9 @@ async def item_list_by_category_show_subcategories(update: Update, context: Cont
     
     keyboard = []
     for subcat in subcategories:
-        subcat_id, code, name, created_at = subcat
         keyboard.append([InlineKeyboardButton(
-            f"{name} ({code})",
-            callback_data=f'item_list_subcat_{subcat_id}'
+            f"{subcat.name} ({subcat.code})",
+            callback_data=f'item_list_subcat_{subcat.id}'
         )])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list_by_category')])
@@ -628,7 +619,7 @@ async def item_list_by_subcategory_show(update: Update, context: ContextTypes.DE
     await query.answer()
     
     subcategory_id = int(query.data.split('_')[3])
-    items = db.get_items_by_subcategory(subcategory_id)
+    items = await db.get_items_by_subcategory(subcategory_id)
     
     if not items:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list_by_category')]]
@@ -638,13 +629,12 @@ async def item_list_by_subcategory_show(update: Update, context: ContextTypes.DE
     
     keyboard = []
     for item in items[:20]:
-        item_id, code, custom_code, name, description, cat_name, subcat_name, brand_name, measure_type_name, available_count, video_url, created_at, updated_at = item
-        keyboard.append([InlineKeyboardButton(name, callback_data=f'item_view_{item_id}')])
+        keyboard.append([InlineKeyboardButton(item.name, callback_data=f'item_view_{item.id}')])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='item_list_by_category')])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    result_text = f"📁 {items[0][5]} > {items[0][6]}\n\nتعداد کالاها: {len(items)}\n\nلطفا کالای مورد نظر را انتخاب کنید:"
+    result_text = f"📁 {items[0].category} > {items[0].subcategory}\n\nتعداد کالاها: {len(items)}\n\nلطفا کالای مورد نظر را انتخاب کنید:"
     
     await query.edit_message_text(result_text, reply_markup=reply_markup)
 
@@ -654,21 +644,13 @@ async def item_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     item_id = int(query.data.split('_')[2])
-    item = db.get_item_by_id(item_id)
+    item = await db.get_item_by_id(item_id)
     
     if not item:
         await query.edit_message_text(msg.ERROR_OCCURRED)
         return
     
-    (item_id, code, custom_code, name, description,
-     category_id, category_name, 
-     subcategory_id, subcategory_name, 
-     brand_id, brand_name,
-     measure_type_id, measure_type_name,
-     available_count, video_url,
-     created_at, updated_at) = item
-    
-    images = db.get_item_images(item_id)
+    images = await db.get_item_images(item_id)
     
     keyboard = [
         [InlineKeyboardButton(msg.BTN_EDIT_AVAILABLE_COUNT, callback_data=f'item_edit_available_count_{item_id}')],
@@ -681,18 +663,18 @@ async def item_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await query.edit_message_text(
         msg.ITEM_DETAILS.format(
-            name, 
-            code,
-            custom_code,
-            description if description else '-',
-            category_name,
-            subcategory_name,
-            brand_name,
-            measure_type_name,
-            available_count,
-            video_url if video_url else '-',
-            created_at, 
-            updated_at,
+            item.name, 
+            item.code,
+            item.custom_code,
+            item.description if item.description else '-',
+            item.category,
+            item.subcategory,
+            item.brand,
+            item.measure_type,
+            item.available_count,
+            item.video_url if item.video_url else '-',
+            item.created_at, 
+            item.updated_at,
             len(images)
         ),
         reply_markup=reply_markup
@@ -704,7 +686,7 @@ async def item_view_images(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     item_id = int(query.data.split('_')[2])
-    images = db.get_item_images(item_id)
+    images = await db.get_item_images(item_id)
     
     if not images:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data=f'item_view_{item_id}')]]
@@ -712,13 +694,13 @@ async def item_view_images(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text(msg.ITEM_NO_IMAGES, reply_markup=reply_markup)
         return
     
-    for img_id, img_path, created_at in images:
-        if os.path.exists(img_path):
-            with open(img_path, 'rb') as photo:
+    for image in images:
+        if os.path.exists(image.image_path):
+            with open(image.image_path, 'rb') as photo:
                 await context.bot.send_photo(
                     chat_id=query.message.chat_id,
                     photo=photo,
-                    caption=f"تاریخ آپلود: {created_at}"
+                    caption=f"تاریخ آپلود: {image.created_at}"
                 )
     
     keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data=f'item_view_{item_id}')]]
@@ -763,7 +745,7 @@ async def item_edit_name_start(update: Update, context: ContextTypes.DEFAULT_TYP
     item_id = int(query.data.split('_')[3])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'item_edit_name', {'item_id': item_id})
+    await db.set_user_state(user_id, 'item_edit_name', {'item_id': item_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'item_view_{item_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -773,7 +755,7 @@ async def item_edit_name_start(update: Update, context: ContextTypes.DEFAULT_TYP
 async def item_edit_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle item name update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_edit_name':
         return
@@ -781,10 +763,8 @@ async def item_edit_handle_name(update: Update, context: ContextTypes.DEFAULT_TY
     name = update.message.text.strip()
     item_id = data['item_id']
     
-    item = db.get_item_by_id(item_id)
-    if item:
-        db.update_item(item_id, name, item[2], item[5], item[7], item[9], item[11], item[4], item[13], item[14])
-        db.clear_user_state(user_id)
+    if await db.update_item_fields(item_id, name=name):
+        await db.clear_user_state(user_id)
         
         keyboard = [
             [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'item_view_{item_id}')],
@@ -802,7 +782,7 @@ async def item_edit_custom_code_start(update: Update, context: ContextTypes.DEFA
     item_id = int(query.data.split('_')[4])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'item_edit_custom_code', {'item_id': item_id})
+    await db.set_user_state(user_id, 'item_edit_custom_code', {'item_id': item_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'item_view_{item_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -812,7 +792,7 @@ async def item_edit_custom_code_start(update: Update, context: ContextTypes.DEFA
 async def item_edit_handle_custom_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle item custom code update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_edit_custom_code':
         return
@@ -820,10 +800,8 @@ async def item_edit_handle_custom_code(update: Update, context: ContextTypes.DEF
     custom_code = update.message.text.strip()
     item_id = data['item_id']
     
-    item = db.get_item_by_id(item_id)
-    if item:
-        db.update_item(item_id, item[3], custom_code, item[5], item[7], item[9], item[11], item[4], item[13], item[14])
-        db.clear_user_state(user_id)
+    if await db.update_item_fields(item_id, custom_code=custom_code):
+        await db.clear_user_state(user_id)
         
         keyboard = [
             [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'item_view_{item_id}')],
@@ -841,7 +819,7 @@ async def item_edit_description_start(update: Update, context: ContextTypes.DEFA
     item_id = int(query.data.split('_')[4])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'item_edit_description', {'item_id': item_id})
+    await db.set_user_state(user_id, 'item_edit_description', {'item_id': item_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'item_view_{item_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -851,7 +829,7 @@ async def item_edit_description_start(update: Update, context: ContextTypes.DEFA
 async def item_edit_handle_description(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle item description update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_edit_description':
         return
@@ -859,10 +837,8 @@ async def item_edit_handle_description(update: Update, context: ContextTypes.DEF
     description = update.message.text.strip()
     item_id = data['item_id']
     
-    item = db.get_item_by_id(item_id)
-    if item:
-        db.update_item(item_id, item[3], item[2], item[5], item[7], item[9], item[11], description, item[13], item[14])
-        db.clear_user_state(user_id)
+    if await db.update_item_fields(item_id, description=description):
+        await db.clear_user_state(user_id)
         
         keyboard = [
             [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'item_view_{item_id}')],
@@ -880,7 +856,7 @@ async def item_edit_available_count_start(update: Update, context: ContextTypes.
     item_id = int(query.data.split('_')[4])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'item_edit_available_count', {'item_id': item_id})
+    await db.set_user_state(user_id, 'item_edit_available_count', {'item_id': item_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'item_view_{item_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -890,7 +866,7 @@ async def item_edit_available_count_start(update: Update, context: ContextTypes.
 async def item_edit_handle_available_count(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle item available count update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_edit_available_count':
         return
@@ -910,10 +886,8 @@ async def item_edit_handle_available_count(update: Update, context: ContextTypes
     
     item_id = data['item_id']
     
-    item = db.get_item_by_id(item_id)
-    if item:
-        db.update_item(item_id, item[3], item[2], item[5], item[7], item[9], item[11], item[4], available_count, item[14])
-        db.clear_user_state(user_id)
+    if await db.set_stock(item_id, available_count, actor=user_id) is not None:
+        await db.clear_user_state(user_id)
         
         keyboard = [
             [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'item_view_{item_id}')],
@@ -931,7 +905,7 @@ async def item_edit_video_url_start(update: Update, context: ContextTypes.DEFAUL
     item_id = int(query.data.split('_')[4])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'item_edit_video_url', {'item_id': item_id})
+    await db.set_user_state(user_id, 'item_edit_video_url', {'item_id': item_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'item_view_{item_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -941,7 +915,7 @@ async def item_edit_video_url_start(update: Update, context: ContextTypes.DEFAUL
 async def item_edit_handle_video_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle item video URL update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_edit_video_url':
         return
@@ -949,10 +923,8 @@ async def item_edit_handle_video_url(update: Update, context: ContextTypes.DEFAU
     video_url = update.message.text.strip()
     item_id = data['item_id']
     
-    item = db.get_item_by_id(item_id)
-    if item:
-        db.update_item(item_id, item[3], item[2], item[5], item[7], item[9], item[11], item[4], item[13], video_url)
-        db.clear_user_state(user_id)
+    if await db.update_item_fields(item_id, video_url=video_url):
+        await db.clear_user_state(user_id)
         
         keyboard = [
             [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'item_view_{item_id}')],
@@ -970,9 +942,9 @@ async def item_edit_add_image_start(update: Update, context: ContextTypes.DEFAUL
     item_id = int(query.data.split('_')[4])
     user_id = query.from_user.id
     
-    images = db.get_item_images(item_id)
+    images = await db.get_item_images(item_id)
     
-    db.set_user_state(user_id, 'item_edit_add_images', {
+    await db.set_user_state(user_id, 'item_edit_add_images', {
         'item_id': item_id,
         'image_count': len(images)
     })
@@ -991,7 +963,7 @@ async def item_edit_add_image_start(update: Update, context: ContextTypes.DEFAUL
 async def item_edit_handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle photo upload during edit."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'item_edit_add_images':
         return
@@ -1008,10 +980,10 @@ async def item_edit_handle_photo(update: Update, context: ContextTypes.DEFAULT_T
     filepath = os.path.join(images_dir, filename)
     
     await file.download_to_drive(filepath)
-    db.add_item_image(item_id, filepath)
+    await db.add_item_image(item_id, filepath)
     
     data['image_count'] = image_count + 1
-    db.set_user_state(user_id, 'item_edit_add_images', data)
+    await db.set_user_state(user_id, 'item_edit_add_images', data)
     
     keyboard = [
         [InlineKeyboardButton(msg.BTN_DONE, callback_data=f'item_edit_images_done_{item_id}')],
@@ -1032,7 +1004,7 @@ async def item_edit_images_done(update: Update, context: ContextTypes.DEFAULT_TY
     item_id = int(query.data.split('_')[3])
     user_id = query.from_user.id
     
-    db.clear_user_state(user_id)
+    await db.clear_user_state(user_id)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'item_view_{item_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -1052,7 +1024,7 @@ async def item_delete_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
     
     item_id = int(query.data.split('_')[3])
-    item = db.get_item_by_id(item_id)
+    item = await db.get_item_by_id(item_id)
     
     if not item:
         await query.edit_message_text(msg.ERROR_OCCURRED)
@@ -1065,7 +1037,7 @@ async def item_delete_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        f"⚠️ آیا از حذف کالا '{item[3]}' اطمینان دارید؟\n\n"
+        f"⚠️ آیا از حذف کالا '{item.name}' اطمینان دارید؟\n\n"
         "توجه: تمام تصاویر مرتبط نیز حذف خواهند شد.",
         reply_markup=reply_markup
     )
@@ -1076,7 +1048,7 @@ async def item_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     item_id = int(query.data.split('_')[2])
-    db.delete_item(item_id)
+    await db.delete_item(item_id)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='item_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -6,7 +6,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import database as db
+from database import aio as db
 from bot import messages as msg
 
 async def low_stock_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -14,7 +14,7 @@ async def low_stock_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    low_stock_items = db.get_low_stock_items()
+    low_stock_items = await db.get_low_stock_items()
     
     if not low_stock_items:
         keyboard = [[InlineKeyboardButton(msg.BTN_MAIN_MENU, callback_data='main_menu')]]
@@ -27,24 +27,22 @@ async def low_stock_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message_text = msg.LOW_STOCK_MENU + "\n\n"
     
     for item in low_stock_items:
-        item_id, code, custom_code, name, available_count, cat_name, subcat_name, brand_name, measure_type_name, threshold = item
-        
         item_text = msg.LOW_STOCK_ITEM.format(
-            name,
-            code,
-            custom_code,
-            available_count,
-            measure_type_name,
-            threshold,
-            cat_name,
-            subcat_name,
-            brand_name
+            item.name,
+            item.code,
+            item.custom_code,
+            item.available_count,
+            item.measure_type,
+            item.low_stock_threshold,
+            item.category,
+            item.subcategory,
+            item.brand
         )
         message_text += item_text + "\n\n"
         
         keyboard.append([InlineKeyboardButton(
-            f"{name} ({custom_code}) - {available_count} {measure_type_name}",
-            callback_data=f'item_view_{item_id}'
+            f"{item.name} ({item.custom_code}) - {item.available_count} {item.measure_type}",
+            callback_data=f'item_view_{item.id}'
         )])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_MAIN_MENU, callback_data='main_menu')])
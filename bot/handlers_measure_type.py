@@ -6,7 +6,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import database as db
+from database import aio as db
 from bot import messages as msg
 from database import utils
 
@@ -30,7 +30,7 @@ async def measure_type_create_start(update: Update, context: ContextTypes.DEFAUL
     await query.answer()
     
     user_id = query.from_user.id
-    db.set_user_state(user_id, 'measure_type_create', {})
+    await db.set_user_state(user_id, 'measure_type_create', {})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data='measure_type_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -40,7 +40,7 @@ async def measure_type_create_start(update: Update, context: ContextTypes.DEFAUL
 async def measure_type_create_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle measure type name input."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'measure_type_create':
         return
@@ -49,7 +49,7 @@ async def measure_type_create_handle_name(update: Update, context: ContextTypes.
     
     # Save name and ask for threshold
     data['name'] = name
-    db.set_user_state(user_id, 'measure_type_create_threshold', data)
+    await db.set_user_state(user_id, 'measure_type_create_threshold', data)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data='measure_type_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -62,7 +62,7 @@ async def measure_type_create_handle_name(update: Update, context: ContextTypes.
 async def measure_type_create_handle_threshold(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle measure type threshold input."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'measure_type_create_threshold':
         return
@@ -81,12 +81,12 @@ async def measure_type_create_handle_threshold(update: Update, context: ContextT
         return
     
     name = data['name']
-    code = utils.generate_measure_type_code()
     
-    measure_type_id = db.create_measure_type(name, code, threshold)
+    measure_type_id = await db.create_measure_type(name, None, threshold)
     
     if measure_type_id:
-        db.clear_user_state(user_id)
+        code = (await db.get_measure_type_by_id(measure_type_id)).code
+        await db.clear_user_state(user_id)
         keyboard = [
             [InlineKeyboardButton(msg.BTN_MAIN_MENU, callback_data='main_menu')],
             [InlineKeyboardButton(msg.BTN_BACK, callback_data='measure_type_menu')]
@@ -109,7 +109,7 @@ async def measure_type_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    measure_types = db.get_all_measure_types()
+    measure_types = await db.get_all_measure_types()
     
     if not measure_types:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='measure_type_menu')]]
@@ -120,17 +120,16 @@ async def measure_type_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Create keyboard with measure type buttons
     keyboard = []
     for mt in measure_types:
-        mt_id, code, name, threshold, created_at = mt
         keyboard.append([InlineKeyboardButton(
-            f"{name} ({code}) - آستانه: {threshold}",
-            callback_data=f'measure_type_view_{mt_id}'
+            f"{mt.name} ({mt.code}) - آستانه: {mt.low_stock_threshold}",
+            callback_data=f'measure_type_view_{mt.id}'
         )])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='measure_type_menu')])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     # Format measure type list
-    mt_list = "\n".join([f"🔹 {mt[2]} ({mt[1]}) - آستانه کمبود: {mt[3]}" for mt in measure_types])
+    mt_list = "\n".join([f"🔹 {mt.name} ({mt.code}) - آستانه کمبود: {mt.low_stock_threshold}" for mt in measure_types])
     
     await query.edit_message_text(
         msg.MEASURE_TYPE_LIST.format(mt_list),
@@ -143,14 +142,12 @@ async def measure_type_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     mt_id = int(query.data.split('_')[3])
-    mt = db.get_measure_type_by_id(mt_id)
+    mt = await db.get_measure_type_by_id(mt_id)
     
     if not mt:
         await query.edit_message_text(msg.ERROR_OCCURRED)
         return
     
-    mt_id, code, name, threshold, created_at = mt
-    
     keyboard = [
         [InlineKeyboardButton(msg.BTN_EDIT, callback_data=f'measure_type_edit_{mt_id}')],
         [InlineKeyboardButton(msg.BTN_DELETE, callback_data=f'measure_type_delete_confirm_{mt_id}')],
@@ -159,7 +156,7 @@ async def measure_type_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        msg.MEASURE_TYPE_DETAILS.format(name, code, threshold, created_at),
+        msg.MEASURE_TYPE_DETAILS.format(mt.name, mt.code, mt.low_stock_threshold, mt.created_at),
         reply_markup=reply_markup
     )
 
@@ -190,7 +187,7 @@ async def measure_type_edit_name_start(update: Update, context: ContextTypes.DEF
     mt_id = int(query.data.split('_')[4])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'measure_type_edit_name', {'mt_id': mt_id})
+    await db.set_user_state(user_id, 'measure_type_edit_name', {'mt_id': mt_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'measure_type_view_{mt_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -200,7 +197,7 @@ async def measure_type_edit_name_start(update: Update, context: ContextTypes.DEF
 async def measure_type_edit_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle measure type name update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'measure_type_edit_name':
         return
@@ -209,10 +206,10 @@ async def measure_type_edit_handle_name(update: Update, context: ContextTypes.DE
     mt_id = data['mt_id']
     
     # Get current data
-    mt = db.get_measure_type_by_id(mt_id)
+    mt = await db.get_measure_type_by_id(mt_id)
     if mt:
-        db.update_measure_type(mt_id, name, mt[3])
-        db.clear_user_state(user_id)
+        await db.update_measure_type(mt_id, name, mt.low_stock_threshold)
+        await db.clear_user_state(user_id)
         
         keyboard = [
             [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'measure_type_view_{mt_id}')],
@@ -230,7 +227,7 @@ async def measure_type_edit_threshold_start(update: Update, context: ContextType
     mt_id = int(query.data.split('_')[4])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'measure_type_edit_threshold', {'mt_id': mt_id})
+    await db.set_user_state(user_id, 'measure_type_edit_threshold', {'mt_id': mt_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'measure_type_view_{mt_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -243,7 +240,7 @@ async def measure_type_edit_threshold_start(update: Update, context: ContextType
 async def measure_type_edit_handle_threshold(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle measure type threshold update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'measure_type_edit_threshold':
         return
@@ -264,10 +261,10 @@ async def measure_type_edit_handle_threshold(update: Update, context: ContextTyp
     mt_id = data['mt_id']
     
     # Get current data
-    mt = db.get_measure_type_by_id(mt_id)
+    mt = await db.get_measure_type_by_id(mt_id)
     if mt:
-        db.update_measure_type(mt_id, mt[2], threshold)
-        db.clear_user_state(user_id)
+        await db.update_measure_type(mt_id, mt.name, threshold)
+        await db.clear_user_state(user_id)
         
         keyboard = [
             [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'measure_type_view_{mt_id}')],
@@ -283,7 +280,7 @@ async def measure_type_delete_confirm(update: Update, context: ContextTypes.DEFA
     await query.answer()
     
     mt_id = int(query.data.split('_')[4])
-    mt = db.get_measure_type_by_id(mt_id)
+    mt = await db.get_measure_type_by_id(mt_id)
     
     if not mt:
         await query.edit_message_text(msg.ERROR_OCCURRED)
@@ -296,7 +293,7 @@ async def measure_type_delete_confirm(update: Update, context: ContextTypes.DEFA
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        f"⚠️ آیا از حذف واحد اندازه‌گیری '{mt[2]}' اطمینان دارید؟\n\n"
+        f"⚠️ آیا از حذف واحد اندازه‌گیری '{mt.name}' اطمینان دارید؟\n\n"
         "توجه: تمام کالاهای مرتبط نیز حذف خواهند شد.",
         reply_markup=reply_markup
     )
@@ -307,7 +304,7 @@ async def measure_type_delete(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
     
     mt_id = int(query.data.split('_')[3])
-    db.delete_measure_type(mt_id)
+    await db.delete_measure_type(mt_id)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='measure_type_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
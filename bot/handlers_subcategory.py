@@ -6,7 +6,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import database as db
+from database import aio as db
 from bot import messages as msg
 from database import utils
 
@@ -29,7 +29,7 @@ async def subcategory_create_start(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer()
     
-    categories = db.get_all_categories()
+    categories = await db.get_all_categories()
     
     if not categories:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='subcategory_menu')]]
@@ -43,8 +43,7 @@ async def subcategory_create_start(update: Update, context: ContextTypes.DEFAULT
     # Create keyboard with category buttons
     keyboard = []
     for cat in categories:
-        cat_id, code, name, created_at = cat
-        keyboard.append([InlineKeyboardButton(f"{name} ({code})", callback_data=f'subcategory_create_cat_{cat_id}')])
+        keyboard.append([InlineKeyboardButton(f"{cat.name} ({cat.code})", callback_data=f'subcategory_create_cat_{cat.id}')])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_CANCEL, callback_data='subcategory_menu')])
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -59,7 +58,7 @@ async def subcategory_create_category_selected(update: Update, context: ContextT
     category_id = int(query.data.split('_')[3])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'subcategory_create', {'category_id': category_id})
+    await db.set_user_state(user_id, 'subcategory_create', {'category_id': category_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data='subcategory_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -69,19 +68,19 @@ async def subcategory_create_category_selected(update: Update, context: ContextT
 async def subcategory_create_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle subcategory name input."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'subcategory_create':
         return
     
     name = update.message.text.strip()
     category_id = data['category_id']
-    code = utils.generate_subcategory_code()
     
-    subcategory_id = db.create_subcategory(name, code, category_id)
+    subcategory_id = await db.create_subcategory(name, None, category_id)
     
     if subcategory_id:
-        db.clear_user_state(user_id)
+        code = (await db.get_subcategory_by_id(subcategory_id)).code
+        await db.clear_user_state(user_id)
         keyboard = [
             [InlineKeyboardButton(msg.BTN_MAIN_MENU, callback_data='main_menu')],
             [InlineKeyboardButton(msg.BTN_BACK, callback_data='subcategory_menu')]
@@ -104,7 +103,7 @@ async def subcategory_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    subcategories = db.get_all_subcategories()
+    subcategories = await db.get_all_subcategories()
     
     if not subcategories:
         keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='subcategory_menu')]]
@@ -115,17 +114,16 @@ async def subcategory_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Create keyboard with subcategory buttons
     keyboard = []
     for subcat in subcategories:
-        subcat_id, code, name, category_id, category_name, created_at = subcat
         keyboard.append([InlineKeyboardButton(
-            f"{name} ({code}) - {category_name}",
-            callback_data=f'subcategory_view_{subcat_id}'
+            f"{subcat.name} ({subcat.code}) - {subcat.category}",
+            callback_data=f'subcategory_view_{subcat.id}'
         )])
     
     keyboard.append([InlineKeyboardButton(msg.BTN_BACK, callback_data='subcategory_menu')])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     # Format subcategory list
-    subcat_list = "\n".join([f"🔹 {sub[2]} ({sub[1]}) - {sub[4]}" for sub in subcategories])
+    subcat_list = "\n".join([f"🔹 {sub.name} ({sub.code}) - {sub.category}" for sub in subcategories])
     
     await query.edit_message_text(
         msg.SUBCATEGORY_LIST.format(subcat_list),
@@ -138,23 +136,21 @@ async def subcategory_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     subcategory_id = int(query.data.split('_')[2])
-    subcategory = db.get_subcategory_by_id(subcategory_id)
+    subcategory = await db.get_subcategory_by_id(subcategory_id)
     
     if not subcategory:
         await query.edit_message_text(msg.ERROR_OCCURRED)
         return
     
-    subcat_id, code, name, category_id, category_name, created_at = subcategory
-    
     keyboard = [
-        [InlineKeyboardButton(msg.BTN_EDIT, callback_data=f'subcategory_edit_{subcat_id}')],
-        [InlineKeyboardButton(msg.BTN_DELETE, callback_data=f'subcategory_delete_confirm_{subcat_id}')],
+        [InlineKeyboardButton(msg.BTN_EDIT, callback_data=f'subcategory_edit_{subcategory.id}')],
+        [InlineKeyboardButton(msg.BTN_DELETE, callback_data=f'subcategory_delete_confirm_{subcategory.id}')],
         [InlineKeyboardButton(msg.BTN_BACK, callback_data='subcategory_list')]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        msg.SUBCATEGORY_DETAILS.format(name, code, category_name, created_at),
+        msg.SUBCATEGORY_DETAILS.format(subcategory.name, subcategory.code, subcategory.category, subcategory.created_at),
         reply_markup=reply_markup
     )
 
@@ -166,7 +162,7 @@ async def subcategory_edit_start(update: Update, context: ContextTypes.DEFAULT_T
     subcategory_id = int(query.data.split('_')[2])
     user_id = query.from_user.id
     
-    db.set_user_state(user_id, 'subcategory_edit', {'subcategory_id': subcategory_id})
+    await db.set_user_state(user_id, 'subcategory_edit', {'subcategory_id': subcategory_id})
     
     keyboard = [[InlineKeyboardButton(msg.BTN_CANCEL, callback_data=f'subcategory_view_{subcategory_id}')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -176,7 +172,7 @@ async def subcategory_edit_start(update: Update, context: ContextTypes.DEFAULT_T
 async def subcategory_edit_handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle subcategory name update."""
     user_id = update.effective_user.id
-    state, data = db.get_user_state(user_id)
+    state, data = await db.get_user_state(user_id)
     
     if state != 'subcategory_edit':
         return
@@ -184,8 +180,8 @@ async def subcategory_edit_handle_name(update: Update, context: ContextTypes.DEF
     name = update.message.text.strip()
     subcategory_id = data['subcategory_id']
     
-    db.update_subcategory(subcategory_id, name)
-    db.clear_user_state(user_id)
+    await db.update_subcategory(subcategory_id, name)
+    await db.clear_user_state(user_id)
     
     keyboard = [
         [InlineKeyboardButton(msg.BTN_VIEW, callback_data=f'subcategory_view_{subcategory_id}')],
@@ -201,7 +197,7 @@ async def subcategory_delete_confirm(update: Update, context: ContextTypes.DEFAU
     await query.answer()
     
     subcategory_id = int(query.data.split('_')[3])
-    subcategory = db.get_subcategory_by_id(subcategory_id)
+    subcategory = await db.get_subcategory_by_id(subcategory_id)
     
     if not subcategory:
         await query.edit_message_text(msg.ERROR_OCCURRED)
@@ -214,7 +210,7 @@ async def subcategory_delete_confirm(update: Update, context: ContextTypes.DEFAU
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        f"⚠️ آیا از حذف زیردسته '{subcategory[2]}' اطمینان دارید؟\n\n"
+        f"⚠️ آیا از حذف زیردسته '{subcategory.name}' اطمینان دارید؟\n\n"
         "توجه: تمام کالاهای مرتبط نیز حذف خواهند شد.",
         reply_markup=reply_markup
     )
@@ -225,7 +221,7 @@ async def subcategory_delete(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
     
     subcategory_id = int(query.data.split('_')[2])
-    db.delete_subcategory(subcategory_id)
+    await db.delete_subcategory(subcategory_id)
     
     keyboard = [[InlineKeyboardButton(msg.BTN_BACK, callback_data='subcategory_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
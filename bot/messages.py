@@ -256,6 +256,25 @@ LOW_STOCK_ITEM = """🔹 {}
    دسته: {} / {}
    برند: {}"""
 
+# Database statistics (/dbstats)
+DB_STATS_DISABLED = """📊 آمار پایگاه داده غیرفعال است.
+
+برای فعال‌سازی، DB_INSTRUMENT=1 را در فایل .env قرار دهید و ربات را دوباره اجرا کنید."""
+
+DB_STATS_EMPTY = "📊 هنوز هیچ فراخوانی پایگاه داده‌ای ثبت نشده است."
+
+DB_STATS_HEADER = """📊 پرهزینه‌ترین توابع پایگاه داده
+(زمان به میلی‌ثانیه، کندتر از {} ms: کند)"""
+
+DB_STATS_FUNCTION = """🔹 {}
+   فراخوانی: {} | مجموع: {}
+   p50: {} | p95: {} | p99: {}
+   ردیف در هر فراخوانی: {} | کند: {}"""
+
+DB_STATS_SLOW = "🐢 آخرین فراخوانی‌های کند:"
+
+DB_STATS_SLOW_ITEM = "   {} - {} ms"
+
 # Common messages
 CANCEL = "❌ عملیات لغو شد."
 
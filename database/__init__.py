@@ -3,3 +3,4 @@
 from .database import *
 from .utils import *
 
+from .bulk_import import bulk_import_items
@@ -0,0 +1,195 @@
+"""Async facade over the database module for the Telegram bot.
+
+Every public function of ``database.database`` is available here as a
+coroutine function that runs the call on a bounded thread pool, so a slow
+query blocks only one worker thread instead of the whole event loop:
+
+    from database import aio as db
+
+    brands = await db.get_all_brands()
+    await db.set_user_state(user_id, 'brand_create_name')
+
+The small writes the bot makes on nearly every update (``GROUP_COMMIT``)
+are queued on the group-commit writer (see ``writer.py``) instead, so
+concurrent users' writes share one transaction; the call still returns
+only after its batch has committed. Every other write commits on its own
+as before. Conversation states live in the write-behind user-state store
+(see ``state_store.py``), so their calls that it can answer from memory run
+directly on the event loop, without a thread hop.
+
+Several calls that must share one transaction go into a plain function
+run with ``run()``:
+
+    def move(item_id, brand_id):
+        with database.transaction():
+            ...
+
+    await db.run(move, item_id, brand_id)
+
+The pool size is set with ``DB_ASYNC_WORKERS`` (default 4); keep it at or
+below ``DB_POOL_SIZE`` so workers never wait for a connection.
+"""
+
+import os
+import asyncio
+import logging
+import functools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import database as _db
+from .writer import get_writer, close_writer
+from .file_cleanup import get_reaper, close_reaper
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+# Context managers and pool accessors hold thread-local state, so they only
+# make sense inside a function passed to run()
+_SYNC_ONLY = {'connection', 'transaction', 'reading', 'get_connection', 'get_pool', 'get_reader_pool',
+              'get_reference_cache'}
+
+# Frequent small writes that go through the group-commit writer
+GROUP_COMMIT = {'set_user_state', 'clear_user_state', 'authenticate_user', 'add_item_image',
+                'adjust_stock', 'set_stock', 'update_item_fields'}
+
+# Conversation-state calls, served from the user-state store when it is on
+USER_STATE = {'get_user_state', 'set_user_state', 'clear_user_state'}
+
+_executor = None
+_executor_lock = threading.Lock()
+_wrappers = {}
+
+def get_executor():
+    """Get the thread pool database calls run on, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = max(1, int(os.getenv('DB_ASYNC_WORKERS', DEFAULT_WORKERS)))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db')
+    return _executor
+
+async def run(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)`` on the database thread pool and return its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+async def group_commit(func, *args, **kwargs):
+    """Queue ``func(*args, **kwargs)`` on the group-commit writer and return its
+    result once its batch has committed."""
+    return await asyncio.wrap_future(get_writer().submit(func, *args, **kwargs))
+
+def shutdown(wait=True):
+    """Commit queued writes and stop the file reaper and the thread pool (e.g. when the bot shuts down)."""
+    global _executor
+    close_writer()
+    close_reaper()
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+def _wrap(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+def _wrap_group_commit(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await group_commit(func, *args, **kwargs)
+    return wrapper
+
+def _wrap_user_state(func, name):
+    fallback = _wrap_group_commit(func) if name in GROUP_COMMIT else _wrap(func)
+    write = name != 'get_user_state'
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        # Writes only touch memory; a read does when the user's state is cached
+        store = _db.get_state_store()
+        if store is not None and (write or store.contains(args[0] if args else kwargs['user_id'])):
+            return func(*args, **kwargs)
+        return await fallback(*args, **kwargs)
+    return wrapper
+
+def __getattr__(name):
+    """Look up ``database.database.<name>``, wrapping functions as coroutine functions."""
+    if name.startswith('_'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if name in _SYNC_ONLY:
+        raise AttributeError(f"{name}() is not available asynchronously; "
+                             f"use it inside a function passed to run()")
+    target = getattr(_db, name)
+    wrapper = _wrappers.get(name)
+    # The target changes when instrument.enable() wraps the database functions
+    if wrapper is None or wrapper.__wrapped__ is not target:
+        if not callable(target) or isinstance(target, type):
+            return target
+        if name in USER_STATE:
+            wrapper = _wrappers[name] = _wrap_user_state(target, name)
+        else:
+            wrap = _wrap_group_commit if name in GROUP_COMMIT else _wrap
+            wrapper = _wrappers[name] = wrap(target)
+    return wrapper
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up from a short sleep.
+
+    A handler that blocks the loop (e.g. a synchronous query) delays every
+    wake-up behind it, so the lag is how long other users' updates waited.
+    Lags above ``warn_ms`` are logged as warnings and a summary is logged
+    every ``report_every`` seconds.
+    """
+
+    def __init__(self, interval=0.1, window=3000, warn_ms=200, report_every=300):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self.report_every = report_every
+        self._samples = deque(maxlen=window)
+        self._task = None
+
+    def start(self):
+        """Start sampling on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_report = loop.time()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            lag_ms = max(0.0, (now - start - self.interval) * 1000)
+            self._samples.append(lag_ms)
+            if lag_ms > self.warn_ms:
+                logger.warning(f"Event loop blocked for {lag_ms:.0f} ms")
+            if self.report_every and now - last_report >= self.report_every:
+                last_report = now
+                logger.info(f"Event loop lag: {self.stats()}")
+
+    def stats(self):
+        """Lag percentiles over the recent samples, in milliseconds."""
+        samples = sorted(self._samples)
+        if not samples:
+            return {'samples': 0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p / 100))], 3)
+        return {
+            'samples': len(samples),
+            'p50_ms': percentile(50),
+            'p95_ms': percentile(95),
+            'p99_ms': percentile(99),
+            'max_ms': round(samples[-1], 3),
+        }
@@ -0,0 +1,251 @@
+"""Online backups of the warehouse database.
+
+Copying ``warehouse.db`` while the bot is running can capture a torn file
+(a page written half way, or a WAL that was not copied with it). This
+module copies the database with SQLite's backup API instead, in steps of
+``pages`` pages with a short sleep between them. In WAL mode (the default)
+the copy reads one snapshot of the database, held open for the whole
+backup, so commits made meanwhile don't restart it and writers are never
+blocked; they only share the disk with it. Each copy is checked with
+``PRAGMA integrity_check``, compressed with gzip and kept alongside the
+newest ``keep`` backups. The outcome of the last run is written to
+``last_backup.json`` in the backup directory, which the API's ``/health``
+endpoint reports.
+
+Usage (from the project root, e.g. nightly from cron):
+    python database/backup.py                   # back up, verify, compress, rotate
+    python database/backup.py --keep 14 --pages 512 --sleep-ms 5
+    python database/backup.py status
+"""
+
+import os
+import sys
+import json
+import gzip
+import glob
+import time
+import shutil
+import sqlite3
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import database as db
+
+logger = logging.getLogger(__name__)
+
+# Backups go next to the project, outside the database package
+DEFAULT_BACKUP_DIR = os.path.join(os.path.dirname(__file__), '..', 'backups')
+# Pages copied per step (4 KiB each by default, so 1 MiB per step)
+DEFAULT_PAGES = 256
+# Pause between steps so the copy doesn't saturate the disk
+DEFAULT_SLEEP_MS = 10
+# Outside WAL mode every commit restarts a stepped copy; after this many
+# restarts the rest is copied in one step, which holds the read lock throughout
+MAX_RESTARTS = 3
+# Number of backups kept; older ones are deleted after a successful backup
+DEFAULT_KEEP = 7
+# /health reports the backup as stale after this many hours without a good one
+DEFAULT_MAX_AGE_HOURS = 48
+
+BACKUP_PREFIX = 'warehouse_backup_'
+STATUS_FILE = 'last_backup.json'
+
+def get_backup_dir():
+    """The backup directory, from DB_BACKUP_DIR or ``backups/`` in the project root."""
+    return os.path.abspath(os.getenv('DB_BACKUP_DIR', DEFAULT_BACKUP_DIR))
+
+class _TooManyRestarts(Exception):
+    pass
+
+def _copy(source_path, target_path, pages, sleep_ms):
+    """Copy the database with the backup API. Returns (steps, restarts, page count)."""
+    source = sqlite3.connect(source_path, isolation_level=None, timeout=30)
+    target = sqlite3.connect(target_path, isolation_level=None)
+    progress = {'steps': 0, 'restarts': 0, 'remaining': None, 'total': 0}
+
+    def on_step(status, remaining, total):
+        # A copy that started over shows more pages remaining than the last step
+        if progress['remaining'] is not None and remaining > progress['remaining']:
+            progress['restarts'] += 1
+            if progress['restarts'] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        progress['steps'] += 1
+        progress['remaining'] = remaining
+        progress['total'] = total
+        if remaining and sleep_ms:
+            time.sleep(sleep_ms / 1000)
+
+    try:
+        wal = source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+        if wal:
+            # Pin one snapshot for the whole copy. In WAL mode this doesn't block
+            # writers, and the copy can't be restarted by their commits. In other
+            # journal modes it would block them, so the copy runs without it
+            source.execute('BEGIN')
+            source.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+        try:
+            source.backup(target, pages=pages, progress=on_step)
+        except _TooManyRestarts:
+            logger.warning(f"Backup restarted {MAX_RESTARTS} times, copying the rest in one step")
+            source.backup(target)
+            progress['steps'] += 1
+        if wal:
+            source.execute('COMMIT')
+        # The copy inherits WAL mode; switch it back so it is one self-contained file
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        source.close()
+        target.close()
+    return progress['steps'], progress['restarts'], progress['total']
+
+def verify_backup(path):
+    """Run ``PRAGMA integrity_check`` on a backup copy. Returns its messages ('ok' if intact)."""
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        return [row[0] for row in conn.execute('PRAGMA integrity_check').fetchall()]
+    finally:
+        conn.close()
+
+def _compress(path, target_path):
+    with open(path, 'rb') as source, gzip.open(target_path, 'wb', compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+def list_backups(backup_dir=None):
+    """Backup files in ``backup_dir``, newest first."""
+    backup_dir = backup_dir or get_backup_dir()
+    paths = glob.glob(os.path.join(backup_dir, BACKUP_PREFIX + '*.db.gz'))
+    paths += glob.glob(os.path.join(backup_dir, BACKUP_PREFIX + '*.db'))
+    return sorted(paths, key=os.path.basename, reverse=True)
+
+def rotate_backups(backup_dir=None, keep=DEFAULT_KEEP):
+    """Delete all but the newest ``keep`` backups. Returns the deleted paths."""
+    removed = list_backups(backup_dir)[max(keep, 1):]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def backup_database(backup_dir=None, pages=DEFAULT_PAGES, sleep_ms=DEFAULT_SLEEP_MS, keep=DEFAULT_KEEP,
+                    compress=True):
+    """Back up the database, verify the copy, compress it and rotate old backups.
+
+    Returns a status dict (also written to ``last_backup.json``). Raises
+    RuntimeError if the copy fails its integrity check; the bad copy is
+    deleted and older backups are left alone.
+    """
+    backup_dir = backup_dir or get_backup_dir()
+    os.makedirs(backup_dir, exist_ok=True)
+    name = BACKUP_PREFIX + datetime.now().strftime('%Y%m%d_%H%M%S') + '.db'
+    partial = os.path.join(backup_dir, name + '.partial')
+    final = os.path.join(backup_dir, name + ('.gz' if compress else ''))
+    status = {'path': final, 'started_ts': int(time.time()), 'ok': False}
+
+    start = time.perf_counter()
+    try:
+        steps, restarts, total_pages = _copy(db.DATABASE_FILE, partial, pages, sleep_ms)
+        copy_seconds = time.perf_counter() - start
+        integrity = verify_backup(partial)
+        if integrity != ['ok']:
+            raise RuntimeError(f"Backup failed integrity check: {'; '.join(integrity[:5])}")
+        size = os.path.getsize(partial)
+        if compress:
+            _compress(partial, final + '.partial')
+            os.remove(partial)
+            os.replace(final + '.partial', final)
+        else:
+            os.replace(partial, final)
+        status.update({
+            'ok': True,
+            'pages': total_pages,
+            'steps': steps,
+            'restarts': restarts,
+            'size_bytes': size,
+            'stored_bytes': os.path.getsize(final),
+            'copy_seconds': round(copy_seconds, 3),
+            'duration_seconds': round(time.perf_counter() - start, 3),
+            'removed': [os.path.basename(path) for path in rotate_backups(backup_dir, keep)],
+        })
+    except Exception as e:
+        logger.error(f"Backup failed: {e}")
+        for path in (partial, final + '.partial'):
+            if os.path.exists(path):
+                os.remove(path)
+        status.update({'error': str(e), 'duration_seconds': round(time.perf_counter() - start, 3)})
+        _write_status(backup_dir, status)
+        raise
+    _write_status(backup_dir, status)
+    return status
+
+def _write_status(backup_dir, status):
+    """Record the run in last_backup.json, keeping the last good backup's details."""
+    previous = read_status(backup_dir) or {}
+    status = dict(status, finished_ts=int(time.time()))
+    status['last_success'] = (
+        {key: status[key] for key in ('path', 'finished_ts', 'duration_seconds', 'stored_bytes')}
+        if status['ok'] else previous.get('last_success')
+    )
+    path = os.path.join(backup_dir, STATUS_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+def read_status(backup_dir=None):
+    """The contents of last_backup.json, or None if no backup has run."""
+    path = os.path.join(backup_dir or get_backup_dir(), STATUS_FILE)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def get_backup_health(backup_dir=None):
+    """Summary of the backups for /health: the last run, the last good
+    backup and whether that is older than DB_BACKUP_MAX_AGE_HOURS."""
+    status = read_status(backup_dir)
+    max_age = float(os.getenv('DB_BACKUP_MAX_AGE_HOURS', DEFAULT_MAX_AGE_HOURS))
+    if status is None:
+        return {'last_run_ok': None, 'last_success': None, 'age_hours': None, 'stale': True}
+    success = status.get('last_success')
+    age_hours = round((time.time() - success['finished_ts']) / 3600, 1) if success else None
+    return {
+        'last_run_ok': status['ok'],
+        'last_error': status.get('error'),
+        'last_success': success,
+        'age_hours': age_hours,
+        'stale': age_hours is None or age_hours > max_age,
+        'backups': len(list_backups(backup_dir)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backup of the warehouse database.")
+    parser.add_argument('command', nargs='?', choices=['backup', 'status'], default='backup')
+    parser.add_argument('--dir', default=None, help="Backup directory (default DB_BACKUP_DIR or backups/)")
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP, help=f"Backups to keep (default {DEFAULT_KEEP})")
+    parser.add_argument('--pages', type=int, default=DEFAULT_PAGES, help=f"Pages per step (default {DEFAULT_PAGES})")
+    parser.add_argument('--sleep-ms', type=float, default=DEFAULT_SLEEP_MS,
+                        help=f"Pause between steps (default {DEFAULT_SLEEP_MS})")
+    parser.add_argument('--no-compress', action='store_true', help="Keep the plain .db file")
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        print(json.dumps(get_backup_health(args.dir), ensure_ascii=False, indent=2))
+        return
+
+    try:
+        status = backup_database(args.dir, args.pages, args.sleep_ms, args.keep, not args.no_compress)
+    except Exception as e:
+        print(f"❌ Backup failed: {e}")
+        sys.exit(1)
+    print(f"✅ Backup created: {status['path']}")
+    print(f"  {status['size_bytes'] / 1024 / 1024:.1f} MB database, {status['stored_bytes'] / 1024 / 1024:.1f} MB stored; "
+          f"copied in {status['copy_seconds']:.2f}s ({status['steps']} steps, {status['restarts']} restarts), "
+          f"integrity ok, {status['duration_seconds']:.2f}s total")
+    for name in status['removed']:
+        print(f"  🗑 Removed old backup {name}")
+    print(f"  Total backups: {len(list_backups(args.dir))}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""Bulk catalog import from CSV or JSON.
+
+Rows are streamed from the input file, validated, and inserted with
+``executemany`` in batches inside a single transaction. Category,
+subcategory, brand and measure type names are resolved to ids through
+in-memory lookup maps; missing ones are created on the fly.
+
+Usage (from the project root):
+    python database/bulk_import.py catalog.csv
+    python database/bulk_import.py catalog.json --batch-size 5000
+
+Columns (CSV header or JSON keys):
+    name, custom_code, category, subcategory, brand, measure_type   (required)
+    description, available_count, video_url, low_stock_threshold    (optional)
+
+``low_stock_threshold`` is only used when a new measure type is created.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import database as db
+from database import utils
+
+REQUIRED_FIELDS = ('name', 'custom_code', 'category', 'subcategory', 'brand', 'measure_type')
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ImportReport:
+    """Outcome of a bulk import."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []  # (row number, message)
+        self.created = {'categories': 0, 'subcategories': 0, 'brands': 0, 'measure_types': 0}
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"ImportReport(inserted={self.inserted}, errors={len(self.errors)}, "
+                f"elapsed={self.elapsed:.2f}s, rows_per_second={self.rows_per_second:.0f})")
+
+class _Lookups:
+    """In-memory name -> id maps, creating missing reference rows on demand."""
+
+    def __init__(self, conn, report, created_at):
+        self.conn = conn
+        self.report = report
+        self.created_at = created_at
+        self.categories = {name: id_ for id_, name in conn.execute('SELECT id, name FROM categories')}
+        self.brands = {name: id_ for id_, name in conn.execute('SELECT id, name FROM brands')}
+        self.measure_types = {name: id_ for id_, name in conn.execute('SELECT id, name FROM measure_types')}
+        self.subcategories = {
+            (category_id, name): id_
+            for id_, category_id, name in conn.execute('SELECT id, category_id, name FROM subcategories')
+        }
+
+    def _insert_with_code(self, sql, prefix, values):
+        """Insert a reference row with the next code for ``prefix``."""
+        code = db.allocate_codes(prefix)[0]
+        return self.conn.execute(sql, (code, *values, self.created_at)).lastrowid
+
+    def category(self, name):
+        if name not in self.categories:
+            self.categories[name] = self._insert_with_code(
+                'INSERT INTO categories (code, name, created_at) VALUES (?, ?, ?)',
+                'CAT', (name,)
+            )
+            self.report.created['categories'] += 1
+        return self.categories[name]
+
+    def subcategory(self, name, category_id):
+        key = (category_id, name)
+        if key not in self.subcategories:
+            self.subcategories[key] = self._insert_with_code(
+                'INSERT INTO subcategories (code, name, category_id, created_at) VALUES (?, ?, ?, ?)',
+                'SUB', (name, category_id)
+            )
+            self.report.created['subcategories'] += 1
+        return self.subcategories[key]
+
+    def brand(self, name):
+        if name not in self.brands:
+            self.brands[name] = self._insert_with_code(
+                'INSERT INTO brands (code, name, created_at) VALUES (?, ?, ?)',
+                'BRD', (name,)
+            )
+            self.report.created['brands'] += 1
+        return self.brands[name]
+
+    def measure_type(self, name, low_stock_threshold):
+        if name not in self.measure_types:
+            self.measure_types[name] = self._insert_with_code(
+                'INSERT INTO measure_types (code, name, low_stock_threshold, created_at) VALUES (?, ?, ?, ?)',
+                'MSR', (name, low_stock_threshold)
+            )
+            self.report.created['measure_types'] += 1
+        return self.measure_types[name]
+
+def _clean(value):
+    """Strip strings and turn empty values into None."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+def _number(value, field):
+    """Parse a non-negative number, or None if the value is empty."""
+    value = _clean(value)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number, got {value!r}")
+    if number < 0:
+        raise ValueError(f"{field} must be 0 or more, got {value!r}")
+    return number
+
+def _prepare_row(row, lookups, created_at, created_ts):
+    """Validate one input row and turn it into an items INSERT tuple (without the code)."""
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    values = {key: _clean(row.get(key)) for key in REQUIRED_FIELDS}
+    missing = [key for key, value in values.items() if value is None]
+    if missing:
+        raise ValueError(f"missing required field(s): {', '.join(missing)}")
+
+    available_count = _number(row.get('available_count'), 'available_count') or 0
+    low_stock_threshold = _number(row.get('low_stock_threshold'), 'low_stock_threshold') or 0
+
+    category_id = lookups.category(str(values['category']))
+    subcategory_id = lookups.subcategory(str(values['subcategory']), category_id)
+    brand_id = lookups.brand(str(values['brand']))
+    measure_type_id = lookups.measure_type(str(values['measure_type']), low_stock_threshold)
+
+    return (
+        str(values['custom_code']), str(values['name']), _clean(row.get('description')),
+        category_id, subcategory_id, brand_id, measure_type_id,
+        available_count, _clean(row.get('video_url')), created_at, created_at, created_ts, created_ts
+    )
+
+_INSERT_ITEM = '''
+    INSERT INTO items (code, custom_code, name, description, category_id, subcategory_id,
+                       brand_id, measure_type_id, available_count, video_url, created_at, updated_at,
+                       created_ts, updated_ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Opening stock of the items inserted by one batch, as 'import' ledger movements
+_RECORD_IMPORTED_STOCK = '''
+    INSERT INTO stock_movements (item_id, delta, reason, actor, created_ts)
+    SELECT id, available_count, 'import', NULL, ? FROM items WHERE id > ? AND available_count != 0
+'''
+
+def _flush(conn, batch, report):
+    """Insert a batch with executemany, with one block of item codes allocated for the whole batch."""
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM items').fetchone()[0]
+    codes = db.allocate_codes('ITM', len(batch))
+    conn.executemany(_INSERT_ITEM, [(code, *values) for code, (_, values) in zip(codes, batch)])
+    report.inserted += len(batch)
+    conn.execute(_RECORD_IMPORTED_STOCK, (int(time.time()), last_id))
+
+def bulk_import_items(rows, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Import an iterable of item dicts in a single transaction.
+
+    ``rows`` is consumed lazily, so a generator over a large file keeps memory
+    flat. Rows that fail validation are skipped and reported with their
+    1-based row number instead of aborting the import. ``progress`` is called
+    with the report after every batch.
+
+    Returns an ImportReport.
+    """
+    report = ImportReport()
+    created_ts = int(time.time())
+    created_at = utils.timestamp_to_shamsi(created_ts)
+    start = time.perf_counter()
+
+    with db.transaction() as conn:
+        lookups = _Lookups(conn, report, created_at)
+        batch = []
+        for row_number, row in enumerate(rows, start=1):
+            try:
+                batch.append((row_number, _prepare_row(row, lookups, created_at, created_ts)))
+            except ValueError as e:
+                report.errors.append((row_number, str(e)))
+                continue
+            if len(batch) >= batch_size:
+                _flush(conn, batch, report)
+                batch = []
+                report.elapsed = time.perf_counter() - start
+                if progress:
+                    progress(report)
+        if batch:
+            _flush(conn, batch, report)
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+def iter_csv(path):
+    """Stream rows of a CSV file (with a header line) as dicts."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+def iter_json(path, chunk_size=64 * 1024):
+    """Stream the objects of a JSON array file, or of a JSON Lines file."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8-sig') as f:
+        buffer = ''
+        eof = False
+        while True:
+            # Skip whitespace and array punctuation between objects
+            buffer = buffer.lstrip(' \t\r\n,[]')
+            if not buffer:
+                if eof:
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield obj
+            buffer = buffer[end:]
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import items from a CSV or JSON file.")
+    parser.add_argument('path', help="CSV file with a header row, JSON array or JSON Lines file")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.path.lower().endswith(('.json', '.jsonl', '.ndjson')):
+        rows = iter_json(args.path)
+    else:
+        rows = iter_csv(args.path)
+
+    def progress(report):
+        print(f"  ... {report.inserted} rows ({report.rows_per_second:.0f} rows/s)")
+
+    print(f"🔄 Importing {args.path}...")
+    report = bulk_import_items(rows, batch_size=args.batch_size, progress=progress)
+
+    print(f"✅ Imported {report.inserted} items in {report.elapsed:.2f}s "
+          f"({report.rows_per_second:.0f} rows/s)")
+    created = ', '.join(f"{count} {name}" for name, count in report.created.items() if count)
+    if created:
+        print(f"➕ Created {created}")
+    if report.errors:
+        print(f"⚠️  {len(report.errors)} row(s) skipped:")
+        for row_number, message in report.errors[:50]:
+            print(f"    row {row_number}: {message}")
+        if len(report.errors) > 50:
+            print(f"    ... and {len(report.errors) - 50} more")
+    return 1 if report.errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
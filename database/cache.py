@@ -0,0 +1,127 @@
+"""In-process cache for the reference tables (categories, subcategories,
+brands, measure types).
+
+These lists are read on nearly every wizard step and catalog request but
+change rarely. Every cached result is tagged with the versions of the
+tables it was read from; triggers bump a table's row in ``table_versions``
+on every insert, update and delete. A lookup is a hit only while those
+versions are unchanged, so writes from this process, from another process
+(the bot and the API share the file) or from raw SQL are all picked up.
+
+Reading ``table_versions`` on every lookup would cost a query, so
+``TableVersions`` keeps a dedicated connection and re-reads the table only
+when ``PRAGMA data_version`` on that connection says another connection
+committed something. Entries also expire after ``ttl`` seconds and the
+least recently used ones are dropped beyond ``max_entries``.
+"""
+
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+# Maximum number of cached results (each subcategory list per category is one)
+DEFAULT_MAX_ENTRIES = 256
+# Seconds before an entry is re-read even if no version changed
+DEFAULT_TTL = 300
+
+def read_versions(conn):
+    """Read every table's version from ``table_versions`` as a dict."""
+    return dict(conn.execute('SELECT table_name, version FROM table_versions'))
+
+class TableVersions:
+    """Current table versions, re-read only when another connection has committed."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(
+            Path(path).resolve().as_uri() + '?mode=ro',
+            isolation_level=None,
+            check_same_thread=False,
+            uri=True
+        )
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._versions = {}
+
+    def current(self):
+        """Get ``{table: version}`` as of the latest commit."""
+        with self._lock:
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version != self._data_version:
+                self._versions = read_versions(self._conn)
+                self._data_version = data_version
+            return self._versions
+
+    def close(self):
+        """Close the watcher connection."""
+        with self._lock:
+            self._conn.close()
+
+class ReferenceCache:
+    """A bounded LRU cache of query results, validated against table versions."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl
+        self.versions = TableVersions(path)
+        # key -> (tables, versions, expires, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key, tables):
+        """Get the cached value for ``key``, or None if it is missing or stale."""
+        current = self.versions.current()
+        versions = tuple(current.get(table, 0) for table in tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] == versions and time.monotonic() < entry[2]:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[3]
+                del self._entries[key]
+            self._misses += 1
+        return None
+
+    def put(self, key, tables, versions, value):
+        """Store ``value`` read from ``tables`` at ``versions`` ({table: version})."""
+        if not self.max_entries:
+            return
+        versions = tuple(versions.get(table, 0) for table in tables)
+        with self._lock:
+            self._entries[key] = (tuple(tables), versions, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table):
+        """Drop every entry read from ``table``."""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if table in entry[0]]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Entry count and hit rate since the cache was created."""
+        with self._lock:
+            hits, misses, entries = self._hits, self._misses, len(self._entries)
+        return {
+            'entries': entries,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        }
+
+    def close(self):
+        """Drop every entry and close the watcher connection."""
+        self.clear()
+        self.versions.close()
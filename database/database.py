@@ -1,16 +1,607 @@
 import sqlite3
 import os
+import json
+import base64
+import logging
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-import jdatetime
+
+from .pool import ConnectionPool, DEFAULT_POOL_SIZE
+from .cache import ReferenceCache, read_versions, DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+from . import state_store
+from .utils import timestamp_to_shamsi, format_code
+from .records import (Category, Subcategory, Brand, MeasureType, Item, ItemDetail,
+                      LowStockItem, ItemImage, StockMovement, StockBalance, PendingFileDeletion)
+
+logger = logging.getLogger(__name__)
 
 # Database file in the same directory as this module
 DATABASE_FILE = os.path.join(os.path.dirname(__file__), 'warehouse.db')
 
-def init_database():
-    """Initialize the database with all required tables."""
-    conn = sqlite3.connect(DATABASE_FILE)
+# Item photos saved by the bot
+IMAGES_DIR = os.path.join(os.path.dirname(__file__), 'images')
+
+# Shared connection pool, created on first use for the current DATABASE_FILE
+_pool = None
+_pool_lock = threading.Lock()
+
+# Read-only pool used inside reading() blocks; one connection per core by default
+DEFAULT_READER_POOL_SIZE = max(4, os.cpu_count() or 1)
+_reader_pool = None
+_reading = threading.local()
+
+# Cache for the reference-table lists (see cache.py)
+_reference_cache = None
+
+# Called with every statement run on the pooled connections (see instrument.py)
+_trace_callback = None
+
+# Write-behind store for the conversation states (see state_store.py)
+_state_store = None
+
+def get_pool():
+    """Get the shared connection pool, (re)creating it if DATABASE_FILE changed."""
+    global _pool
+    pool = _pool
+    if pool is None or pool.path != DATABASE_FILE:
+        with _pool_lock:
+            if _pool is None or _pool.path != DATABASE_FILE:
+                if _pool is not None:
+                    _pool.close()
+                size = int(os.getenv('DB_POOL_SIZE', DEFAULT_POOL_SIZE))
+                pool = ConnectionPool(DATABASE_FILE, size=size)
+                _bootstrap_schema(pool)
+                pool.set_trace_callback(_trace_callback)
+                _pool = pool
+            pool = _pool
+    return pool
+
+def get_reader_pool():
+    """Get the shared read-only pool, (re)creating it if DATABASE_FILE changed."""
+    global _reader_pool
+    pool = _reader_pool
+    if pool is None or pool.path != DATABASE_FILE:
+        # Read-only connections cannot create the schema, so bootstrap it first
+        get_pool()
+        with _pool_lock:
+            if _reader_pool is None or _reader_pool.path != DATABASE_FILE:
+                if _reader_pool is not None:
+                    _reader_pool.close()
+                size = int(os.getenv('DB_READER_POOL_SIZE', DEFAULT_READER_POOL_SIZE))
+                _reader_pool = ConnectionPool(DATABASE_FILE, size=size, readonly=True)
+                _reader_pool.set_trace_callback(_trace_callback)
+            pool = _reader_pool
+    return pool
+
+def get_reference_cache():
+    """Get the reference-table cache, (re)creating it if DATABASE_FILE changed.
+
+    Sized by DB_REF_CACHE_SIZE (0 disables caching) and DB_CACHE_TTL (seconds).
+    """
+    global _reference_cache
+    cache = _reference_cache
+    if cache is None or cache.path != DATABASE_FILE:
+        # The cache watches the file read-only, so the schema must exist first
+        get_pool()
+        with _pool_lock:
+            if _reference_cache is None or _reference_cache.path != DATABASE_FILE:
+                if _reference_cache is not None:
+                    _reference_cache.close()
+                _reference_cache = ReferenceCache(
+                    DATABASE_FILE,
+                    max_entries=int(os.getenv('DB_REF_CACHE_SIZE', DEFAULT_MAX_ENTRIES)),
+                    ttl=float(os.getenv('DB_CACHE_TTL', DEFAULT_TTL))
+                )
+            cache = _reference_cache
+    return cache
+
+def get_state_store():
+    """Get the user-state store, (re)creating it if DATABASE_FILE changed.
+
+    Sized by DB_STATE_CACHE_SIZE (users kept in memory; 0 turns the store off
+    and returns None, so states are read and written directly), DB_STATE_TTL
+    (idle seconds) and DB_STATE_FLUSH_MS (longest delay before a change is written).
+    """
+    global _state_store
+    store = _state_store
+    if store is None or store.path != DATABASE_FILE:
+        max_entries = int(os.getenv('DB_STATE_CACHE_SIZE', state_store.DEFAULT_MAX_ENTRIES))
+        if max_entries <= 0:
+            return None
+        # The store has its own connection, so the schema must exist first
+        get_pool()
+        with _pool_lock:
+            if _state_store is None or _state_store.path != DATABASE_FILE:
+                if _state_store is not None:
+                    # Writes its pending states to the file it was created for
+                    _state_store.close()
+                _state_store = state_store.UserStateStore(
+                    DATABASE_FILE,
+                    max_entries=max_entries,
+                    ttl=float(os.getenv('DB_STATE_TTL', state_store.DEFAULT_TTL)),
+                    flush_ms=float(os.getenv('DB_STATE_FLUSH_MS', state_store.DEFAULT_FLUSH_MS))
+                )
+            store = _state_store
+    return store
+
+def close_pool():
+    """Write pending user states and close all pooled connections (e.g. on shutdown)."""
+    global _pool, _reader_pool, _reference_cache, _state_store
+    with _pool_lock:
+        if _state_store is not None:
+            _state_store.close()
+            _state_store = None
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+        if _reader_pool is not None:
+            _reader_pool.close()
+            _reader_pool = None
+        if _reference_cache is not None:
+            _reference_cache.close()
+            _reference_cache = None
+
+def connection():
+    """Context manager that borrows a pooled connection.
+
+    Inside a reading() block this is the block's read-only connection.
+
+    Usage:
+        with connection() as conn:
+            rows = conn.execute('SELECT ...').fetchall()
+    """
+    pool = get_pool()
+    if getattr(_reading, 'active', False) and pool.current() is None:
+        return get_reader_pool().connection()
+    return pool.connection()
+
+@contextmanager
+def reading():
+    """Serve the reads in the ``with`` block from the read-only pool.
+
+    All queries in the block run on one read-only connection in one read
+    transaction, so they see a consistent snapshot and never wait for the
+    write pool. Writes in the block still go to the write pool, and a block
+    opened inside a transaction keeps reading through it, so it sees its own
+    uncommitted changes.
+
+        with reading():
+            items, next_cursor = get_items_page(limit=50)
+            total = count_items()
+    """
+    if getattr(_reading, 'active', False) or get_pool().current() is not None:
+        yield
+        return
+    with get_reader_pool().snapshot():
+        _reading.active = True
+        try:
+            yield
+        finally:
+            _reading.active = False
+
+def set_trace_callback(callback):
+    """Call ``callback(sql)`` for every statement run on the pooled connections; None stops tracing."""
+    global _trace_callback
+    with _pool_lock:
+        _trace_callback = callback
+        for pool in (_pool, _reader_pool):
+            if pool is not None:
+                pool.set_trace_callback(callback)
+
+def get_trace_callback():
+    """The callback set with set_trace_callback(), or None."""
+    return _trace_callback
+
+def get_connection_stats():
+    """Per-connection usage of the write and read-only pools (see ConnectionPool.stats())."""
+    return {
+        'writer': get_pool().stats(),
+        'readers': _reader_pool.stats() if _reader_pool is not None else [],
+    }
+
+def get_cache_stats():
+    """Hit rate and size of the reference-table cache (see ReferenceCache.stats())."""
+    return get_reference_cache().stats()
+
+def get_state_stats():
+    """Hit rate and pending writes of the user-state store (see UserStateStore.stats()), or None if it is off."""
+    store = get_state_store()
+    return store.stats() if store is not None else None
+
+def transaction():
+    """Context manager that runs its block in a single committed transaction.
+
+    Calls to the CRUD functions below made inside the block join the same
+    transaction, so several writes can be committed (or rolled back) together:
+
+        with transaction():
+            category_id = create_category(name)
+            create_subcategory(sub_name, None, category_id)
+    """
+    return get_pool().transaction()
+
+def _query(conn, record, sql, params=()):
+    """Run a SELECT on ``conn`` and build its rows as ``record`` objects."""
     cursor = conn.cursor()
-    
+    cursor.row_factory = record.row_factory
+    return cursor.execute(sql, params)
+
+def _cached_query(tables, record, sql, params=()):
+    """Run a SELECT over the reference ``tables`` through the reference cache.
+
+    Returns a list of ``record`` rows. A thread holding a write connection
+    (e.g. inside transaction()) bypasses the cache, so it sees its own
+    uncommitted changes and never caches them.
+    """
+    cache = get_reference_cache()
+    if not cache.max_entries or get_pool().current() is not None:
+        with connection() as conn:
+            return _query(conn, record, sql, params).fetchall()
+    key = (sql, params)
+    rows = cache.get(key, tables)
+    if rows is None:
+        with connection() as conn:
+            # Versions are read first, so a commit in between only makes the entry stale early
+            versions = read_versions(conn)
+            rows = _query(conn, record, sql, params).fetchall()
+        cache.put(key, tables, versions, rows)
+    return list(rows)
+
+def _now():
+    """The current time as (epoch seconds, Shamsi display string)."""
+    now = int(time.time())
+    return now, timestamp_to_shamsi(now)
+
+def _invalidate(table):
+    """Drop cached results read from ``table`` after writing to it."""
+    cache = _reference_cache
+    if cache is not None:
+        cache.invalidate(table)
+
+# Secondary indexes for every lookup and ORDER BY used by the queries below
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_categories_name ON categories (name)',
+    'CREATE INDEX IF NOT EXISTS idx_subcategories_name ON subcategories (name)',
+    'CREATE INDEX IF NOT EXISTS idx_subcategories_category ON subcategories (category_id, name)',
+    'CREATE INDEX IF NOT EXISTS idx_brands_name ON brands (name)',
+    'CREATE INDEX IF NOT EXISTS idx_measure_types_name ON measure_types (name)',
+    'CREATE INDEX IF NOT EXISTS idx_items_created_ts ON items (created_ts)',
+    'CREATE INDEX IF NOT EXISTS idx_items_updated_ts ON items (updated_ts)',
+    'CREATE INDEX IF NOT EXISTS idx_items_name ON items (name)',
+    'CREATE INDEX IF NOT EXISTS idx_items_brand ON items (brand_id, created_ts)',
+    'CREATE INDEX IF NOT EXISTS idx_items_subcategory ON items (subcategory_id, created_ts)',
+    'CREATE INDEX IF NOT EXISTS idx_items_category ON items (category_id, created_ts)',
+    'CREATE INDEX IF NOT EXISTS idx_items_measure_type ON items (measure_type_id, created_ts)',
+    'CREATE INDEX IF NOT EXISTS idx_item_images_item ON item_images (item_id)',
+    'CREATE INDEX IF NOT EXISTS idx_item_images_path ON item_images (image_path)',
+]
+
+# Items table, with ``{table}`` standing for its name so migrations can build
+# a copy. Deleting a category, subcategory, brand or measure type deletes its
+# items, and through item_images their photos
+ITEMS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        code TEXT UNIQUE NOT NULL,
+        custom_code TEXT NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT,
+        category_id INTEGER NOT NULL,
+        subcategory_id INTEGER NOT NULL,
+        brand_id INTEGER NOT NULL,
+        measure_type_id INTEGER NOT NULL,
+        available_count REAL DEFAULT 0,
+        video_url TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        created_ts INTEGER NOT NULL,
+        updated_ts INTEGER NOT NULL,
+        FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE,
+        FOREIGN KEY (subcategory_id) REFERENCES subcategories(id) ON DELETE CASCADE,
+        FOREIGN KEY (brand_id) REFERENCES brands(id) ON DELETE CASCADE,
+        FOREIGN KEY (measure_type_id) REFERENCES measure_types(id) ON DELETE CASCADE
+    )
+'''
+
+# Full-text search index over items, kept in sync with the items table by triggers
+SEARCH_INDEX_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+        name, custom_code, description,
+        content='items', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts (rowid, name, custom_code, description)
+        VALUES (new.id, new.name, new.custom_code, new.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts (items_fts, rowid, name, custom_code, description)
+        VALUES ('delete', old.id, old.name, old.custom_code, old.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF name, custom_code, description ON items BEGIN
+        INSERT INTO items_fts (items_fts, rowid, name, custom_code, description)
+        VALUES ('delete', old.id, old.name, old.custom_code, old.description);
+        INSERT INTO items_fts (rowid, name, custom_code, description)
+        VALUES (new.id, new.name, new.custom_code, new.description);
+    END''',
+]
+
+# bm25 column weights for items_fts: name, custom_code, description
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Only the newest N matches of a search are ranked, so very broad queries
+# (a word found in half the catalog) stay fast. Narrow queries are ranked in full.
+SEARCH_RANK_WINDOW = 1000
+
+# Tables whose row counts are maintained by triggers in row_counts
+COUNTED_TABLES = ['categories', 'subcategories', 'brands', 'measure_types', 'items']
+
+# Append-only stock ledger: one row per stock change, plus periodic snapshots
+# of each item's balance so balances never need the whole ledger
+STOCK_LEDGER_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS stock_movements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_id INTEGER NOT NULL,
+        delta REAL NOT NULL,
+        reason TEXT NOT NULL,
+        actor TEXT,
+        created_ts INTEGER NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_stock_movements_item ON stock_movements (item_id, created_ts)',
+    '''CREATE TABLE IF NOT EXISTS stock_snapshots (
+        item_id INTEGER NOT NULL,
+        snapshot_ts INTEGER NOT NULL,
+        balance REAL NOT NULL,
+        movement_id INTEGER NOT NULL,
+        PRIMARY KEY (item_id, snapshot_ts)
+    ) WITHOUT ROWID''',
+]
+
+# Items at or below their measure type's low stock threshold, kept current by
+# triggers on items and measure_types so low-stock reads never scan the catalog
+LOW_STOCK_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS low_stock (
+        item_id INTEGER PRIMARY KEY,
+        available_count REAL NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_low_stock_count ON low_stock (available_count)',
+    '''CREATE TRIGGER IF NOT EXISTS items_low_stock_insert AFTER INSERT ON items BEGIN
+        INSERT INTO low_stock (item_id, available_count)
+        SELECT new.id, new.available_count FROM measure_types
+        WHERE id = new.measure_type_id AND new.available_count <= low_stock_threshold;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS items_low_stock_update
+    AFTER UPDATE OF available_count, measure_type_id ON items BEGIN
+        DELETE FROM low_stock WHERE item_id = old.id;
+        INSERT INTO low_stock (item_id, available_count)
+        SELECT new.id, new.available_count FROM measure_types
+        WHERE id = new.measure_type_id AND new.available_count <= low_stock_threshold;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS items_low_stock_delete AFTER DELETE ON items BEGIN
+        DELETE FROM low_stock WHERE item_id = old.id;
+    END''',
+    # A threshold change only re-evaluates the items of that measure type;
+    # update_measure_type() always sets the threshold, so renames are skipped
+    '''CREATE TRIGGER IF NOT EXISTS measure_types_low_stock_update
+    AFTER UPDATE OF low_stock_threshold ON measure_types
+    WHEN old.low_stock_threshold IS NOT new.low_stock_threshold BEGIN
+        DELETE FROM low_stock WHERE item_id IN (SELECT id FROM items WHERE measure_type_id = old.id);
+        INSERT INTO low_stock (item_id, available_count)
+        SELECT id, available_count FROM items
+        WHERE measure_type_id = new.id AND available_count <= new.low_stock_threshold;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS measure_types_low_stock_delete AFTER DELETE ON measure_types BEGIN
+        DELETE FROM low_stock WHERE item_id IN (SELECT id FROM items WHERE measure_type_id = old.id);
+    END''',
+]
+
+# Image files waiting to be removed from disk. Deleting an item_images row,
+# directly or through a cascade, queues its file in the same transaction;
+# file_cleanup.FileReaper removes the files afterwards, outside any transaction
+FILE_DELETION_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS pending_file_deletions (
+        id INTEGER PRIMARY KEY,
+        path TEXT NOT NULL,
+        queued_ts INTEGER NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS item_images_file_delete AFTER DELETE ON item_images BEGIN
+        INSERT INTO pending_file_deletions (path, queued_ts)
+        VALUES (old.image_path, CAST(strftime('%s', 'now') AS INTEGER));
+    END''',
+]
+
+# Code prefix of every table whose rows get generated codes (CAT000001, ...)
+CODE_PREFIXES = {
+    'categories': 'CAT',
+    'subcategories': 'SUB',
+    'brands': 'BRD',
+    'measure_types': 'MSR',
+    'items': 'ITM',
+}
+
+# Reference tables cached by cache.py; triggers bump their row in
+# table_versions on every change
+VERSIONED_TABLES = ['categories', 'subcategories', 'brands', 'measure_types']
+
+# Stored in PRAGMA user_version; must equal the version of the last
+# migration registered in migrations.py
+SCHEMA_VERSION = 7
+
+def init_database():
+    """Make sure the database schema is current and the images directory exists.
+
+    Idempotent and cheap to call on startup: when ``PRAGMA user_version``
+    already matches SCHEMA_VERSION no DDL is run. The schema is also checked
+    lazily when the connection pool is first created.
+    """
+    _bootstrap_schema(get_pool())
+    os.makedirs(IMAGES_DIR, exist_ok=True)
+
+def _bootstrap_schema(pool):
+    """Bring ``pool``'s database up to SCHEMA_VERSION unless user_version says it is current.
+
+    A new database gets the current schema directly; an older one runs the
+    pending migrations from ``migrations.py``.
+    """
+    with pool.connection() as conn:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            logger.warning(f"Database schema version {version} is newer than this code ({SCHEMA_VERSION})")
+        if version >= SCHEMA_VERSION:
+            return
+    from .migrations import apply_migrations
+    apply_migrations(pool)
+
+def create_schema(cursor):
+    """Create every table, index, trigger and counter of the current schema that is missing."""
+    _create_tables(cursor)
+    for index_sql in INDEXES:
+        cursor.execute(index_sql)
+    create_search_index(cursor)
+    create_row_counters(cursor)
+    create_stock_ledger(cursor)
+    create_table_versions(cursor)
+    create_low_stock(cursor)
+    create_code_sequences(cursor)
+    create_file_deletions(cursor)
+
+def create_search_index(cursor):
+    """Create the items_fts search index and its triggers.
+
+    A newly created index is filled from the existing items. Returns False if
+    this SQLite build has no FTS5, in which case search_items() falls back to
+    LIKE matching.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'")
+    exists = cursor.fetchone() is not None
+    try:
+        for statement in SEARCH_INDEX_SCHEMA:
+            cursor.execute(statement)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Full-text search unavailable, falling back to LIKE search: {e}")
+        return False
+    if not exists:
+        cursor.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+    _search_index_available.pop(DATABASE_FILE, None)
+    return True
+
+def create_row_counters(cursor):
+    """Create the row_counts table and the triggers that keep it current.
+
+    Counters are seeded from the existing rows when the table is first created.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'row_counts'")
+    exists = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS row_counts (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for table in COUNTED_TABLES:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_count_insert AFTER INSERT ON {table} BEGIN
+                UPDATE row_counts SET row_count = row_count + 1 WHERE table_name = '{table}';
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_count_delete AFTER DELETE ON {table} BEGIN
+                UPDATE row_counts SET row_count = row_count - 1 WHERE table_name = '{table}';
+            END
+        ''')
+    if not exists:
+        for table in COUNTED_TABLES:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO row_counts (table_name, row_count) SELECT ?, COUNT(*) FROM {table}',
+                (table,)
+            )
+
+def create_stock_ledger(cursor):
+    """Create the stock ledger tables.
+
+    When the ledger is first created, every item with stock gets an 'opening'
+    movement so ledger balances match available_count from the start.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stock_movements'")
+    exists = cursor.fetchone() is not None
+    for statement in STOCK_LEDGER_SCHEMA:
+        cursor.execute(statement)
+    if not exists:
+        cursor.execute(
+            '''INSERT INTO stock_movements (item_id, delta, reason, actor, created_ts)
+               SELECT id, available_count, 'opening', NULL, ? FROM items WHERE available_count != 0''',
+            (int(time.time()),)
+        )
+
+def create_low_stock(cursor):
+    """Create the low_stock table and its triggers.
+
+    The table is filled from the existing items when it is first created.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'low_stock'")
+    exists = cursor.fetchone() is not None
+    for statement in LOW_STOCK_SCHEMA:
+        cursor.execute(statement)
+    if not exists:
+        cursor.execute('''
+            INSERT INTO low_stock (item_id, available_count)
+            SELECT i.id, i.available_count
+            FROM items i
+            JOIN measure_types m ON i.measure_type_id = m.id
+            WHERE i.available_count <= m.low_stock_threshold
+        ''')
+
+def create_file_deletions(cursor):
+    """Create the pending_file_deletions queue and the trigger that fills it."""
+    for statement in FILE_DELETION_SCHEMA:
+        cursor.execute(statement)
+
+def create_code_sequences(cursor):
+    """Create the code_sequences table that allocate_codes() counts in.
+
+    A missing counter starts after the highest numeric code already in use
+    for its prefix, so allocated codes never collide with the random codes
+    of older versions.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS code_sequences (
+            prefix TEXT PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    existing = {row[0] for row in cursor.execute('SELECT prefix FROM code_sequences').fetchall()}
+    for table, prefix in CODE_PREFIXES.items():
+        if prefix in existing:
+            continue
+        cursor.execute(
+            f'''INSERT INTO code_sequences (prefix, next_value)
+                SELECT ?, COALESCE(MAX(CAST(SUBSTR(code, ?) AS INTEGER)), 0) + 1
+                FROM {table} WHERE code GLOB ?''',
+            (prefix, len(prefix) + 1, f'{prefix}[0-9]*')
+        )
+
+def create_table_versions(cursor):
+    """Create the table_versions table and the triggers that bump it."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for table in VERSIONED_TABLES:
+        cursor.execute('INSERT OR IGNORE INTO table_versions (table_name) VALUES (?)', (table,))
+        for event in ('insert', 'update', 'delete'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event} AFTER {event.upper()} ON {table} BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+                END
+            ''')
+
+def _create_tables(cursor):
+    """Create all tables that do not exist yet."""
     # Categories table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS categories (
@@ -55,27 +646,7 @@ def init_database():
     ''')
     
     # Items table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            code TEXT UNIQUE NOT NULL,
-            custom_code TEXT NOT NULL,
-            name TEXT NOT NULL,
-            description TEXT,
-            category_id INTEGER NOT NULL,
-            subcategory_id INTEGER NOT NULL,
-            brand_id INTEGER NOT NULL,
-            measure_type_id INTEGER NOT NULL,
-            available_count REAL DEFAULT 0,
-            video_url TEXT,
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL,
-            FOREIGN KEY (category_id) REFERENCES categories(id),
-            FOREIGN KEY (subcategory_id) REFERENCES subcategories(id),
-            FOREIGN KEY (brand_id) REFERENCES brands(id),
-            FOREIGN KEY (measure_type_id) REFERENCES measure_types(id)
-        )
-    ''')
+    cursor.execute(ITEMS_TABLE.format(table='items'))
     
     # Item images table
     cursor.execute('''
@@ -107,498 +678,717 @@ def init_database():
             authenticated_at TEXT NOT NULL
         )
     ''')
-    
-    conn.commit()
-    conn.close()
-    
-    # Create images directory if it doesn't exist
-    images_dir = os.path.join(os.path.dirname(__file__), 'images')
-    if not os.path.exists(images_dir):
-        os.makedirs(images_dir)
 
 def get_connection():
-    """Get a database connection."""
+    """Get a standalone (non-pooled) database connection; the caller must close it."""
     return sqlite3.connect(DATABASE_FILE)
 
+# Code allocation
+def allocate_codes(prefix, count=1):
+    """Reserve ``count`` consecutive codes for ``prefix`` (see CODE_PREFIXES).
+
+    Returns the codes as a list. Runs in the caller's transaction when there
+    is one, so codes are only used up if that transaction commits, and one
+    call reserves a whole block for bulk inserts.
+    """
+    if count < 1:
+        return []
+    with transaction() as conn:
+        cursor = conn.execute(
+            'UPDATE code_sequences SET next_value = next_value + ? WHERE prefix = ?', (count, prefix)
+        )
+        if cursor.rowcount == 0:
+            raise ValueError(f"Unknown code prefix: {prefix}")
+        end = conn.execute('SELECT next_value FROM code_sequences WHERE prefix = ?', (prefix,)).fetchone()[0]
+    return [format_code(prefix, number) for number in range(end - count, end)]
+
 # Category CRUD operations
-def create_category(name, code):
-    """Create a new category."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    created_at = jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+def create_category(name, code=None):
+    """Create a new category; without a ``code`` the next CAT code is allocated."""
+    created_at = _now()[1]
     try:
-        cursor.execute(
-            'INSERT INTO categories (code, name, created_at) VALUES (?, ?, ?)',
-            (code, name, created_at)
-        )
-        conn.commit()
-        category_id = cursor.lastrowid
-        conn.close()
-        return category_id
+        with transaction() as conn:
+            code = code or allocate_codes('CAT')[0]
+            cursor = conn.execute(
+                'INSERT INTO categories (code, name, created_at) VALUES (?, ?, ?)',
+                (code, name, created_at)
+            )
     except sqlite3.IntegrityError:
-        conn.close()
         return None
+    _invalidate('categories')
+    return cursor.lastrowid
 
 def get_all_categories():
     """Get all categories."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, code, name, created_at FROM categories ORDER BY name')
-    categories = cursor.fetchall()
-    conn.close()
-    return categories
+    return _cached_query(('categories',), Category, 'SELECT id, code, name, created_at FROM categories ORDER BY name')
 
 def get_category_by_id(category_id):
     """Get a category by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, code, name, created_at FROM categories WHERE id = ?', (category_id,))
-    category = cursor.fetchone()
-    conn.close()
-    return category
+    with connection() as conn:
+        return _query(
+            conn, Category, 'SELECT id, code, name, created_at FROM categories WHERE id = ?', (category_id,)
+        ).fetchone()
 
 def update_category(category_id, name):
     """Update a category."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE categories SET name = ? WHERE id = ?', (name, category_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('UPDATE categories SET name = ? WHERE id = ?', (name, category_id))
+    _invalidate('categories')
 
 def delete_category(category_id):
     """Delete a category."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('DELETE FROM categories WHERE id = ?', (category_id,))
+    _invalidate('categories')
 
 # Subcategory CRUD operations
 def create_subcategory(name, code, category_id):
-    """Create a new subcategory."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    created_at = jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+    """Create a new subcategory; with ``code=None`` the next SUB code is allocated."""
+    created_at = _now()[1]
     try:
-        cursor.execute(
-            'INSERT INTO subcategories (code, name, category_id, created_at) VALUES (?, ?, ?, ?)',
-            (code, name, category_id, created_at)
-        )
-        conn.commit()
-        subcategory_id = cursor.lastrowid
-        conn.close()
-        return subcategory_id
+        with transaction() as conn:
+            code = code or allocate_codes('SUB')[0]
+            cursor = conn.execute(
+                'INSERT INTO subcategories (code, name, category_id, created_at) VALUES (?, ?, ?, ?)',
+                (code, name, category_id, created_at)
+            )
     except sqlite3.IntegrityError:
-        conn.close()
         return None
+    _invalidate('subcategories')
+    return cursor.lastrowid
 
 def get_all_subcategories():
     """Get all subcategories with their category names."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
+    return _cached_query(('subcategories', 'categories'), Subcategory, '''
         SELECT s.id, s.code, s.name, s.category_id, c.name, s.created_at
         FROM subcategories s
         JOIN categories c ON s.category_id = c.id
         ORDER BY s.name
     ''')
-    subcategories = cursor.fetchall()
-    conn.close()
-    return subcategories
 
 def get_subcategories_by_category(category_id):
     """Get all subcategories for a specific category."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        'SELECT id, code, name, created_at FROM subcategories WHERE category_id = ? ORDER BY name',
-        (category_id,)
-    )
-    subcategories = cursor.fetchall()
-    conn.close()
-    return subcategories
-
-def get_subcategory_by_id(subcategory_id):
-    """Get a subcategory by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
+    return _cached_query(('subcategories', 'categories'), Subcategory, '''
         SELECT s.id, s.code, s.name, s.category_id, c.name, s.created_at
         FROM subcategories s
         JOIN categories c ON s.category_id = c.id
-        WHERE s.id = ?
-    ''', (subcategory_id,))
-    subcategory = cursor.fetchone()
-    conn.close()
-    return subcategory
+        WHERE s.category_id = ?
+        ORDER BY s.name
+    ''', (category_id,))
+
+def get_subcategory_by_id(subcategory_id):
+    """Get a subcategory by ID."""
+    with connection() as conn:
+        return _query(conn, Subcategory, '''
+            SELECT s.id, s.code, s.name, s.category_id, c.name, s.created_at
+            FROM subcategories s
+            JOIN categories c ON s.category_id = c.id
+            WHERE s.id = ?
+        ''', (subcategory_id,)).fetchone()
 
 def update_subcategory(subcategory_id, name):
     """Update a subcategory."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE subcategories SET name = ? WHERE id = ?', (name, subcategory_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('UPDATE subcategories SET name = ? WHERE id = ?', (name, subcategory_id))
+    _invalidate('subcategories')
 
 def delete_subcategory(subcategory_id):
     """Delete a subcategory."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM subcategories WHERE id = ?', (subcategory_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('DELETE FROM subcategories WHERE id = ?', (subcategory_id,))
+    _invalidate('subcategories')
 
 # Brand CRUD operations
-def create_brand(name, code):
-    """Create a new brand."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    created_at = jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+def create_brand(name, code=None):
+    """Create a new brand; without a ``code`` the next BRD code is allocated."""
+    created_at = _now()[1]
     try:
-        cursor.execute(
-            'INSERT INTO brands (code, name, created_at) VALUES (?, ?, ?)',
-            (code, name, created_at)
-        )
-        conn.commit()
-        brand_id = cursor.lastrowid
-        conn.close()
-        return brand_id
+        with transaction() as conn:
+            code = code or allocate_codes('BRD')[0]
+            cursor = conn.execute(
+                'INSERT INTO brands (code, name, created_at) VALUES (?, ?, ?)',
+                (code, name, created_at)
+            )
     except sqlite3.IntegrityError:
-        conn.close()
         return None
+    _invalidate('brands')
+    return cursor.lastrowid
 
 def get_all_brands():
     """Get all brands."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, code, name, created_at FROM brands ORDER BY name')
-    brands = cursor.fetchall()
-    conn.close()
-    return brands
+    return _cached_query(('brands',), Brand, 'SELECT id, code, name, created_at FROM brands ORDER BY name')
 
 def get_brand_by_id(brand_id):
     """Get a brand by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, code, name, created_at FROM brands WHERE id = ?', (brand_id,))
-    brand = cursor.fetchone()
-    conn.close()
-    return brand
+    with connection() as conn:
+        return _query(
+            conn, Brand, 'SELECT id, code, name, created_at FROM brands WHERE id = ?', (brand_id,)
+        ).fetchone()
 
 def update_brand(brand_id, name):
     """Update a brand."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE brands SET name = ? WHERE id = ?', (name, brand_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('UPDATE brands SET name = ? WHERE id = ?', (name, brand_id))
+    _invalidate('brands')
 
 def delete_brand(brand_id):
     """Delete a brand."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM brands WHERE id = ?', (brand_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('DELETE FROM brands WHERE id = ?', (brand_id,))
+    _invalidate('brands')
 
 # Measure Type CRUD operations
-def create_measure_type(name, code, low_stock_threshold=0):
-    """Create a new measure type."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    created_at = jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+def create_measure_type(name, code=None, low_stock_threshold=0):
+    """Create a new measure type; without a ``code`` the next MSR code is allocated."""
+    created_at = _now()[1]
     try:
-        cursor.execute(
-            'INSERT INTO measure_types (code, name, low_stock_threshold, created_at) VALUES (?, ?, ?, ?)',
-            (code, name, low_stock_threshold, created_at)
-        )
-        conn.commit()
-        measure_type_id = cursor.lastrowid
-        conn.close()
-        return measure_type_id
+        with transaction() as conn:
+            code = code or allocate_codes('MSR')[0]
+            cursor = conn.execute(
+                'INSERT INTO measure_types (code, name, low_stock_threshold, created_at) VALUES (?, ?, ?, ?)',
+                (code, name, low_stock_threshold, created_at)
+            )
     except sqlite3.IntegrityError:
-        conn.close()
         return None
+    _invalidate('measure_types')
+    return cursor.lastrowid
 
 def get_all_measure_types():
     """Get all measure types."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, code, name, low_stock_threshold, created_at FROM measure_types ORDER BY name')
-    measure_types = cursor.fetchall()
-    conn.close()
-    return measure_types
+    return _cached_query(
+        ('measure_types',), MeasureType,
+        'SELECT id, code, name, low_stock_threshold, created_at FROM measure_types ORDER BY name'
+    )
 
 def get_measure_type_by_id(measure_type_id):
     """Get a measure type by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, code, name, low_stock_threshold, created_at FROM measure_types WHERE id = ?', (measure_type_id,))
-    measure_type = cursor.fetchone()
-    conn.close()
-    return measure_type
+    with connection() as conn:
+        return _query(
+            conn, MeasureType,
+            'SELECT id, code, name, low_stock_threshold, created_at FROM measure_types WHERE id = ?',
+            (measure_type_id,)
+        ).fetchone()
 
 def update_measure_type(measure_type_id, name, low_stock_threshold):
     """Update a measure type."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE measure_types SET name = ?, low_stock_threshold = ? WHERE id = ?', 
-                   (name, low_stock_threshold, measure_type_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('UPDATE measure_types SET name = ?, low_stock_threshold = ? WHERE id = ?', 
+                     (name, low_stock_threshold, measure_type_id))
+    _invalidate('measure_types')
 
 def delete_measure_type(measure_type_id):
     """Delete a measure type."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM measure_types WHERE id = ?', (measure_type_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('DELETE FROM measure_types WHERE id = ?', (measure_type_id,))
+    _invalidate('measure_types')
 
 # Item CRUD operations
 def create_item(name, code, custom_code, category_id, subcategory_id, brand_id, measure_type_id, 
                 description=None, available_count=0, video_url=None):
-    """Create a new item."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    now = jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+    """Create a new item; with ``code=None`` the next ITM code is allocated."""
+    now_ts, now = _now()
     try:
-        cursor.execute(
-            '''INSERT INTO items (code, custom_code, name, description, category_id, subcategory_id, 
-               brand_id, measure_type_id, available_count, video_url, created_at, updated_at) 
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (code, custom_code, name, description, category_id, subcategory_id, brand_id, 
-             measure_type_id, available_count, video_url, now, now)
-        )
-        conn.commit()
-        item_id = cursor.lastrowid
-        conn.close()
-        return item_id
+        with transaction() as conn:
+            code = code or allocate_codes('ITM')[0]
+            cursor = conn.execute(
+                '''INSERT INTO items (code, custom_code, name, description, category_id, subcategory_id, 
+                   brand_id, measure_type_id, available_count, video_url, created_at, updated_at,
+                   created_ts, updated_ts)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (code, custom_code, name, description, category_id, subcategory_id, brand_id, 
+                 measure_type_id, available_count, video_url, now, now, now_ts, now_ts)
+            )
+            _record_movement(conn, cursor.lastrowid, available_count or 0, 'initial')
+            return cursor.lastrowid
     except sqlite3.IntegrityError:
-        conn.close()
         return None
 
 def get_all_items():
     """Get all items with their related data."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT i.id, i.code, i.custom_code, i.name, i.description,
-               c.name, s.name, b.name, m.name, i.available_count, i.video_url,
-               i.created_at, i.updated_at
-        FROM items i
-        JOIN categories c ON i.category_id = c.id
-        JOIN subcategories s ON i.subcategory_id = s.id
-        JOIN brands b ON i.brand_id = b.id
-        JOIN measure_types m ON i.measure_type_id = m.id
-        ORDER BY i.created_at DESC
-    ''')
-    items = cursor.fetchall()
-    conn.close()
-    return items
+    with connection() as conn:
+        return _query(conn, Item, '''
+            SELECT i.id, i.code, i.custom_code, i.name, i.description,
+                   c.name, s.name, b.name, m.name, i.available_count, i.video_url,
+                   i.created_at, i.updated_at, i.created_ts, i.updated_ts
+            FROM items i
+            JOIN categories c ON i.category_id = c.id
+            JOIN subcategories s ON i.subcategory_id = s.id
+            JOIN brands b ON i.brand_id = b.id
+            JOIN measure_types m ON i.measure_type_id = m.id
+            ORDER BY i.created_ts DESC
+        ''').fetchall()
 
-def search_items(search_text):
-    """Search items by name, custom_code, or description."""
-    conn = get_connection()
-    cursor = conn.cursor()
+# Whether items_fts exists, per database file (looked up once)
+_search_index_available = {}
+
+def _has_search_index(conn):
+    """Check whether the items_fts table exists in this database."""
+    available = _search_index_available.get(DATABASE_FILE)
+    if available is None:
+        available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'"
+        ).fetchone() is not None
+        _search_index_available[DATABASE_FILE] = available
+    return available
+
+def _fts_query(search_text):
+    """Turn free text into an FTS5 query: every word must match as a prefix.
+
+    Each word is quoted, so punctuation in codes like "A-12" is matched
+    literally instead of being parsed as FTS5 syntax.
+    """
+    terms = []
+    for word in search_text.split():
+        word = word.replace('"', '')
+        if any(ch.isalnum() for ch in word):
+            terms.append(f'"{word}"*')
+    return ' '.join(terms)
+
+def search_items(search_text, limit=None, offset=0):
+    """Search items by name, custom_code, or description, best matches first.
+
+    Every word of the search text matches any word that starts with it, and
+    results are ranked with bm25 (name matches weigh most, description least).
+    For queries with more than SEARCH_RANK_WINDOW matches only the newest ones
+    are ranked.
+    """
+    with connection() as conn:
+        if not _has_search_index(conn):
+            return _search_items_like(conn, search_text, limit, offset)
+        query = _fts_query(search_text)
+        if not query:
+            return []
+        window = SEARCH_RANK_WINDOW if limit is None else max(SEARCH_RANK_WINDOW, offset + limit)
+        return _query(conn, Item, '''
+            WITH candidates AS (
+                SELECT rowid AS item_id, bm25(items_fts, ?, ?, ?) AS score
+                FROM items_fts
+                WHERE items_fts MATCH ?
+                ORDER BY rowid DESC
+                LIMIT ?
+            ), matches AS (
+                SELECT item_id, score FROM candidates
+                ORDER BY score
+                LIMIT ? OFFSET ?
+            )
+            SELECT i.id, i.code, i.custom_code, i.name, i.description,
+                   c.name, s.name, b.name, m.name, i.available_count, i.video_url,
+                   i.created_at, i.updated_at, i.created_ts, i.updated_ts
+            FROM matches
+            JOIN items i ON i.id = matches.item_id
+            JOIN categories c ON i.category_id = c.id
+            JOIN subcategories s ON i.subcategory_id = s.id
+            JOIN brands b ON i.brand_id = b.id
+            JOIN measure_types m ON i.measure_type_id = m.id
+            ORDER BY matches.score
+        ''', (*SEARCH_WEIGHTS, query, window, -1 if limit is None else limit, offset)).fetchall()
+
+def count_search_items(search_text):
+    """Count the items that search_items() would return."""
+    with connection() as conn:
+        if not _has_search_index(conn):
+            search_pattern = f"%{search_text}%"
+            return conn.execute(
+                'SELECT COUNT(*) FROM items WHERE name LIKE ? OR custom_code LIKE ? OR description LIKE ?',
+                (search_pattern, search_pattern, search_pattern)
+            ).fetchone()[0]
+        query = _fts_query(search_text)
+        if not query:
+            return 0
+        return conn.execute('SELECT COUNT(*) FROM items_fts WHERE items_fts MATCH ?', (query,)).fetchone()[0]
+
+def _search_items_like(conn, search_text, limit, offset):
+    """Substring search for SQLite builds without FTS5."""
     search_pattern = f"%{search_text}%"
-    cursor.execute('''
+    return _query(conn, Item, '''
         SELECT i.id, i.code, i.custom_code, i.name, i.description,
                c.name, s.name, b.name, m.name, i.available_count, i.video_url,
-               i.created_at, i.updated_at
+               i.created_at, i.updated_at, i.created_ts, i.updated_ts
         FROM items i
         JOIN categories c ON i.category_id = c.id
         JOIN subcategories s ON i.subcategory_id = s.id
         JOIN brands b ON i.brand_id = b.id
         JOIN measure_types m ON i.measure_type_id = m.id
         WHERE i.name LIKE ? OR i.custom_code LIKE ? OR i.description LIKE ?
-        ORDER BY i.created_at DESC
-    ''', (search_pattern, search_pattern, search_pattern))
-    items = cursor.fetchall()
-    conn.close()
-    return items
+        ORDER BY i.created_ts DESC
+        LIMIT ? OFFSET ?
+    ''', (search_pattern, search_pattern, search_pattern,
+          -1 if limit is None else limit, offset)).fetchall()
 
 def get_items_by_brand(brand_id):
     """Get all items for a specific brand."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT i.id, i.code, i.custom_code, i.name, i.description,
-               c.name, s.name, b.name, m.name, i.available_count, i.video_url,
-               i.created_at, i.updated_at
-        FROM items i
-        JOIN categories c ON i.category_id = c.id
-        JOIN subcategories s ON i.subcategory_id = s.id
-        JOIN brands b ON i.brand_id = b.id
-        JOIN measure_types m ON i.measure_type_id = m.id
-        WHERE i.brand_id = ?
-        ORDER BY i.created_at DESC
-    ''', (brand_id,))
-    items = cursor.fetchall()
-    conn.close()
-    return items
+    with connection() as conn:
+        return _query(conn, Item, '''
+            SELECT i.id, i.code, i.custom_code, i.name, i.description,
+                   c.name, s.name, b.name, m.name, i.available_count, i.video_url,
+                   i.created_at, i.updated_at, i.created_ts, i.updated_ts
+            FROM items i
+            JOIN categories c ON i.category_id = c.id
+            JOIN subcategories s ON i.subcategory_id = s.id
+            JOIN brands b ON i.brand_id = b.id
+            JOIN measure_types m ON i.measure_type_id = m.id
+            WHERE i.brand_id = ?
+            ORDER BY i.created_ts DESC
+        ''', (brand_id,)).fetchall()
 
 def get_items_by_subcategory(subcategory_id):
     """Get all items for a specific subcategory."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT i.id, i.code, i.custom_code, i.name, i.description,
-               c.name, s.name, b.name, m.name, i.available_count, i.video_url,
-               i.created_at, i.updated_at
-        FROM items i
-        JOIN categories c ON i.category_id = c.id
-        JOIN subcategories s ON i.subcategory_id = s.id
-        JOIN brands b ON i.brand_id = b.id
-        JOIN measure_types m ON i.measure_type_id = m.id
-        WHERE i.subcategory_id = ?
-        ORDER BY i.created_at DESC
-    ''', (subcategory_id,))
-    items = cursor.fetchall()
-    conn.close()
-    return items
+    with connection() as conn:
+        return _query(conn, Item, '''
+            SELECT i.id, i.code, i.custom_code, i.name, i.description,
+                   c.name, s.name, b.name, m.name, i.available_count, i.video_url,
+                   i.created_at, i.updated_at, i.created_ts, i.updated_ts
+            FROM items i
+            JOIN categories c ON i.category_id = c.id
+            JOIN subcategories s ON i.subcategory_id = s.id
+            JOIN brands b ON i.brand_id = b.id
+            JOIN measure_types m ON i.measure_type_id = m.id
+            WHERE i.subcategory_id = ?
+            ORDER BY i.created_ts DESC
+        ''', (subcategory_id,)).fetchall()
+
+# Keyset pagination over items
+# sort name -> (ORDER BY columns, descending?)
+ITEM_SORTS = {
+    'newest': (('i.created_ts', 'i.id'), True),
+    'oldest': (('i.created_ts', 'i.id'), False),
+    'name': (('i.name', 'i.id'), False),
+    # Least recently changed first, so a client syncing changes can follow the cursor
+    'updated': (('i.updated_ts', 'i.id'), False),
+}
+
+# filter name -> condition on items
+ITEM_FILTERS = {
+    'category_id': 'i.category_id = ?',
+    'subcategory_id': 'i.subcategory_id = ?',
+    'brand_id': 'i.brand_id = ?',
+    'measure_type_id': 'i.measure_type_id = ?',
+    'updated_since': 'i.updated_ts >= ?',
+}
+
+def encode_cursor(sort, values):
+    """Encode the sort key of the last row of a page as an opaque cursor."""
+    raw = json.dumps([sort, *values], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor(); raises ValueError if it is invalid."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort, *values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if sort not in ITEM_SORTS or len(values) != len(ITEM_SORTS[sort][0]):
+        raise ValueError("Invalid cursor")
+    return sort, values
+
+def _item_filter_clause(filters):
+    """Build the WHERE conditions and parameters for item filters."""
+    conditions, params = [], []
+    for name, value in (filters or {}).items():
+        if value is None:
+            continue
+        if name not in ITEM_FILTERS:
+            raise ValueError(f"Unknown item filter: {name}")
+        conditions.append(ITEM_FILTERS[name])
+        params.append(value)
+    return conditions, params
+
+def get_items_page(cursor=None, limit=100, filters=None, sort='newest', offset=0):
+    """Get one page of items using keyset pagination.
+
+    Pass the ``next_cursor`` of the previous page to get the next one; each page
+    costs the same no matter how deep it is. Without a cursor, ``offset`` skips
+    rows the old LIMIT/OFFSET way (kept for compatibility).
+
+    ``filters`` may contain category_id, subcategory_id, brand_id,
+    measure_type_id and updated_since (epoch seconds; with ``sort='updated'``
+    this is an index range scan over recently changed items). Returns ``(items, next_cursor)``, where next_cursor is None
+    on the last page. Rows are Item records, as from get_all_items().
+    """
+    if cursor:
+        sort, last_values = decode_cursor(cursor)
+        offset = 0
+    elif sort not in ITEM_SORTS:
+        raise ValueError(f"Unknown item sort: {sort}")
+    else:
+        last_values = None
+    
+    columns, descending = ITEM_SORTS[sort]
+    conditions, params = _item_filter_clause(filters)
+    if last_values is not None:
+        comparison = '<' if descending else '>'
+        conditions.append(f"({', '.join(columns)}) {comparison} ({', '.join('?' * len(columns))})")
+        params.extend(last_values)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    direction = 'DESC' if descending else 'ASC'
+    order_by = ', '.join(f'{column} {direction}' for column in columns)
+    
+    with connection() as conn:
+        rows = _query(conn, Item, f'''
+            SELECT i.id, i.code, i.custom_code, i.name, i.description,
+                   c.name, s.name, b.name, m.name, i.available_count, i.video_url,
+                   i.created_at, i.updated_at, i.created_ts, i.updated_ts
+            FROM items i
+            JOIN categories c ON i.category_id = c.id
+            JOIN subcategories s ON i.subcategory_id = s.id
+            JOIN brands b ON i.brand_id = b.id
+            JOIN measure_types m ON i.measure_type_id = m.id
+            {where}
+            ORDER BY {order_by}
+            LIMIT ? OFFSET ?
+        ''', (*params, limit + 1, offset)).fetchall()
+    
+    if len(rows) <= limit:
+        return rows, None
+    items = rows[:limit]
+    last = items[-1]
+    # Sort columns are named like the Item fields they fill ('i.name' -> name)
+    return items, encode_cursor(sort, [getattr(last, column[2:]) for column in columns])
+
+def count_items(filters=None):
+    """Count items matching the same filters as get_items_page()."""
+    conditions, params = _item_filter_clause(filters)
+    if not conditions:
+        return get_row_count('items')
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    with connection() as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM items i {where}', params).fetchone()[0]
 
 def get_item_by_id(item_id):
     """Get an item by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT i.id, i.code, i.custom_code, i.name, i.description,
-               i.category_id, c.name,
-               i.subcategory_id, s.name,
-               i.brand_id, b.name,
-               i.measure_type_id, m.name,
-               i.available_count, i.video_url,
-               i.created_at, i.updated_at
-        FROM items i
-        JOIN categories c ON i.category_id = c.id
-        JOIN subcategories s ON i.subcategory_id = s.id
-        JOIN brands b ON i.brand_id = b.id
-        JOIN measure_types m ON i.measure_type_id = m.id
-        WHERE i.id = ?
-    ''', (item_id,))
-    item = cursor.fetchone()
-    conn.close()
-    return item
+    with connection() as conn:
+        return _query(conn, ItemDetail, '''
+            SELECT i.id, i.code, i.custom_code, i.name, i.description,
+                   i.category_id, c.name,
+                   i.subcategory_id, s.name,
+                   i.brand_id, b.name,
+                   i.measure_type_id, m.name,
+                   i.available_count, i.video_url,
+                   i.created_at, i.updated_at, i.created_ts, i.updated_ts
+            FROM items i
+            JOIN categories c ON i.category_id = c.id
+            JOIN subcategories s ON i.subcategory_id = s.id
+            JOIN brands b ON i.brand_id = b.id
+            JOIN measure_types m ON i.measure_type_id = m.id
+            WHERE i.id = ?
+        ''', (item_id,)).fetchone()
 
 def update_item(item_id, name, custom_code, category_id, subcategory_id, brand_id, measure_type_id,
                 description=None, available_count=0, video_url=None):
     """Update an item."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    updated_at = jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-    cursor.execute(
-        '''UPDATE items SET name = ?, custom_code = ?, description = ?, category_id = ?, 
-           subcategory_id = ?, brand_id = ?, measure_type_id = ?, available_count = ?, 
-           video_url = ?, updated_at = ? WHERE id = ?''',
-        (name, custom_code, description, category_id, subcategory_id, brand_id, measure_type_id,
-         available_count, video_url, updated_at, item_id)
-    )
-    conn.commit()
-    conn.close()
+    updated_ts, updated_at = _now()
+    with transaction() as conn:
+        old_count = _current_stock(conn, item_id)
+        cursor = conn.execute(
+            '''UPDATE items SET name = ?, custom_code = ?, description = ?, category_id = ?,
+               subcategory_id = ?, brand_id = ?, measure_type_id = ?, available_count = ?,
+               video_url = ?, updated_at = ?, updated_ts = ? WHERE id = ?''',
+            (name, custom_code, description, category_id, subcategory_id, brand_id, measure_type_id,
+             available_count, video_url, updated_at, updated_ts, item_id)
+        )
+        if old_count is not None:
+            _record_movement(conn, item_id, (available_count or 0) - old_count, 'edit')
+        return cursor.rowcount > 0
+
+# Columns update_item_fields() is allowed to change
+ITEM_EDITABLE_FIELDS = ('name', 'custom_code', 'description', 'category_id', 'subcategory_id',
+                        'brand_id', 'measure_type_id', 'available_count', 'video_url')
+
+def update_item_fields(item_id, actor=None, **fields):
+    """Update only the given columns of an item. Returns True if the item exists."""
+    unknown = set(fields) - set(ITEM_EDITABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown item field(s): {', '.join(sorted(unknown))}")
+    if 'available_count' in fields:
+        # No count means none in stock, as in update_item()
+        fields['available_count'] = fields['available_count'] or 0
+    columns = [column for column in ITEM_EDITABLE_FIELDS if column in fields]
+    assignments = ''.join(f'{column} = ?, ' for column in columns)
+    updated_ts, updated_at = _now()
+    with transaction() as conn:
+        old_count = _current_stock(conn, item_id) if 'available_count' in fields else None
+        cursor = conn.execute(
+            f'UPDATE items SET {assignments}updated_at = ?, updated_ts = ? WHERE id = ?',
+            (*(fields[column] for column in columns), updated_at, updated_ts, item_id)
+        )
+        if old_count is not None:
+            _record_movement(conn, item_id, fields['available_count'] - old_count, 'edit', actor)
+        return cursor.rowcount > 0
+
+def adjust_stock(item_id, delta, reason='adjust', actor=None):
+    """Add ``delta`` (negative to remove) to an item's stock in a single UPDATE.
+
+    The change is recorded in the stock ledger in the same transaction.
+    Returns the new available count, or None if the item does not exist.
+    Raises ValueError if the stock would drop below zero.
+    """
+    updated_ts, updated_at = _now()
+    with transaction() as conn:
+        cursor = conn.execute(
+            '''UPDATE items SET available_count = available_count + ?, updated_at = ?, updated_ts = ?
+               WHERE id = ? AND available_count + ? >= 0''',
+            (delta, updated_at, updated_ts, item_id, delta)
+        )
+        available_count = _current_stock(conn, item_id)
+        if available_count is None:
+            return None
+        if cursor.rowcount == 0:
+            raise ValueError(f"Insufficient stock: {available_count} available, cannot remove {-delta}")
+        _record_movement(conn, item_id, delta, reason, actor)
+        return available_count
+
+def set_stock(item_id, value, reason='set', actor=None):
+    """Set an item's stock to an absolute value, recording the difference in the ledger.
+
+    Returns the new value, or None if the item does not exist.
+    """
+    if value < 0:
+        raise ValueError("Stock cannot be negative")
+    updated_ts, updated_at = _now()
+    with transaction() as conn:
+        old_count = _current_stock(conn, item_id)
+        if old_count is None:
+            return None
+        conn.execute(
+            'UPDATE items SET available_count = ?, updated_at = ?, updated_ts = ? WHERE id = ?',
+            (value, updated_at, updated_ts, item_id)
+        )
+        _record_movement(conn, item_id, value - old_count, reason, actor)
+        return value
 
 def get_low_stock_items():
     """Get items that are below their measure type's low stock threshold."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT i.id, i.code, i.custom_code, i.name, i.available_count,
-               c.name, s.name, b.name, m.name, m.low_stock_threshold
-        FROM items i
-        JOIN categories c ON i.category_id = c.id
-        JOIN subcategories s ON i.subcategory_id = s.id
-        JOIN brands b ON i.brand_id = b.id
-        JOIN measure_types m ON i.measure_type_id = m.id
-        WHERE i.available_count <= m.low_stock_threshold
-        ORDER BY i.available_count ASC
-    ''')
-    items = cursor.fetchall()
-    conn.close()
-    return items
+    with connection() as conn:
+        return _query(conn, LowStockItem, '''
+            SELECT i.id, i.code, i.custom_code, i.name, i.available_count,
+                   c.name, s.name, b.name, m.name, m.low_stock_threshold
+            FROM low_stock l
+            CROSS JOIN items i ON i.id = l.item_id
+            JOIN categories c ON i.category_id = c.id
+            JOIN subcategories s ON i.subcategory_id = s.id
+            JOIN brands b ON i.brand_id = b.id
+            JOIN measure_types m ON i.measure_type_id = m.id
+            ORDER BY l.available_count ASC
+        ''').fetchall()
 
 def delete_item(item_id):
-    """Delete an item and its images."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Get all image paths
-    cursor.execute('SELECT image_path FROM item_images WHERE item_id = ?', (item_id,))
-    images = cursor.fetchall()
-    
-    # Delete image files
-    for image in images:
-        image_path = image[0]
-        if os.path.exists(image_path):
-            os.remove(image_path)
-    
-    # Delete from database
-    cursor.execute('DELETE FROM items WHERE id = ?', (item_id,))
-    conn.commit()
-    conn.close()
+    """Delete an item and its images; the image files are queued for the file reaper."""
+    with transaction() as conn:
+        conn.execute('DELETE FROM items WHERE id = ?', (item_id,))
 
 # Item images operations
 def add_item_image(item_id, image_path):
     """Add an image to an item."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    created_at = jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-    cursor.execute(
-        'INSERT INTO item_images (item_id, image_path, created_at) VALUES (?, ?, ?)',
-        (item_id, image_path, created_at)
-    )
-    conn.commit()
-    conn.close()
+    created_at = _now()[1]
+    with transaction() as conn:
+        conn.execute(
+            'INSERT INTO item_images (item_id, image_path, created_at) VALUES (?, ?, ?)',
+            (item_id, image_path, created_at)
+        )
 
 def get_item_images(item_id):
     """Get all images for an item."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, image_path, created_at FROM item_images WHERE item_id = ?', (item_id,))
-    images = cursor.fetchall()
-    conn.close()
-    return images
+    with connection() as conn:
+        return _query(
+            conn, ItemImage, 'SELECT id, image_path, created_at FROM item_images WHERE item_id = ?', (item_id,)
+        ).fetchall()
 
 def delete_item_image(image_id):
-    """Delete an item image."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Get image path
-    cursor.execute('SELECT image_path FROM item_images WHERE id = ?', (image_id,))
-    result = cursor.fetchone()
-    if result:
-        image_path = result[0]
-        if os.path.exists(image_path):
-            os.remove(image_path)
-        cursor.execute('DELETE FROM item_images WHERE id = ?', (image_id,))
-    
-    conn.commit()
-    conn.close()
+    """Delete an item image; its file is queued for the file reaper."""
+    with transaction() as conn:
+        conn.execute('DELETE FROM item_images WHERE id = ?', (image_id,))
+
+# Image file deletion queue (see file_cleanup.py)
+def get_pending_file_deletions(limit=100, max_attempts=5):
+    """Get up to ``limit`` queued file deletions that failed fewer than ``max_attempts`` times."""
+    with connection() as conn:
+        return _query(conn, PendingFileDeletion, '''
+            SELECT id, path, queued_ts, attempts FROM pending_file_deletions
+            WHERE attempts < ?
+            ORDER BY id
+            LIMIT ?
+        ''', (max_attempts, limit)).fetchall()
+
+def get_pending_file_deletion_count():
+    """Number of files waiting to be deleted, including ones that keep failing."""
+    with connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM pending_file_deletions').fetchone()[0]
+
+def queue_file_deletions(paths):
+    """Queue files for the file reaper. Returns the number queued."""
+    now = int(time.time())
+    with transaction() as conn:
+        conn.executemany(
+            'INSERT INTO pending_file_deletions (path, queued_ts) VALUES (?, ?)',
+            [(path, now) for path in paths]
+        )
+    return len(paths)
+
+def finish_file_deletions(done_ids, failed_ids=()):
+    """Drop handled deletions from the queue and count a failed attempt for the others."""
+    with transaction() as conn:
+        conn.executemany('DELETE FROM pending_file_deletions WHERE id = ?', [(i,) for i in done_ids])
+        conn.executemany('UPDATE pending_file_deletions SET attempts = attempts + 1 WHERE id = ?',
+                         [(i,) for i in failed_ids])
+
+def get_referenced_image_paths(paths):
+    """Return the subset of ``paths`` that item_images rows still point to."""
+    paths = list(paths)
+    referenced = set()
+    with connection() as conn:
+        for start in range(0, len(paths), 500):
+            chunk = paths[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            referenced.update(row[0] for row in conn.execute(
+                f'SELECT image_path FROM item_images WHERE image_path IN ({placeholders})', chunk
+            ))
+    return referenced
+
+def get_image_file_names(directory):
+    """Names of the files in ``directory`` that item_images rows or the deletion queue point to."""
+    directory = os.path.normcase(os.path.abspath(directory))
+    names = set()
+    with connection() as conn:
+        for sql in ('SELECT image_path FROM item_images', 'SELECT path FROM pending_file_deletions'):
+            for (path,) in conn.execute(sql):
+                path = os.path.normcase(os.path.abspath(path))
+                if os.path.dirname(path) == directory:
+                    names.add(os.path.basename(path))
+    return names
 
 # User state management
 def set_user_state(user_id, state, data=None):
-    """Set user state for conversation flow."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    """Set user state for conversation flow.
+
+    The state is kept in memory and written to the database within
+    DB_STATE_FLUSH_MS (see get_state_store()), not in the caller's transaction.
+    """
     import json
     # Always store data as JSON string, even if empty dict
     if data is None:
         data = {}
     data_str = json.dumps(data)
-    cursor.execute(
-        'INSERT OR REPLACE INTO user_states (user_id, state, data) VALUES (?, ?, ?)',
-        (user_id, state, data_str)
-    )
-    conn.commit()
-    conn.close()
+    store = get_state_store()
+    if store is not None:
+        store.set(user_id, state, data_str)
+        return
+    with transaction() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO user_states (user_id, state, data) VALUES (?, ?, ?)',
+            (user_id, state, data_str)
+        )
 
 def get_user_state(user_id):
-    """Get user state."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT state, data FROM user_states WHERE user_id = ?', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+    """Get user state, from memory when the user-state store has it."""
+    store = get_state_store()
+    if store is not None:
+        result = store.get(user_id)
+        result = result if result[1] is not None else None
+    else:
+        with connection() as conn:
+            result = conn.execute('SELECT state, data FROM user_states WHERE user_id = ?', (user_id,)).fetchone()
     if result:
         import json
         state, data = result
@@ -607,44 +1397,195 @@ def get_user_state(user_id):
     return None, {}
 
 def clear_user_state(user_id):
-    """Clear user state."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM user_states WHERE user_id = ?', (user_id,))
-    conn.commit()
-    conn.close()
+    """Clear user state (written behind like set_user_state())."""
+    store = get_state_store()
+    if store is not None:
+        store.clear(user_id)
+        return
+    with transaction() as conn:
+        conn.execute('DELETE FROM user_states WHERE user_id = ?', (user_id,))
 
 # Authentication management
 def is_user_authenticated(user_id):
     """Check if user is authenticated."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT user_id FROM authenticated_users WHERE user_id = ?', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        result = conn.execute('SELECT user_id FROM authenticated_users WHERE user_id = ?', (user_id,)).fetchone()
     return result is not None
 
 def authenticate_user(user_id, username=None, first_name=None, last_name=None):
     """Authenticate a user and save to database."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    authenticated_at = jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-    cursor.execute(
-        'INSERT OR REPLACE INTO authenticated_users (user_id, username, first_name, last_name, authenticated_at) VALUES (?, ?, ?, ?, ?)',
-        (user_id, username, first_name, last_name, authenticated_at)
-    )
-    conn.commit()
-    conn.close()
+    authenticated_at = _now()[1]
+    with transaction() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO authenticated_users (user_id, username, first_name, last_name, authenticated_at) VALUES (?, ?, ?, ?, ?)',
+            (user_id, username, first_name, last_name, authenticated_at)
+        )
 
 def get_authenticated_users_count():
     """Get count of authenticated users."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM authenticated_users')
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    with connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM authenticated_users').fetchone()[0]
+
+# Statistics
+def get_row_count(table_name):
+    """Get the trigger-maintained row count of one of COUNTED_TABLES."""
+    with connection() as conn:
+        result = conn.execute(
+            'SELECT row_count FROM row_counts WHERE table_name = ?', (table_name,)
+        ).fetchone()
+    return result[0] if result else 0
+
+def get_low_stock_count():
+    """Count items at or below their measure type's low stock threshold."""
+    with connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM low_stock').fetchone()[0]
+
+def get_stats():
+    """Get warehouse totals without loading any rows."""
+    with connection() as conn:
+        counts = dict(conn.execute('SELECT table_name, row_count FROM row_counts').fetchall())
+        return {
+            'total_items': counts.get('items', 0),
+            'total_categories': counts.get('categories', 0),
+            'total_brands': counts.get('brands', 0),
+            'low_stock_items': get_low_stock_count()
+        }
+
+# Stock ledger
+def _current_stock(conn, item_id):
+    """Get an item's available count, or None if it does not exist."""
+    row = conn.execute('SELECT available_count FROM items WHERE id = ?', (item_id,)).fetchone()
+    return row[0] if row else None
+
+def _record_movement(conn, item_id, delta, reason, actor=None):
+    """Append a stock movement; must run in the transaction that changed the stock."""
+    if delta:
+        conn.execute(
+            'INSERT INTO stock_movements (item_id, delta, reason, actor, created_ts) VALUES (?, ?, ?, ?, ?)',
+            (item_id, delta, reason, None if actor is None else str(actor), int(time.time()))
+        )
+
+def _balance_as_of(conn, item_id, timestamp):
+    """Latest snapshot at or before ``timestamp`` plus the movements after it."""
+    snapshot = conn.execute(
+        '''SELECT snapshot_ts, balance, movement_id FROM stock_snapshots
+           WHERE item_id = ? AND snapshot_ts <= ? ORDER BY snapshot_ts DESC LIMIT 1''',
+        (item_id, timestamp)
+    ).fetchone()
+    since_ts, balance, after_id = snapshot or (0, 0, 0)
+    movements = conn.execute(
+        '''SELECT COALESCE(SUM(delta), 0) FROM stock_movements
+           WHERE item_id = ? AND created_ts >= ? AND created_ts <= ? AND id > ?''',
+        (item_id, since_ts, timestamp, after_id)
+    ).fetchone()[0]
+    return balance + movements
+
+def get_stock_balance(item_id, as_of=None):
+    """Get an item's stock balance from the ledger, now or at an epoch timestamp."""
+    with connection() as conn:
+        return _balance_as_of(conn, item_id, int(time.time()) if as_of is None else as_of)
+
+def get_stock_history(item_id, limit=50, before=None):
+    """Get an item's stock movements, newest first.
+
+    Pass the id of the last movement of a page as ``before`` to get the next
+    page. Returns StockMovement records.
+    """
+    query = '''SELECT id, delta, reason, actor, created_ts FROM stock_movements WHERE item_id = ?'''
+    params = [item_id]
+    if before is not None:
+        query += ''' AND (created_ts, id) < (SELECT created_ts, id FROM stock_movements WHERE id = ?)'''
+        params.append(before)
+    query += ' ORDER BY created_ts DESC, id DESC LIMIT ?'
+    params.append(limit)
+    with connection() as conn:
+        return _query(conn, StockMovement, query, params).fetchall()
+
+def get_stock_as_of(as_of, limit=100, after_id=0):
+    """Get every item's stock balance at an epoch timestamp, one page at a time.
+
+    Returns StockBalance records (id, code, custom_code, name, balance) ordered by item id;
+    pass the last id as ``after_id`` for the next page.
+    """
+    with connection() as conn:
+        items = conn.execute(
+            'SELECT id, code, custom_code, name FROM items WHERE id > ? ORDER BY id LIMIT ?',
+            (after_id, limit)
+        ).fetchall()
+        return [StockBalance(*item, _balance_as_of(conn, item[0], as_of)) for item in items]
+
+def take_stock_snapshots():
+    """Snapshot the current balance of every item that moved since its last snapshot.
+
+    Returns the number of snapshots written.
+    """
+    # Always now: the balance and movement written are the latest ones
+    timestamp = int(time.time())
+    with transaction() as conn:
+        cursor = conn.execute('''
+            INSERT OR REPLACE INTO stock_snapshots (item_id, snapshot_ts, balance, movement_id)
+            SELECT item_id, ?, available_count, movement_id FROM (
+                SELECT i.id AS item_id, i.available_count,
+                       (SELECT m.id FROM stock_movements m WHERE m.item_id = i.id
+                        ORDER BY m.created_ts DESC, m.id DESC LIMIT 1) AS movement_id,
+                       (SELECT s.movement_id FROM stock_snapshots s WHERE s.item_id = i.id
+                        ORDER BY s.snapshot_ts DESC LIMIT 1) AS snapshot_movement_id
+                FROM items i
+            )
+            WHERE movement_id > COALESCE(snapshot_movement_id, 0)
+        ''', (timestamp,))
+        return cursor.rowcount
+
+def compact_stock_movements(before_ts, batch_size=500):
+    """Fold movements at or before ``before_ts`` into snapshots and delete them.
+
+    Each item gets a snapshot at ``before_ts`` before its older movements are
+    removed, so balances from ``before_ts`` on stay exact; earlier balances
+    are resolved at snapshot granularity. Items are processed ``batch_size``
+    at a time, each batch in its own short transaction.
+
+    Returns (items compacted, movements deleted).
+    """
+    compacted = deleted = 0
+    after_id = -1
+    while True:
+        with transaction() as conn:
+            item_ids = [row[0] for row in conn.execute(
+                '''SELECT DISTINCT item_id FROM stock_movements
+                   WHERE item_id > ? AND created_ts <= ? ORDER BY item_id LIMIT ?''',
+                (after_id, before_ts, batch_size)
+            )]
+            if not item_ids:
+                return compacted, deleted
+            for item_id in item_ids:
+                last_id = conn.execute(
+                    '''SELECT id FROM stock_movements WHERE item_id = ? AND created_ts <= ?
+                       ORDER BY created_ts DESC, id DESC LIMIT 1''',
+                    (item_id, before_ts)
+                ).fetchone()[0]
+                conn.execute(
+                    '''INSERT OR REPLACE INTO stock_snapshots (item_id, snapshot_ts, balance, movement_id)
+                       VALUES (?, ?, ?, ?)''',
+                    (item_id, before_ts, _balance_as_of(conn, item_id, before_ts), last_id)
+                )
+                deleted += conn.execute(
+                    'DELETE FROM stock_movements WHERE item_id = ? AND created_ts <= ?',
+                    (item_id, before_ts)
+                ).rowcount
+            compacted += len(item_ids)
+            after_id = item_ids[-1]
 
-# Initialize database on import
-init_database()
+def reconcile_stock():
+    """Find items whose available_count differs from their ledger balance.
 
+    Returns (item id, available_count, ledger balance) tuples.
+    """
+    now = int(time.time())
+    with connection() as conn:
+        items = conn.execute('SELECT id, available_count FROM items ORDER BY id').fetchall()
+        mismatches = []
+        for item_id, available_count in items:
+            balance = _balance_as_of(conn, item_id, now)
+            if abs(balance - available_count) > 1e-9:
+                mismatches.append((item_id, available_count, balance))
+        return mismatches
@@ -0,0 +1,206 @@
+"""Removal of item image files, outside the database transactions.
+
+Deleting an item or an image only deletes rows: a trigger on item_images
+queues each removed row's file in ``pending_file_deletions`` within the same
+transaction, so the write lock is never held across filesystem calls and a
+crash can't leave a file without its row or a row without its file queued.
+``FileReaper`` is a background thread that removes the queued files in
+batches; the bot and the API start it on startup:
+
+    get_reaper().start()
+    ...
+    close_reaper()
+
+Files that no row points to (e.g. left by a crash before this queue
+existed, or saved for an upload that never finished) are found by
+``sweep_orphans()``, which scans the images directory and queues them.
+
+Usage (from the project root):
+    python database/file_cleanup.py reap                # remove queued files now
+    python database/file_cleanup.py sweep --dry-run     # list unreferenced files
+    python database/file_cleanup.py sweep --min-age 3600
+    python database/file_cleanup.py status
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import database as db
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reaper passes
+DEFAULT_INTERVAL = 5.0
+# Queued deletions handled per transaction
+DEFAULT_BATCH_SIZE = 100
+# A deletion that failed this many times stays queued but is no longer retried
+MAX_ATTEMPTS = 5
+# Files younger than this are never swept: the bot saves a photo before it
+# adds the item_images row
+DEFAULT_MIN_AGE = 3600
+
+def reap_pending(batch_size=DEFAULT_BATCH_SIZE):
+    """Remove every queued file. Returns ``(removed, failed)`` counts."""
+    removed = failed = 0
+    while True:
+        pending = db.get_pending_file_deletions(batch_size, MAX_ATTEMPTS)
+        if not pending:
+            break
+        # A path can be queued and then saved again for a new image; keep it then
+        in_use = db.get_referenced_image_paths(row.path for row in pending)
+        done, failed_ids = [], []
+        for row in pending:
+            if row.path not in in_use:
+                try:
+                    os.remove(row.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not delete {row.path}: {e}")
+                    failed_ids.append(row.id)
+                    continue
+            done.append(row.id)
+        db.finish_file_deletions(done, failed_ids)
+        failed += len(failed_ids)
+        if len(pending) < batch_size:
+            break
+    return removed, failed
+
+def iter_orphans(images_dir=None, min_age=DEFAULT_MIN_AGE):
+    """Yield the paths of files in ``images_dir`` that no item_images row or
+    queued deletion points to and that are older than ``min_age`` seconds.
+
+    The directory is read entry by entry, never listed as a whole.
+    """
+    images_dir = images_dir or db.IMAGES_DIR
+    if not os.path.isdir(images_dir):
+        return
+    known = db.get_image_file_names(images_dir)
+    cutoff = time.time() - min_age
+    with os.scandir(images_dir) as entries:
+        for entry in entries:
+            if entry.name in known or not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            yield entry.path
+
+def sweep_orphans(images_dir=None, min_age=DEFAULT_MIN_AGE, batch_size=DEFAULT_BATCH_SIZE):
+    """Queue the files found by iter_orphans() for deletion. Returns the number queued."""
+    queued = 0
+    batch = []
+    for path in iter_orphans(images_dir, min_age):
+        batch.append(path)
+        if len(batch) >= batch_size:
+            queued += db.queue_file_deletions(batch)
+            batch = []
+    if batch:
+        queued += db.queue_file_deletions(batch)
+    return queued
+
+class FileReaper:
+    """A background thread that removes queued image files every ``interval`` seconds."""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, batch_size=DEFAULT_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = max(1, int(batch_size))
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._removed = 0
+        self._failed = 0
+
+    def start(self):
+        """Start the reaper thread (no-op if it is already running)."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='file-reaper', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Run a pass now instead of at the next interval."""
+        self._wake.set()
+
+    def close(self):
+        """Stop the reaper thread after its current pass."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+
+    def stats(self):
+        """Files removed and failed deletions so far."""
+        return {'removed': self._removed, 'failed': self._failed}
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                removed, failed = reap_pending(self.batch_size)
+                self._removed += removed
+                self._failed += failed
+            except Exception as e:
+                logger.error(f"File reaper pass failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+def get_reaper():
+    """Get the shared reaper, configured by DB_REAPER_INTERVAL (seconds)."""
+    global _reaper
+    if _reaper is None:
+        with _reaper_lock:
+            if _reaper is None:
+                _reaper = FileReaper(interval=float(os.getenv('DB_REAPER_INTERVAL', DEFAULT_INTERVAL)))
+    return _reaper
+
+def close_reaper():
+    """Stop the shared reaper."""
+    global _reaper
+    with _reaper_lock:
+        reaper, _reaper = _reaper, None
+    if reaper is not None:
+        reaper.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Item image file cleanup.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('reap', help="Delete the queued files now")
+    sweep = commands.add_parser('sweep', help="Queue image files that no item refers to")
+    sweep.add_argument('--images-dir', default=db.IMAGES_DIR)
+    sweep.add_argument('--min-age', type=int, default=DEFAULT_MIN_AGE,
+                       help=f"Skip files modified in the last N seconds (default {DEFAULT_MIN_AGE})")
+    sweep.add_argument('--dry-run', action='store_true', help="Only list the files")
+    commands.add_parser('status', help="Show how many files are waiting to be deleted")
+    args = parser.parse_args()
+
+    if args.command == 'reap':
+        removed, failed = reap_pending()
+        print(f"✅ Deleted {removed} file(s), {failed} failed.")
+    elif args.command == 'sweep' and args.dry_run:
+        count = 0
+        for path in iter_orphans(args.images_dir, args.min_age):
+            print(f"  {path}")
+            count += 1
+        print(f"📋 {count} unreferenced file(s) would be deleted.")
+    elif args.command == 'sweep':
+        queued = sweep_orphans(args.images_dir, args.min_age)
+        removed, failed = reap_pending()
+        print(f"✅ Queued {queued} unreferenced file(s); deleted {removed}, {failed} failed.")
+    elif args.command == 'status':
+        print(f"📋 {db.get_pending_file_deletion_count()} file(s) waiting to be deleted.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Opt-in timing of the database functions, with a slow-query log.
+
+``enable()`` replaces every public function of ``database.database`` with a
+wrapper that times it and counts the rows it returns, and traces the SQL it
+runs with ``set_trace_callback`` on the pooled connections. A call made
+from inside another one (``create_item()`` allocating a code, say) is part
+of the outer call, so each bot update or API request shows up as the
+functions it called directly.
+
+Per function it keeps the number of calls and errors, p50/p95/p99 latency
+over the last ``window`` calls, rows returned and statements run per call.
+A call that takes ``slow_ms`` or longer goes to the slow-query log with its
+slowest statements and their ``EXPLAIN QUERY PLAN``. A statement's time is
+measured until the next one starts (or the call returns), so it includes
+fetching its rows. Trigger programs report their statement again;
+consecutive repeats are counted once.
+
+Everything stays off unless the bot or the API starts with
+``DB_INSTRUMENT=1`` (see ``enable_from_env()``); ``DB_SLOW_QUERY_MS`` sets
+the threshold (default 100). The numbers are served by the API's
+``/metrics`` endpoint and the bot's ``/dbstats`` command:
+
+    from database import instrument
+
+    instrument.enable(slow_ms=50)
+    ...
+    instrument.get_stats()['functions']['search_items']['p95_ms']
+"""
+
+import os
+import time
+import inspect
+import logging
+import functools
+import threading
+from collections import deque
+
+from . import database as _db
+from .query_plans import explain
+
+logger = logging.getLogger(__name__)
+
+# Calls at or above this duration go to the slow-query log
+DEFAULT_SLOW_MS = 100
+# Latency samples kept per function for the percentiles
+DEFAULT_WINDOW = 1000
+# Entries kept in the slow-query log
+DEFAULT_SLOW_LOG_SIZE = 100
+# Statements of a slow call that are explained, slowest first
+SLOW_STATEMENTS = 3
+# Distinct statements timed per call; further ones are only counted
+MAX_TIMED_STATEMENTS = 50
+# SQL longer than this is cut in the slow-query log
+MAX_SQL_LENGTH = 500
+
+# Pool accessors, context managers and helpers that never touch the database
+UNTIMED = {'get_pool', 'get_reader_pool', 'get_reference_cache', 'close_pool', 'connection', 'reading',
+           'transaction', 'get_connection', 'get_connection_stats', 'get_cache_stats', 'set_trace_callback',
+           'get_trace_callback', 'encode_cursor', 'decode_cursor', 'get_state_store', 'get_state_stats'}
+
+_PLANNED_PREFIXES = ('SELECT', 'UPDATE', 'DELETE', 'WITH', 'INSERT')
+
+def _count_rows(result):
+    """Rows in a function's result: list length, 1 for a record, None for anything else."""
+    if isinstance(result, (list, set)):
+        return len(result)
+    # get_items_page() returns (items, next cursor)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    if hasattr(result, '_fields'):
+        return 1
+    return None
+
+def _percentile(samples, p):
+    return round(samples[min(len(samples) - 1, int(len(samples) * p / 100))], 3)
+
+class _Call:
+    """SQL traced during one outermost call."""
+
+    __slots__ = ('statements', 'sql', 'started', 'timings')
+
+    def __init__(self):
+        self.statements = 0
+        self.sql = None
+        self.started = 0.0
+        # sql -> seconds until the next statement started
+        self.timings = {}
+
+    def finish_statement(self, now):
+        if self.sql is not None:
+            elapsed = now - self.started
+            if self.sql in self.timings or len(self.timings) < MAX_TIMED_STATEMENTS:
+                self.timings[self.sql] = self.timings.get(self.sql, 0.0) + elapsed
+
+class _FunctionStats:
+    __slots__ = ('calls', 'errors', 'total_ms', 'max_ms', 'rows', 'statements', 'slow', 'samples')
+
+    def __init__(self, window):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.statements = 0
+        self.slow = 0
+        self.samples = deque(maxlen=window)
+
+class Instrumentation:
+    """Call statistics and the slow-query log for the wrapped functions."""
+
+    def __init__(self, slow_ms=DEFAULT_SLOW_MS, window=DEFAULT_WINDOW, slow_log_size=DEFAULT_SLOW_LOG_SIZE):
+        self.slow_ms = slow_ms
+        self.window = window
+        self.started = time.time()
+        self._functions = {}
+        self._slow_log = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def wrap(self, name, func):
+        """Return ``func`` wrapped so its calls are recorded under ``name``."""
+        local = self._local
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(local, 'call', None) is not None:
+                return func(*args, **kwargs)
+            call = local.call = _Call()
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                self._finish(name, call, start, None, failed=True)
+                raise
+            self._finish(name, call, start, _count_rows(result), failed=False)
+            return result
+        return wrapper
+
+    def trace(self, sql):
+        """Trace callback for the pooled connections."""
+        call = getattr(self._local, 'call', None)
+        if call is None or sql == call.sql:
+            return
+        now = time.perf_counter()
+        call.finish_statement(now)
+        call.statements += 1
+        call.sql = sql
+        call.started = now
+
+    def _finish(self, name, call, start, rows, failed):
+        now = time.perf_counter()
+        self._local.call = None
+        call.finish_statement(now)
+        elapsed_ms = (now - start) * 1000
+        slow = elapsed_ms >= self.slow_ms
+        with self._lock:
+            stats = self._functions.get(name)
+            if stats is None:
+                stats = self._functions[name] = _FunctionStats(self.window)
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.rows += rows or 0
+            stats.statements += call.statements
+            stats.slow += slow
+            stats.samples.append(elapsed_ms)
+        if slow:
+            self._log_slow(name, call, elapsed_ms, rows, failed)
+
+    def _log_slow(self, name, call, elapsed_ms, rows, failed):
+        """Add a slow call to the slow-query log with the plans of its slowest statements."""
+        slowest = sorted(call.timings.items(), key=lambda item: item[1], reverse=True)[:SLOW_STATEMENTS]
+        statements = []
+        for sql, seconds in slowest:
+            entry = {'sql': ' '.join(sql.split())[:MAX_SQL_LENGTH], 'ms': round(seconds * 1000, 3)}
+            if sql.lstrip().upper().startswith(_PLANNED_PREFIXES):
+                try:
+                    with _db.connection() as conn:
+                        entry['plan'] = explain(conn, sql)
+                except Exception as e:
+                    entry['plan_error'] = str(e)
+            statements.append(entry)
+        self._slow_log.append({
+            'function': name,
+            'ts': int(time.time()),
+            'ms': round(elapsed_ms, 3),
+            'rows': rows,
+            'statements': call.statements,
+            'failed': failed,
+            'slowest': statements,
+        })
+        logger.warning(f"Slow database call {name}: {elapsed_ms:.0f} ms, {call.statements} statements"
+                       + (f", slowest: {statements[0]['sql'][:200]}" if statements else ""))
+
+    def stats(self):
+        """Per-function statistics, the most time-consuming first, in milliseconds."""
+        with self._lock:
+            functions = [(name, stats, sorted(stats.samples)) for name, stats in self._functions.items()]
+            result = {}
+            for name, stats, samples in sorted(functions, key=lambda entry: entry[1].total_ms, reverse=True):
+                result[name] = {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'total_ms': round(stats.total_ms, 3),
+                    'avg_ms': round(stats.total_ms / stats.calls, 3),
+                    'p50_ms': _percentile(samples, 50),
+                    'p95_ms': _percentile(samples, 95),
+                    'p99_ms': _percentile(samples, 99),
+                    'max_ms': round(stats.max_ms, 3),
+                    'rows_per_call': round(stats.rows / stats.calls, 1),
+                    'statements_per_call': round(stats.statements / stats.calls, 1),
+                    'slow': stats.slow,
+                }
+        return result
+
+    def slow_queries(self):
+        """The slow-query log, newest first."""
+        return list(reversed(self._slow_log))
+
+    def reset(self):
+        """Forget every recorded call."""
+        with self._lock:
+            self._functions.clear()
+            self._slow_log.clear()
+            self.started = time.time()
+
+_instrumentation = None
+_originals = {}
+_lock = threading.Lock()
+
+def _public_functions():
+    """(name, function) for every timed function defined in database.database."""
+    return [
+        (name, value) for name, value in vars(_db).items()
+        if not name.startswith('_') and name not in UNTIMED
+        and inspect.isfunction(value) and value.__module__ == _db.__name__
+    ]
+
+def enable(slow_ms=DEFAULT_SLOW_MS, window=DEFAULT_WINDOW, slow_log_size=DEFAULT_SLOW_LOG_SIZE):
+    """Start timing the database functions. Returns the Instrumentation (the
+    running one if already enabled)."""
+    global _instrumentation
+    with _lock:
+        if _instrumentation is None:
+            instrumentation = Instrumentation(slow_ms, window, slow_log_size)
+            for name, func in _public_functions():
+                _originals[name] = func
+                setattr(_db, name, instrumentation.wrap(name, func))
+            _db.set_trace_callback(instrumentation.trace)
+            _instrumentation = instrumentation
+        return _instrumentation
+
+def disable():
+    """Put the original functions back and stop tracing."""
+    global _instrumentation
+    with _lock:
+        if _instrumentation is None:
+            return
+        _db.set_trace_callback(None)
+        for name, func in _originals.items():
+            setattr(_db, name, func)
+        _originals.clear()
+        _instrumentation = None
+
+def enable_from_env():
+    """enable() if DB_INSTRUMENT is set to 1, with DB_SLOW_QUERY_MS as the threshold."""
+    if os.getenv('DB_INSTRUMENT', '0').strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return None
+    slow_ms = float(os.getenv('DB_SLOW_QUERY_MS', DEFAULT_SLOW_MS))
+    logger.info(f"Database instrumentation enabled, slow-query threshold {slow_ms:g} ms")
+    return enable(slow_ms)
+
+def is_enabled():
+    """Whether the database functions are being timed."""
+    return _instrumentation is not None
+
+def get_stats(slow_limit=20):
+    """Call statistics and the newest ``slow_limit`` slow calls, or just
+    ``{'enabled': False}`` when instrumentation is off."""
+    instrumentation = _instrumentation
+    if instrumentation is None:
+        return {'enabled': False}
+    return {
+        'enabled': True,
+        'since_ts': int(instrumentation.started),
+        'slow_ms': instrumentation.slow_ms,
+        'functions': instrumentation.stats(),
+        'slow_queries': instrumentation.slow_queries()[:slow_limit],
+    }
+
+def reset():
+    """Clear the statistics and the slow-query log."""
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        instrumentation.reset()
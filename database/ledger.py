@@ -0,0 +1,55 @@
+"""Maintenance jobs for the stock movement ledger.
+
+Usage (from the project root):
+    python database/ledger.py snapshot              # snapshot items that moved
+    python database/ledger.py compact --keep-days 365
+    python database/ledger.py reconcile             # compare ledger and available_count
+
+Run ``snapshot`` periodically (e.g. nightly from cron) so balance lookups
+only add up the movements since the last snapshot. ``compact`` folds
+movements older than the retention period into snapshots and deletes them.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import database as db
+
+DEFAULT_KEEP_DAYS = 365
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock ledger maintenance.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('snapshot', help="Snapshot the balance of items that moved since their last snapshot")
+    compact = commands.add_parser('compact', help="Fold old movements into snapshots and delete them")
+    compact.add_argument('--keep-days', type=int, default=DEFAULT_KEEP_DAYS,
+                         help=f"Days of movements to keep (default {DEFAULT_KEEP_DAYS})")
+    commands.add_parser('reconcile', help="List items whose stock differs from the ledger")
+    args = parser.parse_args()
+
+    if args.command == 'snapshot':
+        count = db.take_stock_snapshots()
+        print(f"✅ Wrote {count} snapshot(s).")
+    elif args.command == 'compact':
+        before_ts = int(time.time()) - args.keep_days * 86400
+        start = time.perf_counter()
+        items, deleted = db.compact_stock_movements(before_ts)
+        print(f"✅ Compacted {items} item(s), deleted {deleted} movement(s) "
+              f"in {time.perf_counter() - start:.2f}s.")
+    elif args.command == 'reconcile':
+        mismatches = db.reconcile_stock()
+        if not mismatches:
+            print("✅ Every item matches its ledger balance.")
+            return 0
+        print(f"⚠️  {len(mismatches)} item(s) differ from the ledger:")
+        for item_id, available_count, balance in mismatches:
+            print(f"    item {item_id}: available_count={available_count}, ledger={balance}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""Periodic database maintenance: statistics, free pages and the WAL.
+
+Deletes leave free pages inside ``warehouse.db``, and without statistics the
+query planner guesses how selective each index is. ``run_maintenance()``
+runs these tasks in order and returns a report:
+
+- ``analyze``: ``ANALYZE`` on each table whose row count moved by more than
+  20% since its statistics were gathered (or that never had any), sampling at
+  most ``analysis_limit`` rows per index so the write lock is held briefly
+- ``optimize``: ``PRAGMA optimize``
+- ``vacuum``: ``PRAGMA incremental_vacuum`` in small steps, returning the
+  free pages to the file system. Needs ``auto_vacuum = INCREMENTAL``, which
+  new databases get from the PRAGMA profile; an existing database is
+  converted once with ``python database/maintenance.py vacuum``
+- ``checkpoint``: a passive WAL checkpoint, and a truncating one that
+  shrinks the WAL file back to zero
+
+``vacuum`` and the truncating checkpoint only run in an idle window, when
+nothing has been written for ``idle_seconds``, unless ``force`` is set.
+The report has the file size, WAL size and free pages before and after, the
+result and duration of each task, and every query plan that changed after
+``ANALYZE``. The bot schedules it on its JobQueue every
+``DB_MAINTENANCE_INTERVAL`` seconds.
+
+Usage (from the project root):
+    python database/maintenance.py                       # run every task
+    python database/maintenance.py run --force --tasks analyze checkpoint
+    python database/maintenance.py status                # size, free pages, idle time
+    python database/maintenance.py vacuum                # full VACUUM (switches on incremental vacuum)
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import database as db
+from database import query_plans
+
+logger = logging.getLogger(__name__)
+
+TASKS = ('analyze', 'optimize', 'vacuum', 'checkpoint')
+# Seconds between runs when scheduled by the bot
+DEFAULT_INTERVAL = 3600
+# vacuum and the truncating checkpoint wait until nothing was written for this long
+DEFAULT_IDLE_SECONDS = 30
+# Re-analyze a table once its row count moved by this fraction
+ANALYZE_CHANGE = 0.2
+# Changes in tables smaller than this are measured against this many rows
+ANALYZE_MIN_ROWS = 100
+# Rows sampled per index by ANALYZE (0 = all rows)
+DEFAULT_ANALYSIS_LIMIT = 1000
+# Pages freed per incremental_vacuum transaction, and the pause between them
+VACUUM_STEP_PAGES = 256
+VACUUM_SLEEP_MS = 10
+# A checkpoint that finds another connection checkpointing is retried this many times
+CHECKPOINT_RETRIES = 5
+
+# Read functions whose query plans are compared before and after ANALYZE
+_PLAN_PREFIXES = ('get_', 'count_', 'search_', 'is_')
+# ... except those that load a whole table just to be captured
+_PLAN_SKIP = {'get_all_items'}
+
+def get_idle_seconds():
+    """Seconds since the database (its WAL in WAL mode) was last written."""
+    mtimes = [os.path.getmtime(path) for path in (db.DATABASE_FILE, db.DATABASE_FILE + '-wal')
+              if os.path.exists(path)]
+    return time.time() - max(mtimes) if mtimes else 0.0
+
+def get_file_stats():
+    """Size of the database file and its WAL, page counts and the auto_vacuum mode."""
+    wal = db.DATABASE_FILE + '-wal'
+    with db.connection() as conn:
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+    return {
+        'file_bytes': os.path.getsize(db.DATABASE_FILE),
+        'wal_bytes': os.path.getsize(wal) if os.path.exists(wal) else 0,
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_pages': freelist,
+        'free_bytes': freelist * page_size,
+        'auto_vacuum': ('NONE', 'FULL', 'INCREMENTAL')[auto_vacuum],
+        'journal_mode': journal_mode.upper(),
+    }
+
+def _analyzable_tables(conn):
+    """Ordinary tables, without FTS tables and their shadow tables."""
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    virtual = [name for name, sql in rows if sql.upper().startswith('CREATE VIRTUAL TABLE')]
+    return [name for name, _ in rows
+            if name not in virtual and not any(name.startswith(v + '_') for v in virtual)]
+
+def _row_count(conn, table, counted):
+    if table in counted:
+        return counted[table]
+    return conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+def get_changed_tables(threshold=ANALYZE_CHANGE):
+    """Tables whose statistics are missing or out of date.
+
+    Returns ``[(table, rows when last analyzed or None, rows now)]``.
+    """
+    with db.connection() as conn:
+        analyzed = {}
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+            for table, stat in conn.execute('SELECT tbl, stat FROM sqlite_stat1'):
+                rows = int(stat.split()[0]) if stat else 0
+                analyzed[table] = max(analyzed.get(table, 0), rows)
+        counted = dict(conn.execute('SELECT table_name, row_count FROM row_counts').fetchall())
+        changed = []
+        for table in _analyzable_tables(conn):
+            rows = _row_count(conn, table, counted)
+            before = analyzed.get(table)
+            if before is None and rows == 0:
+                continue
+            if before is None or abs(rows - before) > threshold * max(before, ANALYZE_MIN_ROWS):
+                changed.append((table, before, rows))
+    return changed
+
+def capture_plans(statements=None):
+    """Query plans of the read functions checked by query_plans, on this database.
+
+    Returns ``(statements, {(function, sql): plan details})``; pass the
+    statements back in to explain the same SQL again later.
+    """
+    if statements is None:
+        statements = []
+        for name, args in query_plans.QUERY_CALLS:
+            if not name.startswith(_PLAN_PREFIXES) or name in query_plans.ALLOWED_SCANS or name in _PLAN_SKIP:
+                continue
+            try:
+                statements += [(name, sql) for sql in query_plans.capture_statements(getattr(db, name), *args)]
+            except Exception as e:
+                logger.debug(f"Skipping plans of {name}: {e}")
+    plans = {}
+    with db.connection() as conn:
+        for name, sql in statements:
+            plans[(name, ' '.join(sql.split()))] = query_plans.explain(conn, sql)
+    return statements, plans
+
+def analyze_tables(tables, analysis_limit=DEFAULT_ANALYSIS_LIMIT):
+    """ANALYZE each table in its own short transaction."""
+    with db.connection() as conn:
+        conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+        try:
+            for table in tables:
+                with db.transaction():
+                    conn.execute(f'ANALYZE "{table}"')
+        finally:
+            conn.execute('PRAGMA analysis_limit = 0')
+
+def optimize(analysis_limit=DEFAULT_ANALYSIS_LIMIT):
+    """Run ``PRAGMA optimize``."""
+    with db.connection() as conn:
+        conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+        try:
+            conn.execute('PRAGMA optimize')
+        finally:
+            conn.execute('PRAGMA analysis_limit = 0')
+
+def incremental_vacuum(step_pages=VACUUM_STEP_PAGES, sleep_ms=VACUUM_SLEEP_MS):
+    """Return free pages to the file system, ``step_pages`` per transaction.
+
+    Returns the number of pages freed. Does nothing unless auto_vacuum is
+    INCREMENTAL. Must not be called inside a transaction.
+    """
+    freed = 0
+    with db.connection() as conn:
+        if conn.in_transaction:
+            raise RuntimeError("incremental_vacuum() cannot run inside a transaction")
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return 0
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        while free:
+            # sqlite3's execute() steps a PRAGMA without result columns only
+            # once, which frees a single page; executescript() runs it to the end
+            conn.executescript(f'PRAGMA incremental_vacuum({int(step_pages)})')
+            remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if remaining >= free:
+                break
+            freed += free - remaining
+            free = remaining
+            if free and sleep_ms:
+                time.sleep(sleep_ms / 1000)
+    return freed
+
+def checkpoint(mode='PASSIVE'):
+    """Run a WAL checkpoint. Returns ``(busy, wal pages, pages checkpointed)``."""
+    with db.connection() as conn:
+        for attempt in range(CHECKPOINT_RETRIES + 1):
+            result = tuple(conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone())
+            # (1, -1, -1): a writer's automatic checkpoint holds the checkpoint lock
+            if result[1] != -1:
+                break
+            time.sleep(0.05 * (attempt + 1))
+        return result
+
+def full_vacuum():
+    """Rebuild the whole file with VACUUM, which applies the auto_vacuum mode
+    set on every pooled connection (DB_AUTO_VACUUM).
+
+    Holds the write lock for the whole rebuild and needs free disk space
+    about the size of the database; run it when the bot is quiet.
+    """
+    with db.connection() as conn:
+        if conn.in_transaction:
+            raise RuntimeError("full_vacuum() cannot run inside a transaction")
+        conn.execute('VACUUM')
+
+def run_maintenance(tasks=TASKS, idle_seconds=DEFAULT_IDLE_SECONDS, force=False,
+                    analysis_limit=DEFAULT_ANALYSIS_LIMIT):
+    """Run the maintenance ``tasks`` and return a report (see the module docstring)."""
+    started = time.perf_counter()
+    idle = get_idle_seconds()
+    quiet = force or idle >= idle_seconds
+    report = {'started_ts': int(time.time()), 'idle_seconds': round(idle, 1), 'tasks': {},
+              'before': get_file_stats(), 'plan_changes': []}
+    statements = plans = None
+    if 'analyze' in tasks or 'optimize' in tasks:
+        statements, plans = capture_plans()
+
+    for task in TASKS:
+        if task not in tasks:
+            continue
+        start = time.perf_counter()
+        result = {}
+        try:
+            if task == 'analyze':
+                changed = get_changed_tables()
+                analyze_tables([table for table, _, _ in changed], analysis_limit)
+                result['tables'] = {table: {'rows_before': before, 'rows': rows} for table, before, rows in changed}
+            elif task == 'optimize':
+                optimize(analysis_limit)
+            elif task == 'vacuum':
+                if report['before']['auto_vacuum'] != 'INCREMENTAL':
+                    result['skipped'] = "auto_vacuum is not INCREMENTAL (run 'maintenance.py vacuum' once)"
+                elif not quiet:
+                    result['skipped'] = 'not idle'
+                else:
+                    result['freed_pages'] = incremental_vacuum()
+            elif task == 'checkpoint':
+                if report['before']['journal_mode'] == 'WAL':
+                    result['passive'] = checkpoint('PASSIVE')
+                    if quiet:
+                        result['truncate'] = checkpoint('TRUNCATE')
+                    else:
+                        result['skipped'] = 'truncate: not idle'
+                else:
+                    result['skipped'] = 'not in WAL mode'
+        except Exception as e:
+            logger.error(f"Maintenance task {task} failed: {e}")
+            result['error'] = str(e)
+        result['ms'] = round((time.perf_counter() - start) * 1000, 1)
+        report['tasks'][task] = result
+
+    if plans is not None:
+        _, after = capture_plans(statements)
+        for (name, sql), details in after.items():
+            if plans.get((name, sql), details) != details:
+                report['plan_changes'].append({'function': name, 'sql': sql,
+                                               'before': plans[(name, sql)], 'after': details})
+    report['after'] = get_file_stats()
+    report['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return report
+
+def format_report(report):
+    """One-line summary of a maintenance report for logs."""
+    before, after = report['before'], report['after']
+    tasks = ', '.join(
+        f"{task} {result['ms']}ms" + (f" ({result.get('skipped') or result.get('error')})"
+                                       if result.get('skipped') or result.get('error') else '')
+        for task, result in report['tasks'].items()
+    )
+    analyzed = len(report['tasks'].get('analyze', {}).get('tables', {}))
+    return (f"file {before['file_bytes'] / 1048576:.1f} -> {after['file_bytes'] / 1048576:.1f} MB, "
+            f"WAL {before['wal_bytes'] / 1048576:.1f} -> {after['wal_bytes'] / 1048576:.1f} MB, "
+            f"free pages {before['freelist_pages']} -> {after['freelist_pages']}, "
+            f"{analyzed} table(s) analyzed, {len(report['plan_changes'])} plan change(s); {tasks}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Database maintenance.")
+    parser.add_argument('command', nargs='?', choices=['run', 'status', 'vacuum'], default='run')
+    parser.add_argument('--tasks', nargs='+', choices=TASKS, default=list(TASKS))
+    parser.add_argument('--force', action='store_true', help="Run vacuum and the truncating checkpoint even if not idle")
+    parser.add_argument('--idle-seconds', type=float, default=DEFAULT_IDLE_SECONDS)
+    parser.add_argument('--analysis-limit', type=int, default=DEFAULT_ANALYSIS_LIMIT)
+    args = parser.parse_args()
+
+    db.init_database()
+    if args.command == 'status':
+        stats = get_file_stats()
+        print(f"📋 {stats['file_bytes'] / 1048576:.1f} MB file, {stats['wal_bytes'] / 1048576:.1f} MB WAL, "
+              f"{stats['freelist_pages']} free pages ({stats['free_bytes'] / 1048576:.1f} MB), "
+              f"auto_vacuum {stats['auto_vacuum']}, idle for {get_idle_seconds():.0f}s")
+        for table, before, rows in get_changed_tables():
+            print(f"  {table}: {rows} rows, {'never analyzed' if before is None else f'{before} when analyzed'}")
+        return
+    if args.command == 'vacuum':
+        before = get_file_stats()
+        start = time.perf_counter()
+        full_vacuum()
+        after = get_file_stats()
+        print(f"✅ VACUUM done in {time.perf_counter() - start:.1f}s: "
+              f"{before['file_bytes'] / 1048576:.1f} -> {after['file_bytes'] / 1048576:.1f} MB, "
+              f"auto_vacuum {after['auto_vacuum']}")
+        return
+
+    report = run_maintenance(args.tasks, args.idle_seconds, args.force, args.analysis_limit)
+    print(f"✅ Maintenance done in {report['duration_ms'] / 1000:.1f}s: {format_report(report)}")
+    for table, counts in report['tasks'].get('analyze', {}).get('tables', {}).items():
+        print(f"  📊 ANALYZE {table} ({counts['rows_before']} -> {counts['rows']} rows)")
+    for change in report['plan_changes']:
+        print(f"  🔀 {change['function']}: {change['sql'][:100]}")
+        print(f"      before: {' | '.join(change['before'])}")
+        print(f"      after:  {' | '.join(change['after'])}")
+
+if __name__ == '__main__':
+    main()
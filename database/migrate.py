@@ -1,8 +1,19 @@
-"""Migration script to add custom_code and description fields to items table."""
+"""Bring the warehouse database up to the current schema version.
+
+Usage (from the project root):
+    python database/migrate.py              # apply pending migrations
+    python database/migrate.py --dry-run    # list them with timing estimates
+    python database/migrate.py --database /path/to/warehouse.db
+
+Migrations are defined in ``migrations.py``; the schema version is stored in
+``PRAGMA user_version``.
+"""
 
-import sqlite3
 import os
 import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 # Fix encoding for Windows console
 if sys.platform == 'win32':
@@ -10,97 +21,75 @@ if sys.platform == 'win32':
     sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
     sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
 
-DATABASE_FILE = 'warehouse.db'
+from database import database as db
+from database import migrations
+from database.pool import ConnectionPool
+
+def _format_seconds(seconds):
+    if seconds < 1:
+        return "< 1s"
+    if seconds < 120:
+        return f"~{seconds:.0f}s"
+    return f"~{seconds / 60:.0f} min"
 
-def migrate():
-    """Apply migration to add new fields to items table."""
-    if not os.path.exists(DATABASE_FILE):
-        print("❌ Database file not found. Creating new database with latest schema...")
-        import database
-        print("✅ New database created successfully!")
+def dry_run(pool):
+    """Print the pending migrations and how long they are expected to take."""
+    version, plan = migrations.plan_migrations(pool)
+    print(f"📋 Database is at schema version {version}, code is at {db.SCHEMA_VERSION}.")
+    if not plan:
+        print("✅ Database is already up to date.")
         return
-    
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    
+    total = 0.0
+    for m, seconds, detail in plan:
+        total += seconds
+        mode = "online, batched" if m.online else "one transaction"
+        print(f"  {m.version}. {m.description}")
+        print(f"     {detail} ({mode}), estimated {_format_seconds(seconds)}")
+    print(f"⏱  Estimated total: {_format_seconds(total)}")
+
+def migrate(database_file=None, batch_size=migrations.DEFAULT_BATCH_SIZE):
+    """Apply every pending migration."""
+    pool = ConnectionPool(database_file or db.DATABASE_FILE)
     try:
-        # Check if columns already exist
-        cursor.execute("PRAGMA table_info(items)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        needs_migration = False
-        
-        # Add missing columns
-        if 'custom_code' not in columns:
-            print("➕ Adding custom_code column...")
-            cursor.execute('ALTER TABLE items ADD COLUMN custom_code TEXT')
-            needs_migration = True
-        
-        if 'description' not in columns:
-            print("➕ Adding description column...")
-            cursor.execute('ALTER TABLE items ADD COLUMN description TEXT')
-            needs_migration = True
-        
-        if 'measure_type_id' not in columns:
-            print("➕ Adding measure_type_id column...")
-            cursor.execute('ALTER TABLE items ADD COLUMN measure_type_id INTEGER')
-            needs_migration = True
-        
-        if 'available_count' not in columns:
-            print("➕ Adding available_count column...")
-            cursor.execute('ALTER TABLE items ADD COLUMN available_count REAL DEFAULT 0')
-            needs_migration = True
-        
-        if 'video_url' not in columns:
-            print("➕ Adding video_url column...")
-            cursor.execute('ALTER TABLE items ADD COLUMN video_url TEXT')
-            needs_migration = True
-        
-        # Check if measure_types table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='measure_types'")
-        if not cursor.fetchone():
-            print("➕ Creating measure_types table...")
-            cursor.execute('''
-                CREATE TABLE measure_types (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    code TEXT UNIQUE NOT NULL,
-                    name TEXT NOT NULL,
-                    low_stock_threshold REAL NOT NULL DEFAULT 0,
-                    created_at TEXT NOT NULL
-                )
-            ''')
-            needs_migration = True
-        
-        # Check if authenticated_users table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='authenticated_users'")
-        if not cursor.fetchone():
-            print("➕ Creating authenticated_users table...")
-            cursor.execute('''
-                CREATE TABLE authenticated_users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    authenticated_at TEXT NOT NULL
-                )
-            ''')
-            needs_migration = True
-        
-        if needs_migration:
-            conn.commit()
-            print("✅ Migration completed successfully!")
-            print("\n⚠️  IMPORTANT: You need to update existing items to set measure_type_id!")
-            print("    First, create some measure types, then update your items.")
-        else:
+        with pool.connection() as conn:
+            version = migrations.get_version(conn)
+        if version >= db.SCHEMA_VERSION:
             print("✅ Database is already up to date.")
-        
-    except Exception as e:
-        print(f"❌ Migration failed: {e}")
-        conn.rollback()
+            return
+        migrations.apply_migrations(
+            pool, batch_size=batch_size, progress=lambda message: print(f"➕ {message}")
+        )
+        print(f"✅ Migration completed successfully! Schema version {db.SCHEMA_VERSION}.")
     finally:
-        conn.close()
+        pool.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument('--database', default=db.DATABASE_FILE,
+                        help=f"Database file (default {db.DATABASE_FILE})")
+    parser.add_argument('--dry-run', action='store_true', help="Only list pending migrations")
+    parser.add_argument('--batch-size', type=int, default=migrations.DEFAULT_BATCH_SIZE,
+                        help="Rows copied per transaction by table rebuilds")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        if not os.path.exists(args.database):
+            print("❌ Database file not found; it will be created with the latest schema.")
+            return 0
+        pool = ConnectionPool(args.database)
+        try:
+            dry_run(pool)
+        finally:
+            pool.close()
+        return 0
 
-if __name__ == '__main__':
     print("🔄 Running database migration...")
-    migrate()
+    try:
+        migrate(args.database, args.batch_size)
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return 1
+    return 0
 
+if __name__ == '__main__':
+    sys.exit(main())
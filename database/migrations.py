@@ -0,0 +1,511 @@
+"""Versioned schema migrations, keyed on ``PRAGMA user_version``.
+
+Each migration brings the schema from ``version - 1`` to ``version`` and is
+registered with the ``@migration`` decorator. Plain migrations receive a
+connection and run inside a single transaction together with the
+user_version bump. Online migrations (``online=True``) receive the pool and
+manage their own short transactions, e.g. through ``rebuild_table()``, so a
+large table can be rebuilt while the bot and API keep writing. Since the bot
+and the API may start at the same time, an online migration only runs while
+its process holds the ``migration_lock`` row (see ``MigrationLock``).
+
+Migrations may run against databases created by older code whose tables
+were built by ``create_schema()`` at a newer shape, so they should check
+before changing anything (see ``add_column_if_missing()``). They must only
+use the pool or connection they are given, never ``database.connection()``.
+"""
+
+import os
+import re
+import time
+import uuid
+import logging
+import threading
+
+from . import database as db
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+# Rows copied per transaction by rebuild_table()
+DEFAULT_BATCH_SIZE = 5000
+
+# Rows copied into a temporary table to estimate copy speed in dry runs
+ESTIMATE_SAMPLE_ROWS = 5000
+
+# Seconds the migration lock stays held without being refreshed, so the lock
+# of a process that died mid-migration runs out
+LOCK_TTL = 30
+# Seconds between refreshes of a held lock, and between attempts to take it
+LOCK_REFRESH = 5
+
+class Migration:
+    """One registered schema change."""
+
+    def __init__(self, version, description, apply, online=False, tables=()):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.online = online
+        self.tables = tuple(tables)
+
+    def __repr__(self):
+        return f"Migration({self.version}, {self.description!r})"
+
+MIGRATIONS = []
+
+def migration(version, description, online=False, tables=()):
+    """Register the decorated function as the migration to schema ``version``.
+
+    ``tables`` lists the tables whose rows the migration rewrites; it is only
+    used to estimate the duration in dry runs.
+    """
+    def register(func):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append(Migration(version, description, func, online, tables))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return register
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def get_version(conn):
+    """Get the schema version stored in the database."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def _set_version(conn, version):
+    conn.execute(f'PRAGMA user_version = {int(version)}')
+
+def table_exists(conn, table):
+    """Check whether a table exists."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+def column_exists(conn, table, column):
+    """Check whether a table has a column."""
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+def add_column_if_missing(conn, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists. Returns True if added."""
+    if column_exists(conn, table, column):
+        return False
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+def rebuild_table(pool, table, create_sql, columns, select=None, batch_size=DEFAULT_BATCH_SIZE,
+                  after_swap=None, progress=None):
+    """Rebuild ``table`` with a new definition without holding the write lock for long.
+
+    1. A shadow table is created from ``create_sql`` (with ``{table}`` as the
+       placeholder for its name) together with triggers that mirror every
+       insert, update and delete on the old table into it.
+    2. Existing rows are copied in rowid order, ``batch_size`` rows per
+       transaction, so writers only ever wait for one batch.
+    3. The old table's secondary indexes are moved to the shadow table, one
+       index per transaction.
+    4. One last short transaction checks the row counts, drops the old
+       table, renames the shadow table and calls ``after_swap(conn)`` to
+       recreate triggers and any new indexes (default: ``database.create_schema``).
+       Foreign keys are off during the swap, since dropping a parent table
+       would otherwise cascade into its child tables, and the rebuilt table's
+       foreign keys are checked before it commits.
+
+    ``columns`` are the shadow table columns to fill and ``select`` the
+    matching expressions over the old table (default: the same names). The
+    rowid alias (``id``) must be among them so rowids are preserved. If the
+    process stops half way, running the rebuild again starts over cleanly.
+
+    Returns the number of rows copied.
+    """
+    shadow = f'_rebuild_{table}'
+    select = select or columns
+    column_list = ', '.join(columns)
+    select_list = ', '.join(select)
+    mirror = f'INSERT OR REPLACE INTO {shadow} ({column_list}) SELECT {select_list} FROM {table}'
+
+    with pool.transaction() as conn:
+        _drop_shadow(conn, table)
+        conn.execute(create_sql.format(table=shadow))
+        conn.execute(f'''CREATE TRIGGER {shadow}_insert AFTER INSERT ON {table} BEGIN
+            {mirror} WHERE rowid = NEW.rowid;
+        END''')
+        conn.execute(f'''CREATE TRIGGER {shadow}_update AFTER UPDATE ON {table} BEGIN
+            DELETE FROM {shadow} WHERE rowid = OLD.rowid;
+            {mirror} WHERE rowid = NEW.rowid;
+        END''')
+        conn.execute(f'''CREATE TRIGGER {shadow}_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM {shadow} WHERE rowid = OLD.rowid;
+        END''')
+        total = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    copied = 0
+    last_rowid = None
+    while True:
+        with pool.transaction() as conn:
+            where = '' if last_rowid is None else 'WHERE rowid > ?'
+            params = () if last_rowid is None else (last_rowid,)
+            bound = conn.execute(
+                f'SELECT MAX(rowid) FROM (SELECT rowid FROM {table} {where} ORDER BY rowid LIMIT ?)',
+                (*params, batch_size)
+            ).fetchone()[0]
+            if bound is None:
+                break
+            # Rows already mirrored by the triggers are newer; keep them
+            cursor = conn.execute(
+                f'''INSERT OR IGNORE INTO {shadow} ({column_list})
+                    SELECT {select_list} FROM {table} {where + ' AND' if where else 'WHERE'} rowid <= ?''',
+                (*params, bound)
+            )
+            copied += max(cursor.rowcount, 0)
+            last_rowid = bound
+        if progress:
+            progress(copied, total)
+
+    # Move the secondary indexes over one per transaction, so writers wait for
+    # a single index build at a time instead of all of them during the swap
+    with pool.connection() as conn:
+        indexes = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)
+        ).fetchall()
+    for name, index_sql in indexes:
+        with pool.transaction() as conn:
+            conn.execute(f'DROP INDEX {name}')
+            conn.execute(re.sub(rf'\bON\s+"?{table}"?\s*\(', f'ON {shadow} (', index_sql, count=1))
+
+    with pool.connection() as conn:
+        # PRAGMA foreign_keys is ignored inside a transaction, so switch it first
+        foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+        conn.execute('PRAGMA foreign_keys = OFF')
+        try:
+            with pool.transaction() as conn:
+                old_count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                new_count = conn.execute(f'SELECT COUNT(*) FROM {shadow}').fetchone()[0]
+                if old_count != new_count:
+                    raise RuntimeError(f"Rebuild of {table} lost rows: {old_count} in {table}, {new_count} copied")
+                sequence = None
+                if table_exists(conn, 'sqlite_sequence'):
+                    row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+                    sequence = row[0] if row else None
+                _drop_shadow_triggers(conn, table)
+                conn.execute(f'DROP TABLE {table}')
+                # Triggers on other tables that mention the table (e.g. the low_stock
+                # triggers on measure_types) would fail the rename's schema check
+                # while it is missing; the legacy rename skips that check
+                conn.execute('PRAGMA legacy_alter_table = ON')
+                try:
+                    conn.execute(f'ALTER TABLE {shadow} RENAME TO {table}')
+                finally:
+                    conn.execute('PRAGMA legacy_alter_table = OFF')
+                if sequence is not None:
+                    # Keep AUTOINCREMENT from reusing ids of rows deleted before the rebuild
+                    conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (sequence, table))
+                (after_swap or (lambda c: db.create_schema(c.cursor())))(conn)
+                if foreign_keys:
+                    violations = conn.execute(f'PRAGMA foreign_key_check({table})').fetchall()
+                    if violations:
+                        raise RuntimeError(f"Rebuild of {table} left {len(violations)} rows with missing "
+                                           f"parents, e.g. rowid {violations[0][1]} -> {violations[0][2]}")
+        finally:
+            if foreign_keys:
+                conn.execute('PRAGMA foreign_keys = ON')
+    return copied
+
+def _drop_shadow_triggers(conn, table):
+    shadow = f'_rebuild_{table}'
+    for suffix in ('insert', 'update', 'delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {shadow}_{suffix}')
+
+def _drop_shadow(conn, table):
+    """Remove what an interrupted rebuild_table() left behind."""
+    _drop_shadow_triggers(conn, table)
+    conn.execute(f'DROP TABLE IF EXISTS _rebuild_{table}')
+
+# ============================================================================
+# Migrations
+# ============================================================================
+
+@migration(1, "Baseline: item columns added after the first release, all tables, indexes, "
+              "search index, row counters and stock ledger")
+def _baseline(conn):
+    if table_exists(conn, 'items'):
+        add_column_if_missing(conn, 'items', 'custom_code', 'TEXT')
+        add_column_if_missing(conn, 'items', 'description', 'TEXT')
+        add_column_if_missing(conn, 'items', 'measure_type_id', 'INTEGER')
+        add_column_if_missing(conn, 'items', 'available_count', 'REAL DEFAULT 0')
+        add_column_if_missing(conn, 'items', 'video_url', 'TEXT')
+        # create_schema() below indexes these; migration 4 fills them in
+        add_column_if_missing(conn, 'items', 'created_ts', 'INTEGER')
+        add_column_if_missing(conn, 'items', 'updated_ts', 'INTEGER')
+    db.create_schema(conn.cursor())
+
+@migration(2, "table_versions and the triggers that bump it, for the reference-table cache")
+def _table_versions(conn):
+    db.create_table_versions(conn.cursor())
+
+@migration(3, "low_stock table maintained by triggers on items and measure_types")
+def _low_stock(conn):
+    db.create_low_stock(conn.cursor())
+
+def _shamsi_to_epoch(text, default):
+    try:
+        return utils.shamsi_to_timestamp(text)
+    except (ValueError, TypeError, AttributeError):
+        return default
+
+def _fill_timestamps(conn, rows):
+    now = int(time.time())
+    updates = []
+    for item_id, created_at, updated_at in rows:
+        created_ts = _shamsi_to_epoch(created_at, now)
+        updates.append((created_ts, _shamsi_to_epoch(updated_at, created_ts), item_id))
+    conn.executemany('UPDATE items SET created_ts = ?, updated_ts = ? WHERE id = ?', updates)
+
+@migration(4, "Epoch created_ts/updated_ts columns on items, filled from the Shamsi strings; "
+              "item sort indexes switched to created_ts", online=True, tables=('items',))
+def _item_timestamps(pool, batch_size):
+    with pool.transaction() as conn:
+        add_column_if_missing(conn, 'items', 'created_ts', 'INTEGER')
+        add_column_if_missing(conn, 'items', 'updated_ts', 'INTEGER')
+
+    # Fill the new columns one batch per transaction; rows written meanwhile by
+    # new code already have them, rows written by old code are caught at the end
+    last_id = 0
+    while True:
+        with pool.transaction() as conn:
+            rows = conn.execute(
+                '''SELECT id, created_at, updated_at FROM items
+                   WHERE id > ? AND (created_ts IS NULL OR updated_ts IS NULL)
+                   ORDER BY id LIMIT ?''',
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            _fill_timestamps(conn, rows)
+            last_id = rows[-1][0]
+
+    with pool.transaction() as conn:
+        _fill_timestamps(conn, conn.execute(
+            'SELECT id, created_at, updated_at FROM items WHERE created_ts IS NULL OR updated_ts IS NULL'
+        ).fetchall())
+        # Same index names, now on created_ts instead of the text column
+        for index in ('idx_items_created_at', 'idx_items_brand', 'idx_items_subcategory',
+                      'idx_items_category', 'idx_items_measure_type'):
+            conn.execute(f'DROP INDEX IF EXISTS {index}')
+        db.create_schema(conn.cursor())
+
+@migration(5, "code_sequences counters for collision-free code allocation")
+def _code_sequences(conn):
+    db.create_code_sequences(conn.cursor())
+
+# Rows left behind while foreign keys were not enforced: subcategories of
+# deleted categories, items of deleted categories, subcategories, brands and
+# measure types, and their images. Children go first, so the deletes pass
+# the foreign key checks of the old schema
+ORPHAN_DELETES = [
+    '''DELETE FROM items
+       WHERE category_id NOT IN (SELECT id FROM categories)
+          OR subcategory_id NOT IN (SELECT s.id FROM subcategories s JOIN categories c ON s.category_id = c.id)
+          OR brand_id NOT IN (SELECT id FROM brands)
+          OR measure_type_id NOT IN (SELECT id FROM measure_types)''',
+    'DELETE FROM subcategories WHERE category_id NOT IN (SELECT id FROM categories)',
+    'DELETE FROM item_images WHERE item_id NOT IN (SELECT id FROM items)',
+]
+
+@migration(6, "pending_file_deletions queue; orphaned rows removed; items rebuilt with "
+              "ON DELETE CASCADE foreign keys", online=True, tables=('items',))
+def _cascading_items(pool, batch_size):
+    with pool.transaction() as conn:
+        # The queue and its trigger first, so the files of orphaned images are queued too
+        db.create_file_deletions(conn.cursor())
+        for statement in ORPHAN_DELETES:
+            removed = conn.execute(statement).rowcount
+            if removed:
+                logger.info(f"Removed {removed} orphaned rows: {statement.split()[2]}")
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(items)')]
+    rebuild_table(pool, 'items', db.ITEMS_TABLE, columns, batch_size=batch_size)
+
+@migration(7, "measure_types low_stock trigger only fires when the threshold changes")
+def _low_stock_threshold_changes(conn):
+    # CREATE TRIGGER IF NOT EXISTS keeps the old definition, so replace it
+    conn.execute('DROP TRIGGER IF EXISTS measure_types_low_stock_update')
+    db.create_low_stock(conn.cursor())
+
+# ============================================================================
+# Runner
+# ============================================================================
+
+class MigrationLock:
+    """The ``migration_lock`` row, held by one process at a time.
+
+    Plain migrations are safe on their own: they check ``user_version`` inside
+    the transaction that applies them. Online migrations span many
+    transactions, so two processes migrating at once would run the same
+    ``rebuild_table()`` over each other. The row is claimed under the write
+    lock (``BEGIN IMMEDIATE``) and kept alive by a thread that pushes its
+    expiry forward every ``LOCK_REFRESH`` seconds; another process waits
+    until the row is released or expires.
+    """
+
+    def __init__(self, pool, report=None):
+        self.pool = pool
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.report = report or (lambda message: logger.info(message))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _try_claim(self):
+        """Claim the row unless another live owner has it. Returns the current owner."""
+        with self.pool.transaction() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS migration_lock (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                owner TEXT NOT NULL,
+                expires_ts REAL NOT NULL
+            )''')
+            now = time.time()
+            conn.execute('DELETE FROM migration_lock WHERE expires_ts < ?', (now,))
+            conn.execute('INSERT OR IGNORE INTO migration_lock (id, owner, expires_ts) VALUES (1, ?, ?)',
+                         (self.owner, now + LOCK_TTL))
+            return conn.execute('SELECT owner FROM migration_lock WHERE id = 1').fetchone()[0]
+
+    def acquire(self):
+        """Wait until the row is ours, then keep refreshing it."""
+        waiting_for = None
+        while True:
+            owner = self._try_claim()
+            if owner == self.owner:
+                break
+            if owner != waiting_for:
+                self.report(f"Waiting for the migrations running in process {owner}")
+                waiting_for = owner
+            time.sleep(LOCK_REFRESH)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh, name='migration-lock', daemon=True)
+        self._thread.start()
+
+    def _refresh(self):
+        while not self._stop.wait(LOCK_REFRESH):
+            try:
+                with self.pool.transaction() as conn:
+                    conn.execute('UPDATE migration_lock SET expires_ts = ? WHERE owner = ?',
+                                 (time.time() + LOCK_TTL, self.owner))
+            except Exception as e:
+                logger.error(f"Refreshing the migration lock failed: {e}")
+
+    def check(self, conn):
+        """Raise if another process took the row over, e.g. after this one stalled past LOCK_TTL."""
+        row = conn.execute('SELECT owner FROM migration_lock WHERE id = 1').fetchone()
+        if row is None or row[0] != self.owner:
+            raise RuntimeError("Lost the migration lock to another process")
+
+    def release(self):
+        """Stop refreshing the row and delete it."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        with self.pool.transaction() as conn:
+            conn.execute('DELETE FROM migration_lock WHERE owner = ?', (self.owner,))
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def pending_migrations(version):
+    """Migrations that still have to run on a database at ``version``."""
+    return [m for m in MIGRATIONS if m.version > version]
+
+def _check_registry():
+    latest = MIGRATIONS[-1].version if MIGRATIONS else 0
+    if latest != db.SCHEMA_VERSION:
+        raise RuntimeError(f"Last migration is version {latest} but SCHEMA_VERSION is {db.SCHEMA_VERSION}")
+
+def apply_migrations(pool, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Apply every pending migration to ``pool``'s database.
+
+    A database without any tables gets the current schema directly instead
+    of replaying every migration. ``progress`` is called with messages about
+    each step. Returns a list of ``(migration, seconds)`` for the migrations
+    that ran.
+    """
+    _check_registry()
+    report = progress or (lambda message: logger.info(message))
+
+    with pool.transaction() as conn:
+        version = get_version(conn)
+        if version == 0 and not table_exists(conn, 'items'):
+            db.create_schema(conn.cursor())
+            _set_version(conn, db.SCHEMA_VERSION)
+            report(f"Created schema version {db.SCHEMA_VERSION}")
+            return []
+
+    applied = []
+    for m in pending_migrations(version):
+        start = time.perf_counter()
+        report(f"Applying migration {m.version}: {m.description}")
+        if m.online:
+            with MigrationLock(pool, report) as lock:
+                # Another process may have applied it while we waited for the lock
+                with pool.connection() as conn:
+                    if get_version(conn) >= m.version:
+                        continue
+                m.apply(pool, batch_size)
+                with pool.transaction() as conn:
+                    lock.check(conn)
+                    if get_version(conn) >= m.version:
+                        continue
+                    _set_version(conn, m.version)
+        else:
+            with pool.transaction() as conn:
+                # Another process may have applied it while we waited for the lock
+                if get_version(conn) >= m.version:
+                    continue
+                m.apply(conn)
+                _set_version(conn, m.version)
+        elapsed = time.perf_counter() - start
+        applied.append((m, elapsed))
+        report(f"Migration {m.version} done in {elapsed:.2f}s")
+    return applied
+
+def _copy_seconds_per_row(conn, table):
+    """Time copying a sample of ``table`` into a temporary table."""
+    conn.execute('DROP TABLE IF EXISTS temp._migration_estimate')
+    start = time.perf_counter()
+    conn.execute(f'CREATE TEMP TABLE _migration_estimate AS SELECT * FROM {table} LIMIT {ESTIMATE_SAMPLE_ROWS}')
+    elapsed = time.perf_counter() - start
+    sampled = conn.execute('SELECT COUNT(*) FROM temp._migration_estimate').fetchone()[0]
+    conn.execute('DROP TABLE temp._migration_estimate')
+    return elapsed / sampled if sampled else 0.0
+
+def plan_migrations(pool):
+    """Describe the pending migrations without changing anything.
+
+    Returns ``(version, [(migration, estimated seconds, detail)])``. The
+    estimate extrapolates the time to copy a sample of each rewritten table,
+    counting each of its indexes as one more copy, so treat it as a rough guide.
+    """
+    _check_registry()
+    plan = []
+    with pool.connection() as conn:
+        version = get_version(conn)
+        for m in pending_migrations(version):
+            seconds = 0.0
+            details = []
+            for table in m.tables:
+                if not table_exists(conn, table):
+                    continue
+                rows = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                indexes = conn.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table,)
+                ).fetchone()[0]
+                seconds += rows * _copy_seconds_per_row(conn, table) * (1 + indexes)
+                details.append(f"{table}: {rows:,} rows, {indexes} indexes")
+            plan.append((m, seconds, '; '.join(details) or 'schema changes only'))
+    return version, plan
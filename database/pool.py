@@ -0,0 +1,281 @@
+"""Connection pooling for the warehouse SQLite database."""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 30.0
+
+# PRAGMA profile applied to every pooled connection. Each entry maps a pragma
+# to (environment variable, default value, allowed values or int).
+# auto_vacuum comes first: it only takes effect on a new, empty database
+# before journal_mode writes the file header (existing ones need a VACUUM).
+PRAGMA_SETTINGS = {
+    'auto_vacuum': ('DB_AUTO_VACUUM', 'INCREMENTAL', ('NONE', 'FULL', 'INCREMENTAL')),
+    'journal_mode': ('DB_JOURNAL_MODE', 'WAL', ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')),
+    'synchronous': ('DB_SYNCHRONOUS', 'NORMAL', ('OFF', 'NORMAL', 'FULL', 'EXTRA')),
+    'busy_timeout': ('DB_BUSY_TIMEOUT_MS', 5000, int),
+    'cache_size': ('DB_CACHE_SIZE', -16000, int),
+    'mmap_size': ('DB_MMAP_SIZE', 64 * 1024 * 1024, int),
+    'temp_store': ('DB_TEMP_STORE', 'MEMORY', ('DEFAULT', 'FILE', 'MEMORY')),
+    'foreign_keys': ('DB_FOREIGN_KEYS', 'ON', ('ON', 'OFF')),
+}
+
+def load_pragma_profile(environ=None):
+    """Build the PRAGMA profile from environment variables.
+
+    Invalid values are logged and replaced by the default, so a typo in the
+    .env file never stops the bot or API from starting.
+    """
+    environ = os.environ if environ is None else environ
+    profile = {}
+    for pragma, (env_var, default, allowed) in PRAGMA_SETTINGS.items():
+        raw = environ.get(env_var)
+        value = default
+        if raw is not None and raw.strip():
+            try:
+                value = _validate_pragma(raw.strip(), allowed)
+            except ValueError:
+                logger.warning(f"Ignoring invalid {env_var}={raw!r}, using {default!r}")
+        profile[pragma] = value
+    return profile
+
+def _validate_pragma(raw, allowed):
+    """Validate a raw pragma value; pragma values cannot be bound as parameters."""
+    if allowed is int:
+        return int(raw)
+    value = raw.upper()
+    if value not in allowed:
+        raise ValueError(raw)
+    return value
+
+class ConnectionPool:
+    """A bounded pool of long-lived SQLite connections to one database file.
+
+    Connections are created lazily up to ``size`` and handed back to the pool
+    instead of being closed. A thread that already holds a connection gets the
+    same one again, so nested ``connection()``/``transaction()`` blocks share
+    a single connection and a single transaction.
+
+    With ``readonly=True`` the connections are opened with ``mode=ro`` and
+    ``PRAGMA query_only``, so they can serve reads next to a writer but can
+    never write. The database file must already exist.
+    """
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, pragmas=None, readonly=False):
+        self.path = path
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.pragmas = load_pragma_profile() if pragmas is None else dict(pragmas)
+        self.readonly = readonly
+        self._journal_mode_set = False
+        self._idle = queue.LifoQueue()
+        self._all = []
+        # Per connection: [times borrowed, total seconds held, longest hold]
+        self._timings = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+        self._trace_callback = None
+
+    def _connect(self):
+        """Open a new connection in autocommit mode; transactions are explicit."""
+        busy_timeout = self.pragmas.get('busy_timeout')
+        timeout = busy_timeout / 1000 if busy_timeout is not None else self.timeout
+        if self.readonly:
+            conn = sqlite3.connect(
+                Path(self.path).resolve().as_uri() + '?mode=ro',
+                timeout=timeout,
+                isolation_level=None,
+                check_same_thread=False,
+                uri=True
+            )
+        else:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=timeout,
+                isolation_level=None,
+                check_same_thread=False
+            )
+        self._apply_pragmas(conn)
+        if self._trace_callback is not None:
+            conn.set_trace_callback(self._trace_callback)
+        return conn
+
+    def _apply_pragmas(self, conn):
+        """Apply the PRAGMA profile to a freshly opened connection."""
+        if self.readonly:
+            conn.execute('PRAGMA query_only = 1')
+        for pragma, value in self.pragmas.items():
+            if pragma == 'auto_vacuum' and self.readonly:
+                continue
+            if pragma == 'journal_mode':
+                # Read-only connections use whatever mode the writer set
+                if self.readonly:
+                    continue
+                # journal_mode is stored in the database file, so it only
+                # needs to be switched once per pool
+                if self._journal_mode_set:
+                    continue
+                try:
+                    mode = conn.execute(f'PRAGMA journal_mode = {value}').fetchone()[0]
+                    self._journal_mode_set = True
+                    if mode.upper() != value:
+                        logger.warning(f"journal_mode {value} not available, database is using {mode}")
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"Could not set journal_mode={value}: {e}")
+                continue
+            conn.execute(f'PRAGMA {pragma} = {value}')
+
+    def _acquire(self):
+        """Take an idle connection, open a new one, or wait for one to be released."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = len(self._all) < self.size
+            if can_create:
+                conn = self._connect()
+                self._all.append(conn)
+                self._timings[conn] = [0, 0.0, 0.0]
+                return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No database connection available after {self.timeout}s (pool size {self.size})"
+            )
+
+    def _release(self, conn):
+        """Return a connection to the pool, rolling back anything left open."""
+        if self._closed:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the ``with`` block."""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        start = time.perf_counter()
+        try:
+            yield conn
+        finally:
+            elapsed = time.perf_counter() - start
+            timing = self._timings.get(conn)
+            if timing is not None:
+                timing[0] += 1
+                timing[1] += elapsed
+                timing[2] = max(timing[2], elapsed)
+            self._local.conn = None
+            self._release(conn)
+
+    def current(self):
+        """The connection the calling thread is holding, or None."""
+        return getattr(self._local, 'conn', None)
+
+    @contextmanager
+    def transaction(self):
+        """Run the ``with`` block in one write transaction.
+
+        Uses ``BEGIN IMMEDIATE`` so the write lock is taken up front, commits on
+        success and rolls back on any exception. A transaction opened inside
+        another one on the same thread joins the outer transaction.
+        """
+        if self.readonly:
+            raise sqlite3.ProgrammingError("Cannot write through a read-only connection pool")
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    @contextmanager
+    def snapshot(self):
+        """Run the ``with`` block in one read transaction.
+
+        Every query in the block sees the database as it was at the first
+        one, even if other connections commit in between.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute('BEGIN')
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+
+    def set_trace_callback(self, callback):
+        """Call ``callback(sql)`` for every statement run on the pool's
+        connections, including ones opened later; None stops tracing."""
+        with self._lock:
+            self._trace_callback = callback
+            for conn in self._all:
+                conn.set_trace_callback(callback)
+
+    @property
+    def trace_callback(self):
+        """The callback set with set_trace_callback(), or None."""
+        return self._trace_callback
+
+    def stats(self):
+        """How long each connection was borrowed for, in milliseconds."""
+        with self._lock:
+            timings = [self._timings[conn] for conn in self._all]
+        return [
+            {
+                'connection': index,
+                'borrows': count,
+                'avg_ms': round(total / count * 1000, 3) if count else 0.0,
+                'max_ms': round(longest * 1000, 3),
+            }
+            for index, (count, total, longest) in enumerate(timings)
+        ]
+
+    def close(self):
+        """Close every connection owned by the pool."""
+        with self._lock:
+            self._closed = True
+            connections, self._all = self._all, []
+            self._timings = {}
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
@@ -0,0 +1,216 @@
+"""Verify that every query in database.py is served by an index.
+
+Each public function in ``database.database`` is called against a small
+temporary database while the SQL it runs is captured with
+``set_trace_callback``. Every captured statement is then run through
+``EXPLAIN QUERY PLAN``; a plain ``SCAN <table>`` (a full table scan without an
+index) is reported as a failure.
+
+Usage (from the project root):
+    python -m database.query_plans
+
+Exits with status 1 if any query falls back to a full table scan, so it can
+be used as a CI check.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import database as db
+
+# Functions that are allowed to scan a whole table, and why
+ALLOWED_SCANS = {
+    'get_authenticated_users_count': 'COUNT(*) over the whole table',
+    'get_low_stock_count': 'COUNT(*) over the low_stock table, which holds only low-stock items',
+    'get_stats': 'reads the few rows of row_counts and counts low_stock',
+    'take_stock_snapshots': 'periodic job that visits every item',
+    'compact_stock_movements': 'periodic job that walks the ledger index once',
+    'reconcile_stock': 'checks every item against the ledger',
+    'get_pending_file_deletions': 'reads the head of the deletion queue, which the reaper keeps short',
+    'get_pending_file_deletion_count': 'COUNT(*) over the deletion queue',
+    'get_image_file_names': 'orphan sweep that reads every image path once',
+}
+
+# (function name, args) for every query function, run against the sample data
+QUERY_CALLS = [
+    ('get_all_categories', ()),
+    ('get_category_by_id', (1,)),
+    ('update_category', (1, 'دسته')),
+    ('get_all_subcategories', ()),
+    ('get_subcategories_by_category', (1,)),
+    ('get_subcategory_by_id', (1,)),
+    ('update_subcategory', (1, 'زیردسته')),
+    ('get_all_brands', ()),
+    ('get_brand_by_id', (1,)),
+    ('update_brand', (1, 'برند')),
+    ('get_all_measure_types', ()),
+    ('get_measure_type_by_id', (1,)),
+    ('update_measure_type', (1, 'عدد', 5)),
+    ('get_all_items', ()),
+    ('search_items', ('کالا',)),
+    ('count_search_items', ('کالا',)),
+    ('get_items_by_brand', (1,)),
+    ('get_items_by_subcategory', (1,)),
+    ('get_items_page', ()),
+    ('get_items_page', (db.encode_cursor('newest', [1700000000, 10]),)),
+    ('get_items_page', (db.encode_cursor('name', ['کالا', 10]),)),
+    ('get_items_page', (None, 100, {'brand_id': 1})),
+    ('get_items_page', (db.encode_cursor('newest', [1700000000, 10]), 100, {'subcategory_id': 1})),
+    ('get_items_page', (db.encode_cursor('oldest', [1700000000, 10]), 100, {'category_id': 1})),
+    ('get_items_page', (None, 100, {'updated_since': 1700000000}, 'updated')),
+    ('get_items_page', (db.encode_cursor('updated', [1700000000, 10]), 100, {'updated_since': 1700000000})),
+    ('count_items', ({'updated_since': 1700000000},)),
+    ('get_items_page', (None, 100, {'measure_type_id': 1}, 'newest', 200)),
+    ('count_items', ()),
+    ('count_items', ({'brand_id': 1},)),
+    ('get_item_by_id', (1,)),
+    ('update_item', (1, 'کالا', 'C-1', 1, 1, 1, 1)),
+    ('update_item_fields', (1,)),
+    ('adjust_stock', (1, 2)),
+    ('set_stock', (1, 3)),
+    ('get_low_stock_items', ()),
+    ('get_item_images', (1,)),
+    ('delete_item_image', (1,)),
+    ('queue_file_deletions', (['/tmp/stray.jpg'],)),
+    ('get_pending_file_deletions', ()),
+    ('get_pending_file_deletion_count', ()),
+    ('get_referenced_image_paths', (['/tmp/item_1_1.jpg', '/tmp/stray.jpg'],)),
+    ('get_image_file_names', ('/tmp',)),
+    ('finish_file_deletions', ([1], [2])),
+    ('set_user_state', (1, 'state', {})),
+    ('get_user_state', (1,)),
+    ('clear_user_state', (1,)),
+    ('is_user_authenticated', (1,)),
+    ('authenticate_user', (1,)),
+    ('get_authenticated_users_count', ()),
+    ('get_row_count', ('items',)),
+    ('get_low_stock_count', ()),
+    ('get_stats', ()),
+    ('get_stock_balance', (1,)),
+    ('get_stock_balance', (1, 2000000000)),
+    ('get_stock_history', (1,)),
+    ('get_stock_history', (1, 50, 1)),
+    ('get_stock_as_of', (2000000000,)),
+    ('take_stock_snapshots', ()),
+    ('get_stock_balance', (1,)),
+    ('compact_stock_movements', (2000000000,)),
+    ('reconcile_stock', ()),
+    ('delete_item', (2,)),
+    ('delete_subcategory', (2,)),
+    ('delete_category', (2,)),
+    ('delete_brand', (2,)),
+    ('delete_measure_type', (2,)),
+]
+
+_PLANNED_PREFIXES = ('SELECT', 'UPDATE', 'DELETE', 'WITH', 'INSERT')
+
+def _seed_sample_data():
+    """Create two of everything so every function has rows to work on."""
+    for n in (1, 2):
+        category_id = db.create_category(f'دسته {n}', f'CAT{n:06d}')
+        subcategory_id = db.create_subcategory(f'زیردسته {n}', f'SUB{n:06d}', category_id)
+        brand_id = db.create_brand(f'برند {n}', f'BRD{n:06d}')
+        measure_type_id = db.create_measure_type(f'واحد {n}', f'MSR{n:06d}', 5)
+        item_id = db.create_item(f'کالا {n}', f'ITM{n:06d}', f'C-{n}', category_id, subcategory_id,
+                                 brand_id, measure_type_id, 'توضیحات', n)
+        db.add_item_image(item_id, os.path.join(tempfile.gettempdir(), f'missing_{n}.jpg'))
+
+def capture_statements(func, *args):
+    """Call ``func`` and return the SQL statements it executed."""
+    statements = []
+    # Keep feeding the pool's own tracer (see instrument.py) while capturing
+    previous = db.get_trace_callback()
+
+    def trace(sql):
+        statements.append(sql)
+        if previous is not None:
+            previous(sql)
+
+    with db.connection() as conn:
+        conn.set_trace_callback(trace)
+        try:
+            func(*args)
+        finally:
+            conn.set_trace_callback(previous)
+    return [sql for sql in statements if sql.lstrip().upper().startswith(_PLANNED_PREFIXES)]
+
+def explain(conn, sql):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+
+def full_scans(details):
+    """Return the plan lines that walk a table without any index.
+
+    Scans of materialized subqueries/CTEs are ignored; only their own plan
+    lines (which are listed separately) can touch real tables. One-off
+    schema lookups in sqlite_master are ignored as well.
+    """
+    subqueries = {d.split()[1] for d in details if d.startswith(('MATERIALIZE ', 'CO-ROUTINE '))}
+    subqueries.update(('sqlite_master', 'sqlite_schema'))
+    return [
+        d for d in details
+        if d.startswith('SCAN ') and 'INDEX' not in d and d.split()[1] not in subqueries
+    ]
+
+def check_query_plans():
+    """Run every query function and collect its plans.
+
+    Returns a list of ``(function name, sql, plan details, failed)`` tuples.
+    Must be called with ``db.DATABASE_FILE`` pointing at a database that
+    contains the sample data.
+    """
+    results = []
+    for name, args in QUERY_CALLS:
+        statements = capture_statements(getattr(db, name), *args)
+        with db.connection() as conn:
+            for sql in statements:
+                details = explain(conn, sql)
+                failed = name not in ALLOWED_SCANS and bool(full_scans(details))
+                results.append((name, ' '.join(sql.split()), details, failed))
+    return results
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix='warehouse_plans_')
+    saved_file = db.DATABASE_FILE
+    saved_state_cache = os.environ.get('DB_STATE_CACHE_SIZE')
+    db.close_pool()
+    db.DATABASE_FILE = os.path.join(tmp_dir, 'warehouse.db')
+    # Without the user-state store the state functions query the table, so their plans are checked too
+    os.environ['DB_STATE_CACHE_SIZE'] = '0'
+    try:
+        db.init_database()
+        _seed_sample_data()
+        results = check_query_plans()
+    finally:
+        db.close_pool()
+        db.DATABASE_FILE = saved_file
+        if saved_state_cache is None:
+            os.environ.pop('DB_STATE_CACHE_SIZE', None)
+        else:
+            os.environ['DB_STATE_CACHE_SIZE'] = saved_state_cache
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    failures = 0
+    for name, sql, details, failed in results:
+        if not details:
+            continue
+        marker = '❌' if failed else '✅'
+        print(f"{marker} {name}: {sql[:100]}")
+        for detail in details:
+            print(f"      {detail}")
+        if name in ALLOWED_SCANS and full_scans(details):
+            print(f"      (allowed: {ALLOWED_SCANS[name]})")
+        failures += failed
+
+    if failures:
+        print(f"\n❌ {failures} quer{'y' if failures == 1 else 'ies'} fall back to a full table scan.")
+        return 1
+    print("\n✅ Every query is served by an index.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Record types returned by the database functions.
+
+Each record is a tuple subclass with named fields and no per-instance
+``__dict__``, built straight from the cursor by its ``row_factory``. Rows
+therefore cost no more memory than the plain tuples they replace, still
+unpack like tuples, and add attribute access plus ``to_dict()`` for the API.
+"""
+
+from collections import namedtuple
+
+class _Record:
+    """Mixin for the record types below."""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """Return the record as a dict keyed by field name."""
+        return dict(zip(self._fields, self))
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """sqlite3 row factory that builds this record type."""
+        return tuple.__new__(cls, row)
+
+class Category(_Record, namedtuple('Category', 'id code name created_at')):
+    __slots__ = ()
+
+class Subcategory(_Record, namedtuple('Subcategory', 'id code name category_id category created_at')):
+    __slots__ = ()
+
+class Brand(_Record, namedtuple('Brand', 'id code name created_at')):
+    __slots__ = ()
+
+class MeasureType(_Record, namedtuple('MeasureType', 'id code name low_stock_threshold created_at')):
+    __slots__ = ()
+
+class Item(_Record, namedtuple('Item', (
+        'id code custom_code name description category subcategory brand measure_type '
+        'available_count video_url created_at updated_at created_ts updated_ts'))):
+    """An item in a listing, with the names of its category, brand and so on."""
+    __slots__ = ()
+
+class ItemDetail(_Record, namedtuple('ItemDetail', (
+        'id code custom_code name description category_id category subcategory_id subcategory '
+        'brand_id brand measure_type_id measure_type available_count video_url created_at updated_at '
+        'created_ts updated_ts'))):
+    """A single item with both the ids and the names of its related rows."""
+    __slots__ = ()
+
+class LowStockItem(_Record, namedtuple('LowStockItem', (
+        'id code custom_code name available_count category subcategory brand measure_type '
+        'low_stock_threshold'))):
+    __slots__ = ()
+
+class ItemImage(_Record, namedtuple('ItemImage', 'id image_path created_at')):
+    __slots__ = ()
+
+class StockMovement(_Record, namedtuple('StockMovement', 'id delta reason actor created_ts')):
+    __slots__ = ()
+
+class StockBalance(_Record, namedtuple('StockBalance', 'id code custom_code name balance')):
+    __slots__ = ()
+
+class PendingFileDeletion(_Record, namedtuple('PendingFileDeletion', 'id path queued_ts attempts')):
+    __slots__ = ()
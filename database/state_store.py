@@ -0,0 +1,236 @@
+"""Write-behind store for the bot's conversation states (``user_states``).
+
+The bot reads a user's state on every message and writes it on every
+wizard step. ``UserStateStore`` keeps the states in memory as the primary
+copy, so reads never touch the database, and writes them behind: a
+``set()`` or ``clear()`` updates memory and marks the user dirty, and a
+background thread writes every dirty user in one transaction at most
+``flush_ms`` later. Several steps of one user between flushes become one
+row write. On shutdown (``close()``, called by ``close_pool()``) whatever is
+still dirty is written, so a restarted bot resumes every conversation; a
+crash loses at most the last ``flush_ms`` of changes.
+
+States are kept as the JSON text stored in the table, so a read returns a
+fresh object with the same JSON round-trip as before. Memory is bounded by
+``max_entries`` (least recently used first) and entries idle for ``ttl``
+seconds are dropped; a dropped state is read back from the table (or from
+the pending writes) on its user's next message. Users without a state are
+cached too.
+
+The store assumes this process is the only writer of ``user_states``, which
+holds for the bot (the API never touches conversation states).
+"""
+
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+
+from .pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Users whose state is kept in memory
+DEFAULT_MAX_ENTRIES = 10000
+# Seconds a user can be idle before their state is dropped from memory
+DEFAULT_TTL = 3600
+# Longest time a change stays in memory only
+DEFAULT_FLUSH_MS = 500
+
+# (state, data) of a user without a state; a pending write of it deletes the row
+_NO_STATE = (None, None)
+
+class UserStateStore:
+    """In-memory conversation states, written to ``user_states`` in batches."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, flush_ms=DEFAULT_FLUSH_MS):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.flush_interval = max(0.0, flush_ms / 1000)
+        # One connection of its own, so pending states always go to this file
+        self._pool = ConnectionPool(path, size=1)
+        # user_id -> (state, data, expires), least recently used first
+        self._entries = OrderedDict()
+        # user_id -> (state, data) not yet written, and the batch being written
+        self._dirty = {}
+        self._flushing = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+        self._hits = 0
+        self._misses = 0
+        self._flushes = 0
+        self._rows_written = 0
+
+    def get(self, user_id):
+        """Get ``(state, data)`` of a user; data is the stored JSON text. ``(None, None)`` if there is none."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                if now < entry[2]:
+                    self._entries.move_to_end(user_id)
+                    self._hits += 1
+                    return entry[0], entry[1]
+                del self._entries[user_id]
+            pending = self._dirty.get(user_id) or self._flushing.get(user_id)
+            if pending is not None:
+                self._put(user_id, pending, now)
+                self._hits += 1
+                return pending
+            self._misses += 1
+        value = self._load(user_id)
+        with self._lock:
+            # A set() or clear() made while loading wins over the stored value
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                return entry[0], entry[1]
+            self._put(user_id, value, time.monotonic())
+        return value
+
+    def contains(self, user_id):
+        """Whether get() can answer for ``user_id`` without reading the database."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() < entry[2]:
+                return True
+            return user_id in self._dirty or user_id in self._flushing
+
+    def set(self, user_id, state, data):
+        """Set a user's state; ``data`` is JSON text (not None). Written to the table within ``flush_ms``."""
+        self._change(user_id, (state, data))
+
+    def clear(self, user_id):
+        """Remove a user's state. Deleted from the table within ``flush_ms``."""
+        self._change(user_id, _NO_STATE)
+
+    def _change(self, user_id, value):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("User state store is closed")
+            self._put(user_id, value, time.monotonic())
+            self._dirty[user_id] = value
+        if self._thread is None:
+            self._start()
+        self._wake.set()
+
+    def _put(self, user_id, value, now):
+        """Cache ``value``; the caller holds the lock."""
+        self._entries[user_id] = (value[0], value[1], now + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, user_id):
+        with self._pool.connection() as conn:
+            row = conn.execute('SELECT state, data FROM user_states WHERE user_id = ?', (user_id,)).fetchone()
+        if row is None:
+            return _NO_STATE
+        # A row without data is still a state; None marks a missing row
+        return row[0], row[1] if row[1] is not None else ''
+
+    def _write(self, changes):
+        """Write ``{user_id: (state, data)}`` in one transaction."""
+        upserts = [(user_id, state, data) for user_id, (state, data) in changes.items() if data is not None]
+        deletes = [(user_id,) for user_id, (_, data) in changes.items() if data is None]
+        with self._pool.transaction() as conn:
+            if upserts:
+                conn.executemany('INSERT OR REPLACE INTO user_states (user_id, state, data) VALUES (?, ?, ?)',
+                                 upserts)
+            if deletes:
+                conn.executemany('DELETE FROM user_states WHERE user_id = ?', deletes)
+
+    def flush(self):
+        """Write every pending change now. Returns the number of users written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                self._flushing, self._dirty = self._dirty, {}
+            try:
+                self._write(self._flushing)
+            except Exception:
+                with self._lock:
+                    # Keep the batch for the next flush, unless a newer change replaced it
+                    for user_id, value in self._flushing.items():
+                        self._dirty.setdefault(user_id, value)
+                    self._flushing = {}
+                raise
+            with self._lock:
+                written, self._flushing = len(self._flushing), {}
+            self._flushes += 1
+            self._rows_written += written
+            return written
+
+    def expire(self):
+        """Drop the entries idle for longer than ``ttl``. Returns how many were dropped."""
+        now = time.monotonic()
+        dropped = 0
+        with self._lock:
+            # Entries are in order of last use, so the expired ones come first
+            while self._entries:
+                user_id, entry = next(iter(self._entries.items()))
+                if now < entry[2]:
+                    break
+                del self._entries[user_id]
+                dropped += 1
+        return dropped
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None or self._closed:
+                return
+            self._thread = threading.Thread(target=self._run, name='user-state-writer', daemon=True)
+            self._thread.start()
+        # Daemon threads are killed at exit; write what is pending first
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Sleep until something changes (or it is time to drop idle entries),
+            # then give more changes flush_interval to join the batch
+            if self._wake.wait(max(1, min(self.ttl, 60))):
+                self._stop.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Writing user states failed, retrying: {e}")
+            self.expire()
+
+    def stats(self):
+        """Cached and pending users, hit rate and writes so far."""
+        with self._lock:
+            entries, pending = len(self._entries), len(self._dirty) + len(self._flushing)
+            hits, misses = self._hits, self._misses
+        return {
+            'entries': entries,
+            'pending': pending,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'flushes': self._flushes,
+            'rows_written': self._rows_written,
+        }
+
+    def close(self):
+        """Stop the writer thread, write every pending change and close the connection."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+        try:
+            self.flush()
+        finally:
+            self._pool.close()
+            atexit.unregister(self.close)
@@ -1,34 +1,15 @@
 """Utility functions for the bot."""
 
-import random
-import string
 import jdatetime
+from functools import lru_cache
 from datetime import datetime
 
-def generate_code(prefix, length=6):
-    """Generate a unique code with a prefix."""
-    numbers = ''.join(random.choices(string.digits, k=length))
-    return f"{prefix}{numbers}"
+def format_code(prefix, number, digits=6):
+    """Format a sequence number as a code, e.g. ('ITM', 42) -> 'ITM000042'.
 
-def generate_category_code():
-    """Generate a unique code for categories."""
-    return generate_code("CAT")
-
-def generate_subcategory_code():
-    """Generate a unique code for subcategories."""
-    return generate_code("SUB")
-
-def generate_brand_code():
-    """Generate a unique code for brands."""
-    return generate_code("BRD")
-
-def generate_measure_type_code():
-    """Generate a unique code for measure types."""
-    return generate_code("MSR")
-
-def generate_item_code():
-    """Generate a unique code for items."""
-    return generate_code("ITM")
+    Numbers too large for ``digits`` just get more digits.
+    """
+    return f"{prefix}{number:0{digits}d}"
 
 def get_shamsi_date():
     """Get current Shamsi (Jalali) date."""
@@ -38,6 +19,28 @@ def get_shamsi_datetime():
     """Get current Shamsi (Jalali) date and time."""
     return jdatetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
 
+def shamsi_to_timestamp(date_string):
+    """Convert a Shamsi 'YYYY/MM/DD' or 'YYYY/MM/DD HH:MM:SS' string to an epoch timestamp.
+
+    A date without a time means the end of that day. Raises ValueError for
+    anything else.
+    """
+    date_string = date_string.strip()
+    try:
+        value = jdatetime.datetime.strptime(date_string, "%Y/%m/%d %H:%M:%S")
+    except ValueError:
+        value = jdatetime.datetime.strptime(date_string, "%Y/%m/%d").replace(hour=23, minute=59, second=59)
+    return int(value.togregorian().timestamp())
+
+@lru_cache(maxsize=4096)
+def timestamp_to_shamsi(timestamp):
+    """Format an epoch timestamp as a Shamsi date and time.
+
+    Cached, since writes made in the same second and listings of items
+    created together format the same timestamps over and over.
+    """
+    return jdatetime.datetime.fromtimestamp(timestamp).strftime("%Y/%m/%d %H:%M:%S")
+
 def format_shamsi_date(date_string):
     """Format a date string to Shamsi."""
     return date_string  # Already in Shamsi format from database
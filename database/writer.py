@@ -0,0 +1,188 @@
+"""Group commit: one writer thread that batches small writes into one transaction.
+
+Every committed transaction costs a WAL append, lock handoffs and, with
+``synchronous=FULL``, an fsync. When many users each make one tiny write
+(a wizard step, an image, a stock change), committing them one by one
+spends most of the time on that overhead. ``GroupCommitWriter`` queues
+write calls and runs up to ``max_ops`` of them, or whatever arrives within
+``max_delay_ms`` of the first one, in a single transaction:
+
+    writer = get_writer()
+    future = writer.submit(db.set_user_state, user_id, 'item_create_name')
+    future.result()                     # returns once the batch is committed
+
+    item_id = writer.commit(db.create_item, ...)   # commit right away
+
+Each call runs inside its own SAVEPOINT, so one that raises is rolled back
+and reports its exception without affecting the rest of the batch. Calls
+are applied in the order they were submitted.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from . import database as _db
+
+logger = logging.getLogger(__name__)
+
+# How long to keep collecting writes after the first one. With 0 a batch is
+# whatever queued up while the previous one was committing, which suits
+# callers that wait for their write; a few ms gathers bigger batches from
+# callers that don't
+DEFAULT_MAX_DELAY_MS = 0
+# Commit as soon as this many writes are in the batch
+DEFAULT_MAX_OPS = 200
+
+class _Write:
+    __slots__ = ('func', 'args', 'kwargs', 'future', 'flush')
+
+    def __init__(self, func, args, kwargs, flush):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.flush = flush
+
+_STOP = object()
+
+class GroupCommitWriter:
+    """A background thread that applies queued database writes in batches."""
+
+    def __init__(self, max_delay_ms=DEFAULT_MAX_DELAY_MS, max_ops=DEFAULT_MAX_OPS):
+        self.max_delay = max_delay_ms / 1000
+        self.max_ops = max(1, int(max_ops))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._batches = 0
+        self._writes = 0
+
+    def _start(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Group commit writer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)``; returns a Future resolved after its batch commits."""
+        if self._thread is None or self._closed:
+            self._start()
+        write = _Write(func, args, kwargs, flush=False)
+        self._queue.put(write)
+        return write.future
+
+    def submit_now(self, func, *args, **kwargs):
+        """Like submit(), but commit as soon as this write is applied instead of
+        waiting for the batch window to close."""
+        if self._thread is None or self._closed:
+            self._start()
+        write = _Write(func, args, kwargs, flush=True)
+        self._queue.put(write)
+        return write.future
+
+    def commit(self, func, *args, **kwargs):
+        """Run ``func(*args, **kwargs)`` and commit it right away. Returns its
+        result or raises its exception."""
+        return self.submit_now(func, *args, **kwargs).result()
+
+    def close(self):
+        """Commit everything queued so far and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def stats(self):
+        """Number of batches and writes committed so far."""
+        batches, writes = self._batches, self._writes
+        return {
+            'batches': batches,
+            'writes': writes,
+            'avg_batch': round(writes / batches, 2) if batches else 0.0,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_ops and not batch[-1].flush:
+                timeout = deadline - time.monotonic()
+                try:
+                    write = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if write is _STOP:
+                    stopping = True
+                    break
+                batch.append(write)
+            self._apply(batch)
+
+    def _apply(self, batch):
+        """Run one batch in a single transaction and resolve its futures."""
+        outcomes = []
+        try:
+            with _db.transaction() as conn:
+                for write in batch:
+                    if not write.future.set_running_or_notify_cancel():
+                        continue
+                    conn.execute('SAVEPOINT group_commit')
+                    try:
+                        result = write.func(*write.args, **write.kwargs)
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO group_commit')
+                        conn.execute('RELEASE group_commit')
+                        outcomes.append((write, None, e))
+                    else:
+                        conn.execute('RELEASE group_commit')
+                        outcomes.append((write, result, None))
+        except Exception as e:
+            logger.error(f"Group commit of {len(batch)} writes failed: {e}")
+            for write in batch:
+                if not write.future.done():
+                    write.future.set_exception(e)
+            return
+        self._batches += 1
+        self._writes += len(outcomes)
+        for write, result, error in outcomes:
+            if error is None:
+                write.future.set_result(result)
+            else:
+                write.future.set_exception(error)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Get the shared writer, configured by DB_GROUP_COMMIT_MS and DB_GROUP_COMMIT_OPS."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter(
+                    max_delay_ms=float(os.getenv('DB_GROUP_COMMIT_MS', DEFAULT_MAX_DELAY_MS)),
+                    max_ops=int(os.getenv('DB_GROUP_COMMIT_OPS', DEFAULT_MAX_OPS))
+                )
+    return _writer
+
+def close_writer():
+    """Commit pending writes and stop the shared writer."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()